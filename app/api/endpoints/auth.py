@@ -37,7 +37,7 @@ async def register_user(user_data: UserCreate):
     # Hash the password and create the user
     hashed_password = get_password_hash(user_data.password)
     user_dict = {
-        "_id": str(ObjectId()),
+        "_id": ObjectId(),
         "email": user_data.email,
         "username": user_data.username,
         "hashed_password": hashed_password,
@@ -46,7 +46,7 @@ async def register_user(user_data: UserCreate):
     await users_collection.insert_one(user_dict)
 
     # Prepare the response
-    user_dict["id"] = user_dict.pop("_id")
+    user_dict["id"] = str(user_dict.pop("_id"))
     user_dict.pop("hashed_password")
     return user_dict
 
@@ -70,7 +70,7 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["_id"], "email": user["email"]},
+        data={"sub": str(user["_id"]), "email": user["email"]},
         expires_delta=access_token_expires,
     )
     return {"access_token": access_token, "token_type": "bearer"}
@@ -104,7 +104,7 @@ async def login_with_email(user_data: UserLogin):
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["_id"], "email": user["email"]},
+        data={"sub": str(user["_id"]), "email": user["email"]},
         expires_delta=access_token_expires
     )
     
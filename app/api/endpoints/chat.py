@@ -1,61 +1,37 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
 import logging
-import os
-from azure.ai.inference import ChatCompletionsClient
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.inference.models import SystemMessage, UserMessage, AssistantMessage
 from app.schemas.chat import ChatEntry
-from pydantic import BaseModel
+from app.services.llm import get_llm_provider, LLMUnavailableError, LLMTimeoutError, LLMError
+from app.services import embedding_service
+from app.services.sentiment_service import analyze_sentiments
+from app.utils.auth import get_optional_current_user
+from pydantic import BaseModel, conlist
 from fastapi.responses import StreamingResponse
 
-# Configure logger
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 router = APIRouter()
 
-# Set up environment variables for authentication
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
-    raise ValueError("GITHUB_TOKEN environment variable is not set.")
+conversation_history = []  # Store conversation history in memory (anonymous callers share it)
+user_histories: "OrderedDict[str, List[Dict[str, str]]]" = OrderedDict()  # Per signed-in user, least recent first
 
-# Azure AI Inference endpoint and model name
-ENDPOINT = "https://models.inference.ai.azure.com"
-MODEL_NAME = "Meta-Llama-3.1-8B-Instruct"
+MAX_USER_HISTORIES = 1000  # Oldest conversations are dropped beyond this
 
-# Initialize the Azure AI Inference client
-client = ChatCompletionsClient(
-    endpoint=ENDPOINT,
-    credential=AzureKeyCredential(GITHUB_TOKEN),
-)
-
-conversation_history = []  # Store conversation history in memory
+CONTEXT_SNIPPET_CHARS = 500  # Per-entry cap on journal text injected into the prompt
 
 async def generate_response(messages: list, stream: bool = False):
-    """Generate a response using the Meta-Llama-3.1-8B-Instruct model."""
+    """Generate a response using the configured LLM backend."""
     try:
-        if (stream):
-            # Stream the response
-            response = client.complete(
-                stream=True,
-                messages=messages,
-                model_extras={'stream_options': {'include_usage': True}},
-                model=MODEL_NAME,
-            )
-            streamed_response = ""
-            usage = {}
-            for update in response:
-                if update.choices and update.choices[0].delta:
-                    streamed_response += update.choices[0].delta.content or ""
-                if update.usage:
-                    usage = update.usage
-            return streamed_response, usage
-        else:
-            # Non-streaming response
-            response = client.complete(messages=messages, model=MODEL_NAME)
-            return response.choices[0].message.content, None
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
+        result = await get_llm_provider().complete(messages, stream=stream)
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=f"Error generating response: {str(e)}")
+    return result.content, (result.usage if stream else None)
 
 @router.post("/chat/detect")
 async def detect_emotions(entry: ChatEntry):
@@ -66,7 +42,7 @@ async def detect_emotions(entry: ChatEntry):
         emotions = {"neutral": 1.0}  # Default response
         return {"emotions": emotions}
     except Exception as e:
-        logger.error(f"Error in emotion detection endpoint: {str(e)}")
+        logger.error("Error in emotion detection endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/chat/detect/primary")
@@ -79,7 +55,7 @@ async def detect_primary_emotion(entry: ChatEntry):
         confidence = 1.0
         return {"emotion": emotion, "confidence": confidence}
     except Exception as e:
-        logger.error(f"Error in primary emotion detection endpoint: {str(e)}")
+        logger.error("Error in primary emotion detection endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/chat/respond")
@@ -95,28 +71,73 @@ async def respond_to_chat(entry: ChatEntry):
 
 class ChatRequest(BaseModel):
     message: str
+    include_journal_context: bool = False  # Ground the reply in the user's most related entries
+    context_entries: int = 3
+
+async def build_journal_context(user_id, message: str, k: int) -> Optional[Dict[str, str]]:
+    """Return a system message quoting the user's journal entries most similar to ``message``."""
+    matches = await embedding_service.similar_journal_entries(
+        user_id, message, k=max(1, min(k, 10)), projection={"content": 1, "mood": 1, "created_at": 1}
+    )
+    snippets = []
+    for entry, _ in matches:
+        mood = entry.get("mood") or {}
+        snippets.append(
+            f"- {entry['created_at']:%Y-%m-%d} (mood: {mood.get('label', 'unknown')}): "
+            f"{entry['content'][:CONTEXT_SNIPPET_CHARS]}"
+        )
+    if not snippets:
+        return None
+    return {
+        "role": "system",
+        "content": "Related entries from the user's journal, for context:\n" + "\n".join(snippets),
+    }
+
+def history_for(current_user: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Return the caller's conversation history; signed-in users never share one."""
+    if current_user is None:
+        return conversation_history
+    key = str(current_user["_id"])
+    history = user_histories.pop(key, None)
+    if history is None:
+        history = []
+        while len(user_histories) >= MAX_USER_HISTORIES:
+            user_histories.popitem(last=False)
+    user_histories[key] = history
+    return history
 
 @router.post("")
-async def chat_with_ai(request: ChatRequest):
+async def chat_with_ai(request: ChatRequest, current_user: Optional[Dict[str, Any]] = Depends(get_optional_current_user)):
     """Handle chat requests and generate AI responses."""
     try:
         # Extract the message from the request body
         message = request.message
+        history = history_for(current_user)
 
         # Add user message to conversation history
-        conversation_history.append(UserMessage(message))
+        history.append({"role": "user", "content": message})
 
         # Add system prompt if it's the first message
-        if len(conversation_history) == 1:
-            conversation_history.insert(0, SystemMessage("You are a helpful assistant."))
+        if len(history) == 1:
+            history.insert(0, {"role": "system", "content": "You are a helpful assistant."})
+
+        # Journal context is added to this request only, and only ever to the user's own history,
+        # since the reply may quote it
+        messages = history
+        if request.include_journal_context and current_user is not None:
+            context = await build_journal_context(current_user["_id"], message, request.context_entries)
+            if context is not None:
+                messages = history[:-1] + [context, history[-1]]
 
         # Generate response
-        response, usage = await generate_response(conversation_history, stream=True)
+        response, usage = await generate_response(messages, stream=True)
 
         # Add AI response to conversation history
-        conversation_history.append(AssistantMessage(response))
+        history.append({"role": "assistant", "content": response})
 
         return {"response": response, "usage": usage}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in /chat endpoint: {str(e)}")
 
@@ -124,9 +145,19 @@ async def chat_with_ai(request: ChatRequest):
 async def analyze_message_sentiment(message: str):
     """Analyze the sentiment of a message."""
     try:
-        # Placeholder for sentiment analysis logic
-        # Replace this with actual implementation if needed
-        sentiment = "neutral"  # Default sentiment
-        return {"sentiment": sentiment}
+        results = await analyze_sentiments([message])
+        return results[0].as_dict()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class SentimentBatchRequest(BaseModel):
+    messages: conlist(str, min_items=1, max_items=256)
+
+@router.post("/sentiment/batch")
+async def analyze_messages_sentiment(request: SentimentBatchRequest):
+    """Analyze the sentiment of several messages in one call."""
+    try:
+        results = await analyze_sentiments(request.messages)
+        return {"results": [result.as_dict() for result in results]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
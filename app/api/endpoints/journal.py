@@ -1,25 +1,39 @@
 # app/api/endpoints/journal.py
-from fastapi import APIRouter, HTTPException, Depends, status, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from bson import ObjectId
 from app.schemas.journal import (
     JournalEntryCreate,
     JournalEntryResponse,
     JournalEntryUpdate,
-    ReflectionAnswer,
-    JournalEntry
+    ReflectionAnswer
 )
 from app.utils.auth import get_current_user, verify_token
-from app.db import Database
+from app.utils.conditional import user_etag, not_modified_response, set_etag
+from app.db import Database, user_id_filter, same_user
+from app.core.config import settings
 import logging
-from app.schemas.journal import MoodTrackerResponse
+from app.schemas.journal import MoodTrackerResponse, SyncResponse, SimilarEntryResponse, WeeklyInsightResponse
+from app.schemas.journal import AnalyzeJournalRequest, JournalAnalysisResponse
+from app.schemas.journal import DraftSave, DraftPublish, DraftSaveResponse, DraftResponse
+from app.services.sync_service import next_change_seq, record_tombstone, changes_since, sequenced_write
+from app.services import embedding_service, archive_service, voice_service, analysis_service, draft_service
+from app.services.insight_service import get_weekly_insight, last_complete_week, week_bounds
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+DRAFT_ERRORS = {
+    draft_service.InvalidDraftChange: status.HTTP_400_BAD_REQUEST,
+    draft_service.DraftNotFound: status.HTTP_404_NOT_FOUND,
+    draft_service.DraftConflict: status.HTTP_409_CONFLICT,  # Resend the full content
+    draft_service.DraftAlreadyPublished: status.HTTP_410_GONE,  # Start a new draft session
+}
+
 # Note: This class is defined here for backward compatibility.
 # If you already have JournalEntryCreate in your schemas, ensure you use the same structure.
 class JournalEntryCreate(BaseModel):
@@ -30,12 +44,16 @@ class JournalEntryCreate(BaseModel):
 @router.post("/", response_model=JournalEntryResponse, status_code=status.HTTP_201_CREATED)
 async def create_journal_entry(
     entry: JournalEntryCreate,
+    background_tasks: BackgroundTasks,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
-    Create a new journal entry or update an existing draft.
+    Create a new journal entry.
+
+    Every call inserts a new document; editors that autosave should use
+    ``/drafts/{draft_session}``, which keeps one document per draft.
     """
-    logger.info(f"Received payload: {entry.dict()}")
+    logger.info("Creating journal entry: %d characters, draft=%s", len(entry.content), entry.is_draft)
     user_id = current_user["_id"]
 
     # Ensure mood is properly structured
@@ -54,12 +72,21 @@ async def create_journal_entry(
         "is_draft": entry.is_draft,
         "ai_response": None,
     }
-    result = await journal_collection.insert_one(journal_entry)
+    if entry.is_draft:
+        journal_entry["draft_expires_at"] = journal_entry["created_at"] + timedelta(days=settings.DRAFT_TTL_DAYS)
+    async with sequenced_write(user_id) as session:
+        journal_entry["seq"] = await next_change_seq(user_id, session)
+        result = await journal_collection.insert_one(journal_entry, session=session)
     journal_entry["id"] = str(result.inserted_id)
+    background_tasks.add_task(
+        embedding_service.index_entry_in_background, user_id, result.inserted_id, entry.content
+    )
     return journal_entry
 
 @router.get("/journal/", response_model=List[JournalEntryResponse])
 async def get_user_journal_entries(
+    request: Request,
+    response: Response,
     date: Optional[str] = None,
     is_draft: Optional[bool] = None,
     skip: int = 0,
@@ -79,17 +106,22 @@ async def get_user_journal_entries(
     Returns:
         List of journal entries
     """
-    query = {"user_id": current_user["_id"]}
+    etag = user_etag(current_user, request)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    set_etag(response, etag)
+
+    query = user_id_filter(current_user["_id"])
+    created_range = (None, None)
     if date:
-        query["created_at"] = {
-            "$gte": datetime.strptime(date, "%Y-%m-%d"),
-            "$lt": datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1),
-        }
+        created_range = (datetime.strptime(date, "%Y-%m-%d"), datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1))
+        query["created_at"] = {"$gte": created_range[0], "$lt": created_range[1]}
     if is_draft is not None:
         query["is_draft"] = is_draft
 
-    journal_collection = Database.get_collection("journal_entries")
-    entries = await journal_collection.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(100)
+    # Falls through to the archive only when the page reaches back past the archive cutoff
+    entries = await archive_service.find_journal_entries(current_user, query, skip, min(limit, 100), created_range)
     
     # Convert _id to string for each entry
     for entry in entries:
@@ -99,28 +131,46 @@ async def get_user_journal_entries(
 
 @router.get("/", response_model=List[JournalEntryResponse])
 async def get_user_journal_entries(
+    request: Request,
+    response: Response,
     is_draft: Optional[bool] = None,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
     Get journal entries for the authenticated user.
     """
-    query = {"user_id": current_user["_id"]}
+    etag = user_etag(current_user, request)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    set_etag(response, etag)
+
+    query = user_id_filter(current_user["_id"])
     if is_draft is not None:
         query["is_draft"] = is_draft
 
-    entries = await Database.get_collection("journal_entries").find(query).to_list(100)
+    entries = await archive_service.find_journal_entries(current_user, query, 0, 100)
     for entry in entries:
         entry["id"] = str(entry.pop("_id"))  # Convert ObjectId to string
     return entries
 
 @router.get("/mood-tracker/", response_model=List[MoodTrackerResponse])
-async def get_mood_tracker_data(current_user: Dict[str, Any] = Depends(get_current_user)):
+async def get_mood_tracker_data(
+    request: Request,
+    response: Response,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
     """
     Get mood tracker data for the authenticated user.
     """
+    etag = user_etag(current_user, request)
+    not_modified = not_modified_response(request, etag)
+    if not_modified:
+        return not_modified
+    set_etag(response, etag)
+
     pipeline = [
-        {"$match": {"user_id": current_user["_id"]}},
+        {"$match": user_id_filter(current_user["_id"])},
         {"$group": {
             "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
             "mood": {"$first": "$mood"}
@@ -132,9 +182,178 @@ async def get_mood_tracker_data(current_user: Dict[str, Any] = Depends(get_curre
             "_id": 0
         }}
     ]
-    mood_data = await Database.get_collection("journal_entries").aggregate(pipeline).to_list(100)
+    # Heavy aggregation: served by a secondary when one has caught up with the user's writes
+    async with Database.analytics_reads(current_user) as reads:
+        mood_data = await reads.collection("journal_entries").aggregate(pipeline, session=reads.session).to_list(100)
+        if current_user.get("archived_through"):
+            # A day's first entries are the ones archived, so their mood wins
+            moods = {day["date"]: day["mood"] for day in mood_data}
+            moods.update(await archive_service.archived_daily_moods(current_user["_id"], reads))
+            mood_data = [{"date": day, "mood": moods[day]} for day in sorted(moods)][:100]
     return mood_data
 
+@router.get("/insights/weekly/", response_model=WeeklyInsightResponse)
+async def get_weekly_insights(
+    week: Optional[date] = None,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Get the user's precomputed weekly insight digest.
+
+    Args:
+        week: Any day in the week to fetch (defaults to the last complete week)
+        current_user: Current authenticated user
+
+    Returns:
+        The digest written by the weekly insights batch job
+    """
+    week_start = week_bounds(week)[0] if week else last_complete_week()
+    insight = await get_weekly_insight(current_user["_id"], week_start)
+    if not insight:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No insights for this week yet"
+        )
+    return insight
+
+@router.get("/sync/", response_model=SyncResponse)
+async def sync_journal_entries(
+    since: Optional[str] = None,
+    limit: int = 100,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Return journal entries created, updated or deleted since a sync token.
+
+    Args:
+        since: `next_token` from the previous sync; omit for a full sync
+        limit: Maximum number of changes to return (1-500)
+        current_user: Current authenticated user
+
+    Returns:
+        Changed entries, deleted entry IDs and the token to resume from
+    """
+    try:
+        since_seq = int(since) if since else 0
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    limit = max(1, min(limit, 500))
+
+    entries, tombstones, next_seq, has_more = await changes_since(current_user, since_seq, limit)
+    for entry in entries:
+        entry["id"] = str(entry.pop("_id"))
+    return {
+        "changes": entries,
+        "deleted": [str(tombstone["entry_id"]) for tombstone in tombstones],
+        "next_token": str(next_seq),
+        "has_more": has_more,
+    }
+
+
+@router.get("/export/")
+async def export_journal_entries(current_user: Dict[str, Any] = Depends(get_current_user)):
+    """
+    Download all of the user's journal entries, including archived ones.
+
+    Returns:
+        Newline-delimited JSON, one entry per line: recent entries first,
+        then the archive oldest month first
+    """
+    user_id = current_user["_id"]
+
+    async def lines():
+        # A full export is a heavy read: keep it off the primary when a secondary has caught up
+        async with Database.analytics_reads(current_user) as reads:
+            cursor = reads.collection("journal_entries").find(user_id_filter(user_id), session=reads.session) \
+                .sort("created_at", -1).batch_size(500)
+            async for entry in cursor:
+                entry["id"] = str(entry.pop("_id"))
+                yield JournalEntryResponse.parse_obj(entry).json() + "\n"
+            async for entry in archive_service.iter_archived_entries(user_id, reads):
+                entry["id"] = str(entry.pop("_id"))
+                yield JournalEntryResponse.parse_obj(entry).json() + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="journal-export.ndjson"'},
+    )
+
+@router.patch("/drafts/{draft_session}", response_model=DraftSaveResponse)
+async def autosave_draft(
+    draft_session: str,
+    save: DraftSave,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Autosave a draft: its full content, or the changes since ``base_version``.
+
+    Rapid saves are coalesced in memory and written together after a pause
+    in typing. A 409 means this server does not have ``base_version``; resend
+    the full content with the same version.
+    """
+    changes = [(change.start, change.end, change.text) for change in save.changes] if save.changes else None
+    try:
+        draft = await draft_service.save_draft(
+            current_user["_id"], draft_session, save.version, save.content, changes, save.base_version,
+            save.mood.dict() if save.mood else None, save.tags
+        )
+    except tuple(DRAFT_ERRORS) as e:
+        raise HTTPException(status_code=DRAFT_ERRORS[type(e)], detail=str(e))
+    return {"draft_session": draft_session, "version": draft.version, "length": len(draft.content)}
+
+@router.get("/drafts/{draft_session}", response_model=DraftResponse)
+async def get_draft(draft_session: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """
+    Get a draft's latest text, e.g. to resume editing it.
+    """
+    try:
+        draft = await draft_service.get_draft(current_user["_id"], draft_session)
+    except tuple(DRAFT_ERRORS) as e:
+        raise HTTPException(status_code=DRAFT_ERRORS[type(e)], detail=str(e))
+    if draft is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Draft not found")
+    return draft
+
+@router.post("/drafts/{draft_session}/publish", response_model=JournalEntryResponse,
+             status_code=status.HTTP_201_CREATED)
+async def publish_draft(
+    draft_session: str,
+    publish: DraftPublish,
+    background_tasks: BackgroundTasks,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Turn a draft into a journal entry, optionally with final content or changes.
+
+    ``version`` is the client's latest version of the draft; if this server
+    has not seen it, a 409 asks for the full content.
+    """
+    changes = [(change.start, change.end, change.text) for change in publish.changes] if publish.changes else None
+    try:
+        entry = await draft_service.publish_draft(
+            current_user["_id"], draft_session, publish.version, publish.content, changes, publish.base_version,
+            publish.mood.dict() if publish.mood else None, publish.tags
+        )
+    except tuple(DRAFT_ERRORS) as e:
+        raise HTTPException(status_code=DRAFT_ERRORS[type(e)], detail=str(e))
+    entry["id"] = str(entry.pop("_id"))
+    background_tasks.add_task(
+        embedding_service.index_entry_in_background, current_user["_id"], ObjectId(entry["id"]), entry["content"]
+    )
+    return entry
+
+@router.delete("/drafts/{draft_session}", status_code=status.HTTP_204_NO_CONTENT)
+async def discard_draft(draft_session: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """
+    Delete a draft, including autosaves not written yet.
+    """
+    try:
+        deleted = await draft_service.discard_draft(current_user["_id"], draft_session)
+    except tuple(DRAFT_ERRORS) as e:
+        raise HTTPException(status_code=DRAFT_ERRORS[type(e)], detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Draft not found")
 
 @router.get("/{entry_id}", response_model=JournalEntryResponse)
 async def get_user_journal_entries(
@@ -148,7 +367,7 @@ async def get_user_journal_entries(
     try:
         object_id = ObjectId(entry_id)
     except Exception as e:
-        logger.error(f"Invalid entry_id: {entry_id}, error: {e}")
+        logger.info("Invalid entry_id %r: %s", entry_id, e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid journal entry ID"
@@ -158,16 +377,18 @@ async def get_user_journal_entries(
     
     # Get entry
     entry = await journal_collection.find_one({"_id": object_id})
+    if not entry:
+        entry = await archive_service.find_archived_entry(object_id)
     
     if not entry:
-        logger.error("Entry with _id %s not found.", object_id)
+        logger.info("Entry with _id %s not found.", object_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Journal entry not found"
         )
     
     # Check if user owns this entry
-    if entry["user_id"] != current_user["_id"]:
+    if not same_user(entry["user_id"], current_user["_id"]):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to access this journal entry"
@@ -176,10 +397,54 @@ async def get_user_journal_entries(
     entry["id"] = str(entry.pop("_id"))  # Convert _id to string
     return entry
 
+@router.get("/{entry_id}/similar", response_model=List[SimilarEntryResponse])
+async def get_similar_journal_entries(
+    entry_id: str,
+    k: int = 5,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Get the user's journal entries most similar to the given one.
+
+    Args:
+        entry_id: Reference journal entry ID
+        k: Number of similar entries to return (1-50)
+        current_user: Current authenticated user
+
+    Returns:
+        Similar journal entries with their cosine similarity, most similar first
+    """
+    try:
+        object_id = ObjectId(entry_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid journal entry ID"
+        )
+
+    journal_collection = Database.get_collection("journal_entries")
+    entry = await journal_collection.find_one({"_id": object_id, **user_id_filter(current_user["_id"])})
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Journal entry not found"
+        )
+
+    matches = await embedding_service.similar_journal_entries(
+        current_user["_id"], entry["content"], k=max(1, min(k, 50)), exclude=object_id
+    )
+    similar = []
+    for similar_entry, score in matches:
+        similar_entry["score"] = score
+        similar_entry["id"] = str(similar_entry.pop("_id"))
+        similar.append(similar_entry)
+    return similar
+
 @router.put("/{entry_id}", response_model=JournalEntryResponse)
 async def update_journal_entry(
     entry_id: str,
     entry_update: JournalEntryUpdate,
+    background_tasks: BackgroundTasks,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -199,7 +464,7 @@ async def update_journal_entry(
     try:
         object_id = ObjectId(entry_id)
     except Exception as e:
-        logger.error(f"Invalid entry_id: {entry_id}, error: {e}")
+        logger.info("Invalid entry_id %r: %s", entry_id, e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid journal entry ID"
@@ -209,6 +474,10 @@ async def update_journal_entry(
     
     # Check if entry exists and is owned by user
     entry = await journal_collection.find_one({"_id": object_id})
+    archived = False
+    if not entry:
+        entry = await archive_service.find_archived_entry(object_id)
+        archived = entry is not None
     
     if not entry:
         raise HTTPException(
@@ -216,31 +485,47 @@ async def update_journal_entry(
             detail="Journal entry not found"
         )
     
-    if entry["user_id"] != current_user["_id"]:
+    if not same_user(entry["user_id"], current_user["_id"]):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to update this journal entry"
         )
+
+    if archived:
+        # Archived entries are moved back to the journal before they are edited
+        await archive_service.restore_entry(object_id)
     
     # Prepare update data
     update_data = {k: v for k, v in entry_update.dict(exclude_unset=True).items() if v is not None}
     
-    if update_data:
-        update_data["updated_at"] = datetime.utcnow()
-        
-        # Convert mood to dict if it exists (if it's a Pydantic model)
-        if "mood" in update_data and hasattr(update_data["mood"], "dict"):
-            update_data["mood"] = update_data["mood"].dict()
-        
-        # Update entry
-        await journal_collection.update_one(
-            {"_id": object_id},
-            {"$set": update_data}
-        )
-    
-    # Get updated entry
-    updated_entry = await journal_collection.find_one({"_id": object_id})
+    async with sequenced_write(current_user["_id"]) as session:
+        if update_data:
+            update_data["updated_at"] = datetime.utcnow()
+            update_data["seq"] = await next_change_seq(current_user["_id"], session)
+
+            if entry.get("is_draft"):
+                update_data["draft_expires_at"] = update_data["updated_at"] + timedelta(days=settings.DRAFT_TTL_DAYS)
+
+            # Convert mood to dict if it exists (if it's a Pydantic model)
+            if "mood" in update_data and hasattr(update_data["mood"], "dict"):
+                update_data["mood"] = update_data["mood"].dict()
+
+            # Update entry
+            await journal_collection.update_one(
+                {"_id": object_id},
+                {"$set": update_data},
+                session=session
+            )
+
+        # Get updated entry (read-your-writes: primary, same session)
+        updated_entry = await journal_collection.find_one({"_id": object_id}, session=session)
     updated_entry["id"] = str(updated_entry.pop("_id"))
+
+    if "content" in update_data or archived:
+        # Archiving dropped the entry's embedding
+        background_tasks.add_task(
+            embedding_service.index_entry_in_background, current_user["_id"], object_id, updated_entry["content"]
+        )
     
     return updated_entry
 
@@ -249,44 +534,51 @@ async def delete_journal_entry(
     entry_id: str,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    logger.info(f"Attempting to delete entry with ID: {entry_id} for user: {current_user['_id']}")
-
     try:
         object_id = ObjectId(entry_id)
     except Exception as e:
-        logger.error(f"Invalid entry_id: {entry_id}, error: {e}")
+        logger.info("Invalid entry_id %r: %s", entry_id, e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid journal entry ID"
         )
 
-    logger.info(f"Querying for entry with ID: {object_id} and user_id: {str(current_user['_id'])}")
-
     journal_collection = Database.get_collection("journal_entries")
-    entry = await journal_collection.find_one({"_id": object_id, "user_id": str(current_user["_id"])})
+    entry = await journal_collection.find_one({"_id": object_id, **user_id_filter(current_user["_id"])})
     if not entry:
-        logger.error(f"Entry not found for ID: {object_id} and user_id: {current_user['_id']}")
+        archived = await archive_service.find_archived_entry(object_id)
+        if archived and same_user(archived["user_id"], current_user["_id"]):
+            entry = await archive_service.restore_entry(object_id)
+    if not entry:
+        logger.info("Entry %s not found for user %s", object_id, current_user["_id"])
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Journal entry not found"
         )
 
-    result = await journal_collection.delete_one({"_id": object_id})
-    if result.deleted_count == 0:
-        logger.error(f"Failed to delete entry with ID: {object_id}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to delete journal entry"
-        )
+    async with sequenced_write(current_user["_id"]) as session:
+        result = await journal_collection.delete_one({"_id": object_id}, session=session)
+        if result.deleted_count == 0:
+            logger.error("Failed to delete entry %s", object_id)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to delete journal entry"
+            )
 
-    logger.info(f"Successfully deleted entry with ID: {object_id}")
+        await record_tombstone(current_user["_id"], object_id, session)
+    draft_service.forget_deleted_entry(entry)
+    await embedding_service.remove_entry(current_user["_id"], object_id)
+    if entry.get("voice"):
+        await voice_service.delete_recording(entry["voice"]["file_id"])
+    logger.info("Deleted journal entry %s", object_id)
 
 @router.post("/reflection/")
 async def save_reflection_answers(answers: List[ReflectionAnswer], current_user: dict = Depends(get_current_user)):
     for answer in answers:
         await Database.get_collection("reflection_answers").update_one(
-            {"user_id": current_user["_id"], "question": answer.question},
-            {"$set": {"answer": answer.answer, "updated_at": datetime.utcnow()}},
+            {**user_id_filter(current_user["_id"]), "question": answer.question},  # Updates a legacy answer in place
+            {"$set": {"answer": answer.answer, "updated_at": datetime.utcnow()},
+             "$setOnInsert": {"user_id": current_user["_id"]}},
             upsert=True,
         )
     return {"message": "Reflection answers saved"}
@@ -302,22 +594,33 @@ async def save_reflection_answers(
     reflection_collection = Database.get_collection("reflection_answers")
     for answer in answers:
         await reflection_collection.update_one(
-            {"user_id": current_user["_id"], "question": answer.question},
-            {"$set": {"answer": answer.answer, "updated_at": datetime.utcnow()}},
+            {**user_id_filter(current_user["_id"]), "question": answer.question},  # Updates a legacy answer in place
+            {"$set": {"answer": answer.answer, "updated_at": datetime.utcnow()},
+             "$setOnInsert": {"user_id": current_user["_id"]}},
             upsert=True,
         )
     return {"message": "Reflection answers saved successfully"}
 
-@router.post("/analyze-journal/")
-async def analyze_journal(entry: JournalEntry, current_user: dict = Depends(get_current_user)):
-    # Example: Use an AI model to analyze the journal entry
-    # Replace this with your actual AI model logic
-    analysis = {
-        "sentiment": "positive",
-        "emotions": ["happiness", "gratitude"],
-        "suggestions": "Keep focusing on the positive aspects of your day."
-    }
-    return {"analysis": analysis}
+@router.post("/analyze-journal/", response_model=JournalAnalysisResponse)
+async def analyze_journal(request: AnalyzeJournalRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Analyze sentiment, emotions and suggestions for ``content`` or for the
+    user's entries from the last ``days`` days (map-reduce over chunks).
+    """
+    if request.content and request.content.strip():
+        texts = [request.content]
+    else:
+        since = datetime.utcnow() - timedelta(days=request.days)
+        query = {**user_id_filter(current_user["_id"]), "created_at": {"$gte": since}, "is_draft": {"$ne": True}}
+        async with Database.analytics_reads(current_user) as reads:
+            cursor = reads.collection("journal_entries").find(query, {"content": 1}, session=reads.session)
+            texts = [entry["content"] async for entry in cursor.sort("created_at", 1)]
+        if not texts:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No journal entries in that period")
+    try:
+        return await analysis_service.analyze_texts(current_user["_id"], texts)
+    except analysis_service.AnalysisRejected as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
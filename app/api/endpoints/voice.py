@@ -1,21 +1,131 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.staticfiles import StaticFiles
-from TTS.api import TTS
-from app.main import app  # Import the app instance
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any, Optional
+from datetime import datetime
+import logging
+import threading
+from app.schemas.journal import JournalEntryResponse, MoodData
+from app.utils.auth import get_current_user
+from app.db import Database, same_user
+from app.services import embedding_service, voice_service
+from app.services.sync_service import next_change_seq, sequenced_write
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Load VITS model
-tts = TTS(model_name="tts_models/en/ljspeech/vits", progress_bar=False, gpu=False)
+DEFAULT_MOOD = {"emoji": "😐", "label": "Neutral", "value": "neutral"}
+
+_tts = None
+_tts_lock = threading.Lock()
+
+
+def get_tts_service():
+    """Load the TTS model once, on first use."""
+    global _tts
+    if _tts is None:
+        with _tts_lock:
+            if _tts is None:
+                from app.services.tts_service import TTSService
+                _tts = TTSService()
+    return _tts
+
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+def synthesize(message: str) -> bytes:
+    return get_tts_service().generate_audio_response(message).getvalue()
 
-@router.post("/voice/")
-async def generate_speech(message: str):
+
+class SpeechRequest(BaseModel):
+    message: str
+
+
+@router.post("/", response_class=Response)
+async def generate_speech(request: SpeechRequest):
+    """Synthesize ``message`` and return the WAV audio."""
     try:
-        output_path = "output.wav"
-        tts.tts_to_file(text=message, file_path=output_path)
-        return {"audio_file": f"http://127.0.0.1:8000/static/{output_path}"}
+        audio = await run_in_threadpool(synthesize, request.message)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Speech synthesis failed: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=audio, media_type="audio/wav")
+
+
+@router.post("/entries/", response_model=JournalEntryResponse, status_code=status.HTTP_201_CREATED)
+async def create_voice_entry(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Create a journal entry from a recording.
+
+    Send ``multipart/form-data`` with the recording as the ``audio`` file part
+    and optionally ``content`` (a note or transcript), ``mood`` (JSON) and
+    ``tags`` (repeatable). The recording is streamed into GridFS as it arrives.
+    """
+    user_id = current_user["_id"]
+    try:
+        fields, recording = await voice_service.store_upload(request, user_id)
+    except voice_service.UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    try:
+        mood = MoodData.parse_obj(fields["mood"]).dict() if fields.get("mood") else DEFAULT_MOOD
+    except ValidationError:
+        await voice_service.delete_recording(recording["file_id"])
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid mood")
+
+    content = fields.get("content", "").strip()
+    journal_entry = {
+        "user_id": user_id,
+        "content": content or "Voice entry",
+        "mood": mood,
+        "tags": fields["tags"],
+        "created_at": datetime.utcnow(),
+        "updated_at": None,
+        "is_draft": False,
+        "ai_response": None,
+        "voice": recording,
+    }
+    async with sequenced_write(user_id) as session:
+        journal_entry["seq"] = await next_change_seq(user_id, session)
+        result = await Database.get_collection("journal_entries").insert_one(journal_entry, session=session)
+    journal_entry["id"] = str(result.inserted_id)
+    logger.info("Stored %d-byte voice entry %s", recording["length"], journal_entry["id"])
+    if content:
+        background_tasks.add_task(
+            embedding_service.index_entry_in_background, user_id, result.inserted_id, content
+        )
+    return journal_entry
+
+
+@router.get("/recordings/{file_id}")
+async def get_recording(
+    file_id: str,
+    request: Request,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Play back a recording, honouring ``Range`` requests so players can seek."""
+    grid_out = await voice_service.open_recording(file_id)
+    if grid_out is None or not same_user((grid_out.metadata or {}).get("user_id"), current_user["_id"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recording not found")
+
+    length = grid_out.length
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "private, max-age=86400"}
+    media_type = grid_out.metadata.get("content_type", "application/octet-stream")
+    try:
+        byte_range: Optional[tuple] = voice_service.parse_range(request.headers.get("range"), length)
+    except voice_service.RangeNotSatisfiable:
+        return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                        headers={"Content-Range": f"bytes */{length}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, length - 1, status.HTTP_200_OK
+    else:
+        (start, end), status_code = byte_range, status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(voice_service.iter_range(grid_out, start, end), status_code=status_code,
+                             media_type=media_type, headers=headers)
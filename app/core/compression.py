@@ -0,0 +1,164 @@
+"""
+ASGI middleware negotiating brotli or gzip compression for response bodies.
+
+Small bodies (below ``minimum_size``) are sent as-is since compression would
+cost more CPU than it saves on the wire. Already-encoded, partial-content and
+media responses are passed through untouched. Brotli is used when the
+``brotli`` package is installed and the client prefers it.
+"""
+import gzip
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+INCOMPRESSIBLE_PREFIXES = ("image/", "audio/", "video/", "application/zip", "application/gzip",
+                           "application/octet-stream")
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Map each accepted coding to its q-value."""
+    codings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[name.strip().lower()] = q
+    return codings
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    """Pick ``br`` or ``gzip`` (or None) from an Accept-Encoding header."""
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+    options = []
+    if brotli is not None:
+        options.append((codings.get("br", wildcard), 1, "br"))
+    options.append((codings.get("gzip", wildcard), 0, "gzip"))
+    q, _, name = max(options)
+    return name if q > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 produces a gzip container
+            self._impl = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        # Flush every chunk so streamed responses (e.g. SSE) aren't held back in the compressor
+        if self.encoding == "br":
+            return self._impl.process(data) + self._impl.flush()
+        return self._impl.compress(data) + self._impl.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._impl.finish() if self.encoding == "br" else self._impl.flush()
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(send, encoding, self.minimum_size, self.gzip_level, self.brotli_quality)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send, encoding: str, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._start: Optional[dict] = None
+        self._passthrough = False
+        self._compressor: Optional[_Compressor] = None
+
+    def _eligible(self, headers: List[Tuple[bytes, bytes]], status: int) -> bool:
+        if status < 200 or status in (204, 206, 304):
+            return False
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type" and value.decode("latin-1").startswith(INCOMPRESSIBLE_PREFIXES):
+                return False
+        return True
+
+    def _headers(self, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = [(k, v) for k, v in self._start["headers"] if k not in (b"content-length", b"vary")]
+        vary = [v for k, v in self._start["headers"] if k == b"vary"]
+        vary_value = b", ".join(vary + [b"Accept-Encoding"]) if vary else b"Accept-Encoding"
+        headers.append((b"vary", vary_value))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return headers
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self._start = message
+            self._passthrough = not self._eligible(list(message.get("headers", [])), message["status"])
+            if self._passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._compressor is None and not more_body:
+            # Whole body in one message: compress only if it is worth it
+            if len(body) < self.minimum_size:
+                await self._send(self._start)
+                await self._send(message)
+                return
+            compressed = compress_body(body, self.encoding, self.gzip_level, self.brotli_quality)
+            await self._send({**self._start, "headers": self._headers(len(compressed))})
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
+            return
+
+        if self._compressor is None:
+            # Streaming response: compress chunk by chunk without a Content-Length
+            self._compressor = _Compressor(self.encoding, self.gzip_level, self.brotli_quality)
+            await self._send({**self._start, "headers": self._headers(None)})
+        data = self._compressor.compress(body)
+        if not more_body:
+            data += self._compressor.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -1,8 +1,63 @@
 from pydantic import BaseSettings
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     MONGODB_URL: str = "your_mongodb_url"  # Optional, for database integration
+    # "mongo", or "sqlite" for single-node installs without a MongoDB server (data in SQLITE_PATH)
+    STORAGE_ENGINE: str = "mongo"
+    SQLITE_PATH: str = "emotional_diary.sqlite3"
     JWT_SECRET_KEY: str = "your_jwt_secret_key"  # Optional, for authentication
+    # Also match legacy string user ids until the ObjectId migration has been verified
+    USER_ID_LEGACY_READS: bool = True
+    # Responses smaller than this many bytes are not compressed
+    COMPRESSION_MIN_SIZE: int = 1024
+    # Journal entry embeddings: "hashing" (no model needed) or "sentence-transformers"
+    EMBEDDING_BACKEND: str = "hashing"
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_DIM: int = 256  # Hashing embedder only
+    # Entries older than this are moved to compressed archive buckets by app.jobs.archive_entries
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_BATCH_SIZE: int = 500
+    # A change sequence number reserved this long ago without its write finishing is given up on by sync
+    SYNC_PENDING_TIMEOUT_SECONDS: float = 60.0
+    DRAFT_TTL_DAYS: int = 30  # Drafts untouched for this long are deleted by a TTL index
+    # Draft autosaves are coalesced in memory: written after this much quiet, and at least this often while typing
+    DRAFT_AUTOSAVE_DEBOUNCE_SECONDS: float = 5.0
+    DRAFT_AUTOSAVE_MAX_DELAY_SECONDS: float = 30.0
+    # Heavy reads (mood tracker, export, insight jobs): "secondaryPreferred", "secondary", "nearest",
+    # "primaryPreferred" or "primary" to keep everything on the primary
+    ANALYTICS_READ_PREFERENCE: str = "secondaryPreferred"
+    ANALYTICS_MAX_STALENESS_SECONDS: int = 90  # MongoDB's minimum is 90
+    VOICE_MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024  # Voice journal recordings, stored in GridFS
+    # /analyze-journal/: chunk size (estimated tokens), concurrent LLM calls per request and the chunk limit
+    ANALYSIS_CHUNK_TOKENS: int = 1200
+    ANALYSIS_MAX_CONCURRENCY: int = 4
+    ANALYSIS_MAX_CHUNKS: int = 64
+    ANALYSIS_CACHE_TTL_DAYS: int = 30  # Cached chunk results expire after this long
+    # Sentiment cascade: lexicon results below this confidence are escalated to SENTIMENT_MODEL
+    SENTIMENT_THRESHOLD: float = 0.3
+    SENTIMENT_MODEL: str = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+    SENTIMENT_ESCALATION: bool = True  # False: lexicon only, never load the model
+    # Logging (app.core.log): "json" or "text" lines on stderr, written by a background thread
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    # Share of repeated INFO/DEBUG messages kept per route; override per route as {"GET /api/journal/": 1.0}
+    LOG_INFO_SAMPLE_RATE: float = 0.1
+    LOG_SAMPLE_RATES: Dict[str, float] = {}
+
+    # LLM backend: "openai" (any OpenAI-compatible API, e.g. GitHub Models) or "local" (in-process stand-in)
+    LLM_BACKEND: str = "openai"
+    LLM_ENDPOINT: str = "https://models.inference.ai.azure.com"
+    LLM_MODEL: str = "Meta-Llama-3.1-8B-Instruct"
+    LLM_API_KEY: Optional[str] = None  # Falls back to GITHUB_TOKEN
+    LLM_TIMEOUT: float = 20.0  # Per-attempt read timeout (seconds)
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_DEADLINE: float = 45.0  # Whole-call budget including retries (seconds)
+    LLM_MAX_RETRIES: int = 2
+    LLM_HEDGE_DELAY: float = 0.0  # Send a duplicate request after this many seconds; 0 disables hedging
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_RESET: float = 30.0
 
     class Config:
         env_file = ".env"  # You can keep this if you plan to use a .env file for other variables
@@ -0,0 +1,212 @@
+"""
+Process-wide logging, configured once and written off the event loop.
+
+``configure_logging`` gives the root logger a single ``QueueHandler``; a
+``QueueListener`` thread formats the records and writes them to stderr, so a
+log call on the event loop costs a filter check and a queue put. Records are
+queued unformatted and their ``%`` arguments are rendered in the listener
+thread, so pass values that will not change afterwards (ids, counts,
+strings), and never pre-format messages with f-strings.
+
+``RequestLogMiddleware`` remembers the request being served, so records carry
+its method and route, and INFO/DEBUG records logged while serving a request
+are sampled per route: the first of each message on a route is kept, then one
+in ``1 / rate`` (``LOG_SAMPLE_RATES["METHOD /route"]``, default
+``LOG_INFO_SAMPLE_RATE``). Kept records note how many they stand for in
+``sampled``. Warnings, errors and uvicorn's access log are never sampled.
+
+Journal text is kept out of the output: in dict (and pydantic model)
+arguments and ``extra`` fields, values under ``REDACTED_FIELDS`` keys are
+replaced by their length.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import multiprocessing.util
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+REDACTED_FIELDS = frozenset({"content", "answer", "message", "messages", "text", "ai_response", "password"})
+MAX_SAMPLED_MESSAGES = 10_000  # Per-process sampling counters kept before starting over
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+UNSAMPLED_LOGGERS = frozenset({"uvicorn.access"})  # One line per request, 5xx included; ops count on all of them
+
+# Attributes every LogRecord has; anything else was passed in ``extra``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "method", "route", "sampled"}
+
+_request: contextvars.ContextVar = contextvars.ContextVar("log_request", default=None)
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_pid: Optional[int] = None
+
+
+def _placeholder(value: Any) -> str:
+    return f"<redacted {len(value) if hasattr(value, '__len__') else 1}>"
+
+
+def redact(value: Any, depth: int = 0) -> Any:
+    """A copy of ``value`` with the values of ``REDACTED_FIELDS`` keys replaced by their length."""
+    if depth > 4:
+        return value
+    if isinstance(value, BaseModel):
+        value = value.dict()
+    if isinstance(value, dict):
+        return {key: _placeholder(item) if key in REDACTED_FIELDS else redact(item, depth + 1)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [redact(item, depth + 1) for item in value]
+        return tuple(items) if isinstance(value, tuple) else items
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    """Redact record arguments and extra fields (runs in the listener thread)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.msg, (dict, BaseModel)):
+            record.msg = redact(record.msg)
+        if record.args:
+            record.args = redact(record.args)
+        for key, value in list(vars(record).items()):
+            if key not in _RECORD_ATTRIBUTES:
+                setattr(record, key, _placeholder(value) if key in REDACTED_FIELDS else redact(value))
+        return True
+
+
+class RequestSampler(logging.Filter):
+    """Tag records with the current request and sample its INFO/DEBUG records per route."""
+
+    def __init__(self):
+        super().__init__()
+        self._counts: Dict[Tuple[str, str], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        scope = _request.get()
+        if scope is None:
+            return True
+        route = getattr(scope.get("route"), "path", None)  # Set once the router has matched
+        record.method, record.route = scope["method"], route
+        if record.levelno >= logging.WARNING or route is None or record.name in UNSAMPLED_LOGGERS:
+            return True
+        key = f"{record.method} {route}"
+        rate = settings.LOG_SAMPLE_RATES.get(key, settings.LOG_INFO_SAMPLE_RATE)
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        every = round(1 / rate)
+        counter = (key, record.msg if isinstance(record.msg, str) else type(record.msg).__name__)
+        if len(self._counts) >= MAX_SAMPLED_MESSAGES:
+            self._counts.clear()
+        seen = self._counts.get(counter, 0)
+        self._counts[counter] = seen + 1
+        if seen % every:
+            return False
+        record.sampled = every
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records as they are; the listener thread formats them."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key in ("method", "route", "sampled") or key not in _RECORD_ATTRIBUTES:
+                if value is not None:
+                    entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines, with the request's route when there is one."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        route = getattr(record, "route", None)
+        return f"{line} [{record.method} {route}]" if route else line
+
+
+class RequestLogMiddleware:
+    """ASGI middleware making the current request visible to ``RequestSampler``."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request.reset(token)
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """
+    Send all logging, uvicorn's included, through the background writer.
+
+    Later calls in the same process do nothing; a forked child (a job worker)
+    starts its own writer thread.
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+    output.addFilter(RedactingFilter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(records)
+    handler.addFilter(RequestSampler())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level or settings.LOG_LEVEL)
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener_pid = os.getpid()
+    _listener.start()
+    atexit.register(stop_logging)
+    multiprocessing.util.Finalize(None, stop_logging, exitpriority=-100)  # Pool workers skip atexit
+
+
+def stop_logging() -> None:
+    """Write out everything still queued and stop the writer thread."""
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
@@ -0,0 +1,257 @@
+"""
+In-process metrics exposed in the Prometheus text format.
+
+The collectors here are intentionally tiny: every hot-path update is a dict
+lookup plus a couple of integer/float additions, relying on the GIL instead
+of locks. A scrape may observe a histogram mid-update, which Prometheus
+tolerates (it only ever sees monotonically growing counters).
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, tuned for web requests and upstream calls.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; bucket counts are stored non-cumulatively and summed at render time."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, series in list(self._series.items()):
+            series = list(series)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            plain = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain} {series[-1]}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds every metric so the /metrics endpoint can render them."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("method",)))
+mongo_command_duration = registry.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("command", "status")))
+llm_time_to_first_token = registry.register(Histogram(
+    "llm_time_to_first_token_seconds", "Time until the first streamed LLM token", ("model",)))
+llm_request_duration = registry.register(Histogram(
+    "llm_request_duration_seconds", "Total LLM completion latency", ("model", "status")))
+llm_tokens = registry.register(Counter(
+    "llm_tokens_total", "LLM tokens consumed", ("model", "kind")))
+sentiment_classifications = registry.register(Counter(
+    "sentiment_classifications_total", "Messages classified, by the cascade tier that decided", ("tier",)))
+analysis_chunks = registry.register(Counter(
+    "journal_analysis_chunks_total", "Journal analysis chunks, by where the result came from", ("source",)))
+draft_autosaves = registry.register(Counter(
+    "journal_draft_autosaves_total", "Draft autosaves buffered in memory, and writes that persisted them",
+    ("outcome",)))
+tts_synthesis_duration = registry.register(Histogram(
+    "tts_synthesis_duration_seconds", "Text-to-speech synthesis time", ("model",)))
+event_loop_lag = registry.register(Histogram(
+    "event_loop_lag_seconds", "Delay between a scheduled wake-up and when the event loop ran it",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and in-flight request counts.
+
+    Routes are labelled by their path template (e.g. ``/{entry_id}``) rather than
+    the raw path so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        # The route is only known once the router has matched, so in-flight
+        # requests are tracked per method.
+        http_requests_in_flight.inc(1, method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec(1, method)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(elapsed, method, path, str(status_holder[0]))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Records per-command MongoDB durations from the driver's own timings."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name, "ok")
+
+    def failed(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name, "error")
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Sleep in a loop and record how late each wake-up was."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - expected))
+
+
+_lag_task: Optional[asyncio.Task] = None
+
+
+def start_event_loop_monitor(interval: float = 0.5) -> None:
+    """Start the lag monitor on the running loop (idempotent)."""
+    global _lag_task
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.get_running_loop().create_task(monitor_event_loop_lag(interval))
+
+
+def stop_event_loop_monitor() -> None:
+    """Cancel the lag monitor task if it is running."""
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        _lag_task = None
@@ -1,13 +1,18 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket
 from pymongo.errors import ConnectionFailure
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 from fastapi import HTTPException
 import logging
 import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from typing import Optional
 # Removed SONManipulator import as it is no longer available in recent PyMongo versions
 from bson import ObjectId
 from pydantic import BaseModel, Field
 from app.core.config import settings
+from app.core.metrics import MongoCommandListener
 
 
 logger = logging.getLogger(__name__)
@@ -16,6 +21,58 @@ client = AsyncIOMotorClient(settings.MONGODB_URL)
 db = client["emotional_support_db"]
 journal_collection = db["journal_entries"]
 
+# Workloads for Database.get_collection. Interactive reads (including every
+# read-your-writes path) always use the primary; analytics reads follow
+# ANALYTICS_READ_PREFERENCE, bounded by ANALYTICS_MAX_STALENESS_SECONDS.
+INTERACTIVE = "interactive"
+ANALYTICS = "analytics"
+
+READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def analytics_read_preference():
+    """Read preference for heavy reads; "primary" turns routing off."""
+    name = settings.ANALYTICS_READ_PREFERENCE
+    if name == "primary":
+        return Primary()
+    return READ_PREFERENCES[name](max_staleness=settings.ANALYTICS_MAX_STALENESS_SECONDS)
+
+class _RecentWrites:
+    """Where each user's latest write in this process ended, for causally consistent reads."""
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._tokens: "OrderedDict[ObjectId, tuple]" = OrderedDict()
+
+    def remember(self, user_id: ObjectId, cluster_time, operation_time) -> None:
+        self._tokens[user_id] = (cluster_time, operation_time, time.monotonic())
+        self._tokens.move_to_end(user_id)
+        while len(self._tokens) > self.max_users:
+            self._tokens.popitem(last=False)
+
+    def get(self, user_id: ObjectId) -> Optional[tuple]:
+        token = self._tokens.get(user_id)
+        # Past the staleness bound, secondaries that may serve the read have caught up anyway
+        if token is None or time.monotonic() - token[2] > settings.ANALYTICS_MAX_STALENESS_SECONDS:
+            return None
+        return token
+
+recent_writes = _RecentWrites()
+
+class ReadContext:
+    """Workload and (optional) session to use for a group of related reads."""
+
+    def __init__(self, workload: str, session=None):
+        self.workload = workload
+        self.session = session
+
+    def collection(self, collection_name: str):
+        return Database.get_collection(collection_name, self.workload)
+
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     db_name: str = "emotional_diary"
@@ -23,19 +80,24 @@ class Database:
 
     @classmethod
     async def connect(cls):
-        """Connect to MongoDB."""
+        """Connect to MongoDB, or open the SQLite database when ``STORAGE_ENGINE`` is "sqlite"."""
+        if settings.STORAGE_ENGINE == "sqlite":
+            from app.storage.sqlite_engine import SQLiteClient
+            cls.client = SQLiteClient(settings.SQLITE_PATH)
+            logger.info("Opened SQLite database %s", settings.SQLITE_PATH)
+            return
         try:
-            cls.client = AsyncIOMotorClient(cls.mongo_url)
-            print("Connected to MongoDB")
+            cls.client = AsyncIOMotorClient(cls.mongo_url, event_listeners=[MongoCommandListener()])
+            logger.info("Connected to MongoDB")
         except ConnectionFailure as e:
-            print(f"Failed to connect to MongoDB: {e}")
+            logger.error("Failed to connect to MongoDB: %s", e)
 
     @staticmethod
     async def disconnect():
-        """Disconnect from MongoDB."""
+        """Disconnect from MongoDB (or close the SQLite database)."""
         if Database.client:
             Database.client.close()
-            print("Disconnected from MongoDB")
+            logger.info("Disconnected from the database")
 
     @classmethod
     def get_db(cls):
@@ -45,10 +107,91 @@ class Database:
         return cls.client[cls.db_name]
 
     @staticmethod
-    def get_collection(collection_name: str):
-        """Get a MongoDB collection."""
+    def get_collection(collection_name: str, workload: str = INTERACTIVE):
+        """Get a MongoDB collection, reading from secondaries for the analytics workload."""
         db_name = os.getenv("MONGO_DB_NAME", "emotional_support_db")
-        return Database.client[db_name][collection_name]
+        collection = Database.client[db_name][collection_name]
+        if workload == ANALYTICS:
+            return collection.with_options(read_preference=analytics_read_preference())
+        return collection
+
+    @staticmethod
+    def get_gridfs_bucket(bucket_name: str):
+        """Get a GridFS bucket for large binary files (e.g. voice recordings)."""
+        database = Database.client[os.getenv("MONGO_DB_NAME", "emotional_support_db")]
+        if not isinstance(database, AsyncIOMotorDatabase):
+            return database.gridfs_bucket(bucket_name)  # SQLite engine or benchmarks.memory_mongo stand-in
+        return AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name)
+
+    @staticmethod
+    @asynccontextmanager
+    async def write_session(user_id):
+        """
+        Causally consistent session for a user's writes.
+
+        Where the session ends up is remembered so that the user's next
+        analytics reads (see ``analytics_reads``) observe these writes even
+        when they are served by a secondary.
+        """
+        async with await Database.client.start_session(causal_consistency=True) as session:
+            yield session
+            if session.operation_time is not None:
+                recent_writes.remember(to_object_id(user_id), session.cluster_time, session.operation_time)
+
+    @staticmethod
+    @asynccontextmanager
+    async def analytics_reads(user: dict):
+        """
+        Route a user's heavy reads to secondaries without losing their own writes.
+
+        Reads run in a causally consistent session. After a write from this
+        process, the session continues from that write, so a secondary waits
+        until it has applied it. Otherwise the session first reads the user's
+        ``change_seq`` from a secondary; if that lags what authentication saw
+        on the primary (a write through another process), the reads go to the
+        primary instead.
+        """
+        if settings.ANALYTICS_READ_PREFERENCE == "primary" or settings.STORAGE_ENGINE == "sqlite":
+            yield ReadContext(INTERACTIVE)  # Nothing to route to
+            return
+        user_id = to_object_id(user["_id"])
+        async with await Database.client.start_session(causal_consistency=True) as session:
+            token = recent_writes.get(user_id)
+            if token is not None:
+                session.advance_cluster_time(token[0])
+                session.advance_operation_time(token[1])
+                context = ReadContext(ANALYTICS, session)
+            else:
+                seen = await Database.get_collection("users", ANALYTICS).find_one(
+                    user_id_filter(user_id, "_id"), {"change_seq": 1}, session=session
+                )
+                fresh = seen is not None and seen.get("change_seq", 0) >= user.get("change_seq", 0)
+                context = ReadContext(ANALYTICS, session) if fresh else ReadContext(INTERACTIVE)
+            yield context
+
+    @staticmethod
+    async def ensure_indexes():
+        """Create the indexes the API's queries rely on."""
+        await Database.get_collection("users").create_index("email")
+        await Database.get_collection("journal_entries").create_index([("user_id", 1), ("created_at", -1)])
+        await Database.get_collection("journal_entries").create_index([("user_id", 1), ("seq", 1)])
+        await Database.get_collection("journal_entries").create_index(
+            "draft_expires_at", expireAfterSeconds=0, partialFilterExpression={"is_draft": True}
+        )
+        await Database.get_collection("journal_entries").create_index(
+            [("user_id", 1), ("draft_session", 1)], unique=True,
+            partialFilterExpression={"draft_session": {"$exists": True}}
+        )
+        await Database.get_collection("journal_archive").create_index([("user_id", 1), ("last_created_at", -1)])
+        await Database.get_collection("journal_archive").create_index([("user_id", 1), ("max_seq", 1)])
+        await Database.get_collection("journal_archive").create_index("entry_ids")
+        await Database.get_collection("journal_tombstones").create_index([("user_id", 1), ("seq", 1)])
+        await Database.get_collection("entry_embeddings").create_index([("user_id", 1), ("model", 1)])
+        await Database.get_collection("analysis_cache").create_index(
+            "created_at", expireAfterSeconds=settings.ANALYSIS_CACHE_TTL_DAYS * 86400
+        )
+        await Database.get_collection("weekly_insights").create_index([("user_id", 1), ("week_start", 1)], unique=True)
+        await Database.get_collection("reflection_answers").create_index([("user_id", 1), ("question", 1)])
     
     # Removed ID conversion hook as SONManipulator is no longer supported
 
@@ -67,6 +210,35 @@ class PyObjectId(ObjectId):
     def __modify_schema__(cls, field_schema):
         field_schema.update(type="string")
         
+def to_object_id(value) -> ObjectId:
+    """Return the canonical ObjectId form of a user id given as an ObjectId or 24-character hex string."""
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    raise ValueError(f"Invalid user id: {value!r}")
+
+def user_id_filter(user_id, field: str = "user_id") -> dict:
+    """
+    Equality filter on a user id field.
+
+    User ids are stored as ObjectIds. While ``USER_ID_LEGACY_READS`` is enabled
+    (until the migration in ``app.migrations.user_id_objectid`` has been verified)
+    the legacy string form is matched too; a two-value ``$in`` is still just two
+    index point lookups.
+    """
+    object_id = to_object_id(user_id)
+    if settings.USER_ID_LEGACY_READS:
+        return {field: {"$in": [object_id, str(object_id)]}}
+    return {field: object_id}
+
+def same_user(a, b) -> bool:
+    """Compare two user ids regardless of whether either is in the legacy string form."""
+    try:
+        return to_object_id(a) == to_object_id(b)
+    except ValueError:
+        return False
+
 class MongoModel(BaseModel):
     id: Optional[PyObjectId] = Field(alias="_id")
 
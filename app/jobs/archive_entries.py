@@ -0,0 +1,163 @@
+"""
+Move journal entries older than ``ARCHIVE_AFTER_DAYS`` into compressed archive buckets.
+
+Users are processed in ``_id`` order and progress is checkpointed in
+``batch_jobs``, so an interrupted run resumes with the next user. For each user
+the oldest published entries before the cutoff are taken ``--batch-size`` at a
+time, grouped by calendar month, written to ``journal_archive`` and only then
+deleted from ``journal_entries`` (see ``app.services.archive_service``) along
+with their embeddings. An entry edited or deleted in between is taken back out
+of its bucket and left for the next run.
+
+Drafts are never archived; abandoned ones are removed by the TTL index on
+``draft_expires_at``. The job also stamps that field on drafts written before
+it existed.
+
+Usage:
+    python -m app.jobs.archive_entries [--older-than-days 365] [--batch-size 500] [--pause 0.1]
+    python -m app.jobs.archive_entries --restart
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.core.log import configure_logging
+from app.db import Database, to_object_id, user_id_filter
+from app.services import embedding_service
+from app.services.archive_service import build_bucket, month_start, store_bucket, unarchive_entries
+from app.services.sync_service import backfill_change_seqs
+
+logger = logging.getLogger(__name__)
+
+JOB_ID = "archive_entries"
+
+
+async def load_checkpoint() -> dict:
+    checkpoint = await Database.get_collection("batch_jobs").find_one({"_id": JOB_ID})
+    return checkpoint or {"_id": JOB_ID, "status": "done"}
+
+
+async def save_checkpoint(checkpoint: dict) -> None:
+    checkpoint["updated_at"] = datetime.utcnow()
+    await Database.get_collection("batch_jobs").replace_one({"_id": JOB_ID}, checkpoint, upsert=True)
+
+
+async def archive_user(user: dict, cutoff: datetime, batch_size: int) -> int:
+    """Archive one user's published entries created before ``cutoff``; return how many moved."""
+    user_id = to_object_id(user["_id"])
+    if not user.get("sync_backfilled"):
+        # Archived entries keep their sequence number so syncing clients can still fetch them
+        await backfill_change_seqs({**user, "_id": user_id})
+    # Raise the read horizon first: until the move finishes, readers check the archive more often, never less
+    await Database.get_collection("users").update_one(
+        user_id_filter(user_id, "_id"), {"$max": {"archived_through": cutoff}}
+    )
+
+    journal_collection = Database.get_collection("journal_entries")
+    query = {**user_id_filter(user_id), "created_at": {"$lt": cutoff}, "is_draft": {"$ne": True}}
+    moved = 0
+    changed = []  # Edited while being archived; left for the next run
+    while True:
+        if changed:
+            query["_id"] = {"$nin": changed}
+        batch = await journal_collection.find(query).sort("created_at", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return moved
+        by_month = defaultdict(list)
+        for entry in batch:
+            entry["user_id"] = user_id
+            by_month[month_start(entry["created_at"])].append(entry)
+        for entries in by_month.values():
+            await store_bucket(build_bucket(user_id, entries))
+        # Every write gives an entry a new seq, so only the versions just archived are deleted
+        result = await journal_collection.delete_many(
+            {"$or": [{"_id": entry["_id"], "seq": entry.get("seq")} for entry in batch]}
+        )
+        moved += result.deleted_count
+        ids = [entry["_id"] for entry in batch]
+        edited = []
+        if result.deleted_count < len(batch):
+            edited = [doc["_id"] for doc in await journal_collection.find({"_id": {"$in": ids}}, {"_id": 1})
+                      .to_list(None)]
+            deleted = [doc["entry_id"] for doc in await Database.get_collection("journal_tombstones")
+                       .find({"entry_id": {"$in": ids}}, {"entry_id": 1}).to_list(None)]
+            await unarchive_entries(edited + deleted)
+            changed += edited
+        # Archived entries are out of similarity search; they are re-embedded if restored
+        await embedding_service.remove_entries(user_id, [entry_id for entry_id in ids if entry_id not in edited])
+
+
+async def stamp_draft_expiry() -> int:
+    """Give drafts written before the TTL index existed an expiry date."""
+    result = await Database.get_collection("journal_entries").update_many(
+        {"is_draft": True, "draft_expires_at": {"$exists": False}},
+        {"$set": {"draft_expires_at": datetime.utcnow() + timedelta(days=settings.DRAFT_TTL_DAYS)}},
+    )
+    return result.modified_count
+
+
+async def run_archive(older_than_days: int, batch_size: int, pause: float, restart: bool = False) -> dict:
+    checkpoint = await load_checkpoint()
+    if restart or checkpoint["status"] == "done":
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        checkpoint = {"_id": JOB_ID, "status": "running", "cutoff": cutoff, "last_user_id": None,
+                      "users_done": 0, "entries_archived": 0, "started_at": datetime.utcnow()}
+        await save_checkpoint(checkpoint)
+    # Resumed runs keep the original cutoff so every user is archived to the same point
+
+    query = {"_id": {"$gt": checkpoint["last_user_id"]}} if checkpoint["last_user_id"] is not None else {}
+    users = Database.get_collection("users").find(query, {"_id": 1, "sync_backfilled": 1}).sort("_id", 1)
+    async for user in users.batch_size(100):
+        try:
+            moved = await archive_user(user, checkpoint["cutoff"], batch_size)
+        except ValueError:
+            logger.warning("Skipping user with non-ObjectId id %r", user["_id"])
+            moved = 0
+        checkpoint["last_user_id"] = user["_id"]
+        checkpoint["users_done"] += 1
+        checkpoint["entries_archived"] += moved
+        await save_checkpoint(checkpoint)
+        if moved:
+            logger.info("Archived %d entries for user %s", moved, user["_id"])
+            await asyncio.sleep(pause)
+
+    stamped = await stamp_draft_expiry()
+    if stamped:
+        logger.info("Set an expiry on %d older drafts", stamped)
+    checkpoint["status"] = "done"
+    checkpoint["finished_at"] = datetime.utcnow()
+    await save_checkpoint(checkpoint)
+    return checkpoint
+
+
+async def run(older_than_days: int, batch_size: int, pause: float, restart: bool) -> dict:
+    Database.mongo_url = os.getenv("MONGO_URL", Database.mongo_url)
+    await Database.connect()
+    try:
+        await Database.ensure_indexes()
+        return await run_archive(older_than_days, batch_size, pause, restart)
+    finally:
+        await Database.disconnect()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Archive old journal entries into compressed monthly buckets")
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0.1, help="seconds to sleep after each archived user")
+    parser.add_argument("--restart", action="store_true", help="ignore an unfinished run and start over")
+    args = parser.parse_args(argv)
+    configure_logging()
+    checkpoint = asyncio.run(run(args.older_than_days, args.batch_size, args.pause, args.restart))
+    logger.info("Archived %d entries for %d users (cutoff %s)", checkpoint["entries_archived"],
+                checkpoint["users_done"], checkpoint["cutoff"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+Offline batch job computing every user's weekly insight digest.
+
+Users are streamed from ``users`` in ``_id`` order and cut into shards that
+run in a process pool. Each shard fetches the whole week of entries for all of
+its users with one query, computes the statistics (and, with ``--summaries``,
+an LLM-written summary) and upserts the results into ``weekly_insights`` with a
+single unordered ``bulk_write``.
+
+Progress is checkpointed in ``batch_jobs`` as the last user of the longest run
+of finished shards, so a crashed or interrupted run resumes after it. Upserts
+are keyed on ``(user_id, week_start)``, which makes re-running a shard that
+finished after the checkpoint harmless.
+
+Usage:
+    python -m app.jobs.weekly_insights [--week 2024-06-03] [--workers 4] [--shard-size 200] [--summaries]
+    python -m app.jobs.weekly_insights --restart
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.core.log import configure_logging
+from app.db import ANALYTICS, Database, to_object_id
+from app.services.insight_service import compute_weekly_stats, last_complete_week, summary_messages, week_bounds
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "weekly_insights"
+SUMMARY_CONCURRENCY = 8  # LLM calls in flight per worker process
+
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def job_id(week_start: datetime) -> str:
+    return f"{JOB_NAME}:{week_start:%Y-%m-%d}"
+
+
+async def load_checkpoint(week_start: datetime) -> dict:
+    checkpoint = await Database.get_collection("batch_jobs").find_one({"_id": job_id(week_start)})
+    return checkpoint or {"_id": job_id(week_start), "status": "running", "last_user_id": None,
+                          "users_done": 0, "shards_done": 0, "started_at": datetime.utcnow()}
+
+
+async def save_checkpoint(checkpoint: dict) -> None:
+    checkpoint["updated_at"] = datetime.utcnow()
+    await Database.get_collection("batch_jobs").replace_one({"_id": checkpoint["_id"]}, checkpoint, upsert=True)
+
+
+async def summarize(stats: Dict[str, Any], entries: List[Dict[str, Any]], limit: asyncio.Semaphore) -> Optional[str]:
+    from app.services.llm import LLMError, get_llm_provider
+
+    async with limit:
+        try:
+            result = await get_llm_provider().complete(summary_messages(stats, entries))
+        except LLMError as e:
+            logger.warning("Summary failed, storing statistics only: %s", e)
+            return None
+    return result.content
+
+
+async def process_shard(user_ids: List[Any], week_start: datetime, summaries: bool) -> int:
+    """Compute and store digests for one shard of users; return how many were written."""
+    _, week_end = week_bounds(week_start.date())
+    user_ids = [to_object_id(user_id) for user_id in user_ids]
+
+    # One query for the whole shard (legacy string ids are matched too), served by a secondary
+    cursor = Database.get_collection("journal_entries", ANALYTICS).find(
+        {
+            "user_id": {"$in": user_ids + [str(user_id) for user_id in user_ids]},
+            "created_at": {"$gte": week_start, "$lt": week_end},
+            "is_draft": {"$ne": True},
+        },
+        {"user_id": 1, "content": 1, "mood": 1, "tags": 1, "created_at": 1},
+    )
+    by_user: Dict[Any, List[Dict[str, Any]]] = {user_id: [] for user_id in user_ids}
+    async for entry in cursor:
+        by_user[to_object_id(entry["user_id"])].append(entry)
+
+    stats = {user_id: compute_weekly_stats(entries, week_start) for user_id, entries in by_user.items()}
+    summary_by_user: Dict[Any, Optional[str]] = {}
+    if summaries:
+        limit = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+        with_entries = [user_id for user_id, entries in by_user.items() if entries]
+        results = await asyncio.gather(*(summarize(stats[user_id], by_user[user_id], limit)
+                                         for user_id in with_entries))
+        summary_by_user = dict(zip(with_entries, results))
+
+    computed_at = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"user_id": user_id, "week_start": week_start},
+            {"$set": {**user_stats, "summary": summary_by_user.get(user_id), "computed_at": computed_at}},
+            upsert=True,
+        )
+        for user_id, user_stats in stats.items()
+    ]
+    await Database.get_collection("weekly_insights").bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def _init_worker(mongo_url: str, db_name: Optional[str]) -> None:
+    """Give each worker process its own event loop and Mongo connection for its lifetime."""
+    global _worker_loop
+    if db_name:
+        os.environ["MONGO_DB_NAME"] = db_name
+    configure_logging()
+    Database.mongo_url = mongo_url
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _worker_loop.run_until_complete(Database.connect())
+
+
+def _run_shard_in_worker(user_ids: List[Any], week_start: datetime, summaries: bool) -> int:
+    return _worker_loop.run_until_complete(process_shard(user_ids, week_start, summaries))
+
+
+async def stream_shards(after, shard_size: int):
+    """Yield lists of user ids in ``_id`` order, starting after ``after``."""
+    query = {"_id": {"$gt": after}} if after is not None else {}
+    shard = []
+    users = Database.get_collection("users", ANALYTICS).find(query, {"_id": 1}).sort("_id", 1)
+    async for user in users.batch_size(shard_size):
+        try:
+            to_object_id(user["_id"])
+        except ValueError:
+            logger.warning("Skipping user with non-ObjectId id %r", user["_id"])
+            continue
+        shard.append(user["_id"])
+        if len(shard) == shard_size:
+            yield shard
+            shard = []
+    if shard:
+        yield shard
+
+
+async def run_week(week_start: datetime, workers: int, shard_size: int, summaries: bool,
+                   restart: bool = False) -> dict:
+    """
+    Compute digests for every user for the week starting at ``week_start``.
+
+    ``workers=0`` runs shards in this process, on the current event loop and
+    database connection.
+    """
+    checkpoint = await load_checkpoint(week_start)
+    if restart or checkpoint["status"] == "done":
+        checkpoint = {"_id": job_id(week_start), "status": "running", "last_user_id": None,
+                      "users_done": 0, "shards_done": 0, "started_at": datetime.utcnow()}
+    await save_checkpoint(checkpoint)
+
+    loop = asyncio.get_running_loop()
+    pool = None
+    if workers:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(Database.mongo_url, os.getenv("MONGO_DB_NAME")))
+    in_flight = set()
+    shards: Dict[int, List[Any]] = {}  # Submitted but not yet covered by the checkpoint
+    finished = set()
+    next_to_commit = 0
+    max_in_flight = max(1, workers) * 2
+
+    async def run_shard(user_ids: List[Any]) -> int:
+        if pool is not None:
+            return await loop.run_in_executor(pool, _run_shard_in_worker, user_ids, week_start, summaries)
+        return await process_shard(user_ids, week_start, summaries)
+
+    async def settle(done) -> None:
+        nonlocal next_to_commit
+        for task in done:
+            in_flight.discard(task)
+            finished.add(task.result())  # Re-raises a shard failure; the checkpoint keeps earlier progress
+        # Only advance over a contiguous run, so no unfinished shard is ever skipped on resume
+        advanced = False
+        while next_to_commit in finished:
+            finished.discard(next_to_commit)
+            user_ids = shards.pop(next_to_commit)
+            checkpoint["last_user_id"] = user_ids[-1]
+            checkpoint["users_done"] += len(user_ids)
+            checkpoint["shards_done"] += 1
+            next_to_commit += 1
+            advanced = True
+        if advanced:
+            await save_checkpoint(checkpoint)
+            logger.info("Week %s: %d users done", f"{week_start:%Y-%m-%d}", checkpoint["users_done"])
+
+    async def tracked(number: int, user_ids: List[Any]) -> int:
+        await run_shard(user_ids)
+        return number
+
+    try:
+        number = 0
+        async for user_ids in stream_shards(checkpoint["last_user_id"], shard_size):
+            shards[number] = user_ids
+            in_flight.add(asyncio.ensure_future(tracked(number, user_ids)))
+            number += 1
+            if len(in_flight) >= max_in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                await settle(done)
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            await settle(done)
+    finally:
+        for task in in_flight:
+            task.cancel()
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    checkpoint["status"] = "done"
+    checkpoint["finished_at"] = datetime.utcnow()
+    await save_checkpoint(checkpoint)
+    return checkpoint
+
+
+async def run(week_start: datetime, workers: int, shard_size: int, summaries: bool, restart: bool) -> dict:
+    Database.mongo_url = os.getenv("MONGO_URL", Database.mongo_url)
+    await Database.connect()
+    try:
+        await Database.ensure_indexes()
+        return await run_week(week_start, workers, shard_size, summaries, restart)
+    finally:
+        if summaries and workers == 0:
+            from app.services.llm import close_llm_provider
+            await close_llm_provider()
+        await Database.disconnect()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compute weekly insight digests for all users")
+    parser.add_argument("--week", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        help="any day in the week to compute (default: last complete week)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes; 0 runs shards in-process")
+    parser.add_argument("--shard-size", type=int, default=200)
+    parser.add_argument("--summaries", action="store_true", help="also ask the LLM for a written summary")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    args = parser.parse_args(argv)
+    configure_logging()
+    week_start = week_bounds(args.week)[0] if args.week else last_complete_week()
+    checkpoint = asyncio.run(run(week_start, args.workers, args.shard_size, args.summaries, args.restart))
+    logger.info("Week %s complete: %d users in %d shards", f"{week_start:%Y-%m-%d}",
+                checkpoint["users_done"], checkpoint["shards_done"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -234,7 +234,7 @@ export default function EnhancedJournal() {
 
     setIsAnalyzing(true); // Show loading state
     try {
-      const response = await fetch("http://127.0.0.1:8000/api/analyze-journal/", {
+      const response = await fetch("http://127.0.0.1:8000/api/journal/analyze-journal/", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -248,7 +248,9 @@ export default function EnhancedJournal() {
       }
 
       const data = await response.json();
-      setAiResponse(data.analysis); // Update the AI response state
+      const { sentiment, emotions, suggestions } = data.analysis;
+      const feelings = emotions.length ? ` You seem to be feeling ${emotions.join(", ")}.` : "";
+      setAiResponse(`Overall tone: ${sentiment}.${feelings} ${suggestions.join(" ")}`.trim()); // Update the AI response state
     } catch (error) {
       console.error("Error analyzing journal entry:", error);
       alert("An error occurred while analyzing the journal entry.");
@@ -1,18 +1,27 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import auth, journal, emotion
+from fastapi.responses import Response
+from app.api.endpoints import auth, journal, emotion, voice
 from app.api.endpoints.chat import router as chat_router
 from app.db import Database
+from app.core import metrics
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.log import RequestLogMiddleware, configure_logging
+from app.services.llm import close_llm_provider
+from app.services import draft_service
 import os
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+configure_logging()
 
-# Access the GitHub token
+
+# Access the GitHub token (used as the LLM API key unless LLM_API_KEY is set)
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
+if not GITHUB_TOKEN and settings.LLM_BACKEND == "openai" and not settings.LLM_API_KEY:
     raise ValueError("GITHUB_TOKEN environment variable is not set.")
 
 # Create FastAPI app
@@ -31,6 +40,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiate gzip/brotli for larger response bodies
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
+# Tag log records with the request's route (and sample them per route)
+app.add_middleware(RequestLogMiddleware)
+
+# Record per-route latency; added last so it wraps every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Get MongoDB URL from environment variable
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 
@@ -38,25 +56,38 @@ MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 async def startup_db_client():
     """Connect to the database on startup."""
     await Database.connect()
+    await Database.ensure_indexes()
+    metrics.start_event_loop_monitor()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close the database connection on shutdown."""
+    metrics.stop_event_loop_monitor()
+    await draft_service.flush_all()
+    await close_llm_provider()
     await Database.disconnect()
 
+# Registered before the routers: the journal router is also mounted at the root,
+# and its "/{entry_id}" route would otherwise capture these paths.
+@app.get("/health")
+async def health_check():
+    """Health check endpoint."""
+    return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Expose collected metrics in the Prometheus text format."""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(journal.router, prefix="/api/journal", tags=["Journal Entries and Mood Tracker"])
 app.include_router(journal.router, tags=["Journal"])
 app.include_router(chat_router, prefix="/chat", tags=["Chat"])
+app.include_router(voice.router, prefix="/voice", tags=["Voice"])
 
 
 @app.get("/")
 async def root():
     """Root endpoint."""
-    return {"message": "Welcome to the Emotional Support Diary API"}
-
-@app.get("/health")
-async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"message": "Welcome to the Emotional Support Diary API"}
\ No newline at end of file
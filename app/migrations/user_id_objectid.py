@@ -0,0 +1,242 @@
+"""
+Online migration of user ids from ``str(ObjectId())`` strings to real ObjectIds.
+
+Converts ``users._id`` plus ``journal_entries.user_id`` and
+``reflection_answers.user_id`` in throttled batches, checkpointing progress in
+the ``migrations`` collection so an interrupted run resumes where it stopped.
+The API keeps working throughout: while ``USER_ID_LEGACY_READS`` is enabled its
+queries match both forms, and new writes already use ObjectIds.
+
+Before a user's documents are touched, the ids of their journal entries (as
+returned by the indexed ``user_id`` query) are fingerprinted. The ``verify``
+phase re-runs the query with a plain ObjectId equality match and checks it
+returns exactly the same entries, and that no string-typed ids remain apart
+from users whose id is not an ObjectId at all: those are skipped, listed in the
+checkpoint and reported by ``verify`` for manual clean-up rather than failing
+it. Once it passes, ``USER_ID_LEGACY_READS`` can be switched off.
+
+A user document cannot change ``_id`` in place, so it is copied under the
+ObjectId and the legacy document deleted only if the fields the API writes to
+it are unchanged since the copy; otherwise the copy is redone.
+
+Usage:
+    python -m app.migrations.user_id_objectid [--batch-size 200] [--pause 0.2]
+    python -m app.migrations.user_id_objectid --verify-only
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+
+from app.core.log import configure_logging
+from app.db import Database
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "user_id_objectid"
+CHILD_COLLECTIONS = ("journal_entries", "reflection_answers")
+# Fields the API updates on a user document; the legacy copy is only deleted while they are unchanged
+MUTABLE_USER_FIELDS = ("change_seq", "sync_pending", "sync_backfilled", "archived_through")
+
+
+def _collection(name: str):
+    return Database.get_collection(name)
+
+
+async def load_checkpoint() -> dict:
+    checkpoint = await _collection("migrations").find_one({"_id": MIGRATION_ID})
+    return checkpoint or {"_id": MIGRATION_ID, "phase": "users", "users_done": 0, "entries_converted": 0,
+                          "skipped": []}
+
+
+async def save_checkpoint(checkpoint: dict) -> None:
+    checkpoint["updated_at"] = datetime.utcnow()
+    await _collection("migrations").replace_one({"_id": MIGRATION_ID}, checkpoint, upsert=True)
+
+
+async def fingerprint(query: dict) -> dict:
+    """Count and hash the journal entry ids a query returns, remembering the newest id seen."""
+    digest = hashlib.sha1()
+    count = 0
+    last_id = None
+    cursor = _collection("journal_entries").find(query, {"_id": 1}).sort("_id", 1)
+    async for entry in cursor:
+        digest.update(str(entry["_id"]).encode())
+        count += 1
+        last_id = entry["_id"]
+    return {"count": count, "digest": digest.hexdigest(), "last_id": last_id}
+
+
+async def migrate_user(legacy_id: str) -> int:
+    """Convert one user and the documents that reference it; return journal entries converted."""
+    object_id = ObjectId(legacy_id)
+
+    # Fingerprint what the user could see before anything moves (kept from the first attempt on resume)
+    before = await fingerprint({"user_id": {"$in": [legacy_id, object_id]}})
+    await _collection("migration_verification").update_one(
+        {"_id": object_id},
+        {"$setOnInsert": {"migration": MIGRATION_ID, "before": before}},
+        upsert=True,
+    )
+
+    converted = 0
+    for name in CHILD_COLLECTIONS:
+        result = await _collection(name).update_many({"user_id": legacy_id}, {"$set": {"user_id": object_id}})
+        if name == "journal_entries":
+            converted = result.modified_count
+
+    # _id is immutable: copy the user under the new id, then remove the legacy document unless
+    # it was written to after the copy, in which case copy it again
+    users = _collection("users")
+    while True:
+        user = await users.find_one({"_id": legacy_id})
+        if user is None:
+            return converted
+        current = await users.find_one({"_id": object_id})  # From an interrupted run or an earlier pass
+        await users.replace_one({"_id": object_id}, merge_user(user, current, object_id), upsert=True)
+        unchanged = {"_id": legacy_id}
+        for field in MUTABLE_USER_FIELDS:
+            unchanged[field] = user[field] if field in user else {"$exists": False}
+        if (await users.delete_one(unchanged)).deleted_count:
+            return converted
+        logger.info("User %s changed while being copied, copying again", legacy_id)
+
+
+def merge_user(legacy: dict, current: Optional[dict], object_id: ObjectId) -> dict:
+    """Return the legacy user document under ``object_id``, keeping anything ``current`` is ahead on."""
+    user = {**legacy, "_id": object_id}
+    if current is None:
+        return user
+    # Never move a sync token or the archive horizon backwards, and keep every in-flight write marker
+    for field in ("change_seq", "archived_through"):
+        values = [doc[field] for doc in (legacy, current) if doc.get(field) is not None]
+        if values:
+            user[field] = max(values)
+    pending = list(legacy.get("sync_pending", []))
+    tokens = {marker["token"] for marker in pending}
+    pending += [marker for marker in current.get("sync_pending", []) if marker["token"] not in tokens]
+    if pending:
+        user["sync_pending"] = pending
+    return user
+
+
+async def migrate_users(checkpoint: dict, batch_size: int, pause: float) -> None:
+    users = _collection("users")
+    while True:
+        query = {"_id": {"$type": "string"}}
+        if checkpoint.get("last_user_id"):
+            query["_id"]["$gt"] = checkpoint["last_user_id"]
+        batch = await users.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return
+        for user in batch:
+            legacy_id = user["_id"]
+            if not ObjectId.is_valid(legacy_id):
+                logger.warning("Skipping user with non-ObjectId id %r", legacy_id)
+                if legacy_id not in checkpoint["skipped"]:  # Already listed if this batch is being resumed
+                    checkpoint["skipped"].append(legacy_id)
+                continue
+            checkpoint["entries_converted"] += await migrate_user(legacy_id)
+            checkpoint["users_done"] += 1
+        checkpoint["last_user_id"] = batch[-1]["_id"]
+        await save_checkpoint(checkpoint)
+        logger.info("Migrated %d users (%d journal entries)", checkpoint["users_done"],
+                    checkpoint["entries_converted"])
+        await asyncio.sleep(pause)
+
+
+async def migrate_stragglers(checkpoint: dict, batch_size: int, pause: float) -> None:
+    """Convert string user ids written by old code after their user was migrated."""
+    for name in CHILD_COLLECTIONS:
+        collection = _collection(name)
+        while True:
+            batch = await collection.find({"user_id": {"$type": "string"}}, {"user_id": 1}) \
+                .limit(batch_size).to_list(batch_size)
+            batch = [doc for doc in batch if ObjectId.is_valid(doc["user_id"])]
+            if not batch:
+                break
+            by_user = {}
+            for doc in batch:
+                by_user.setdefault(doc["user_id"], []).append(doc["_id"])
+            for legacy_id, ids in by_user.items():
+                result = await collection.update_many(
+                    {"_id": {"$in": ids}, "user_id": legacy_id}, {"$set": {"user_id": ObjectId(legacy_id)}})
+                if name == "journal_entries":
+                    checkpoint["entries_converted"] += result.modified_count
+            await save_checkpoint(checkpoint)
+            await asyncio.sleep(pause)
+
+
+async def verify(checkpoint: dict, batch_size: int) -> bool:
+    """Check every fingerprinted user sees the same entries through an ObjectId equality match."""
+    ok = True
+    skipped = checkpoint.get("skipped", [])
+    for name in ("users",) + CHILD_COLLECTIONS:
+        field = "_id" if name == "users" else "user_id"
+        remaining = await _collection(name).count_documents({field: {"$type": "string", "$nin": skipped}})
+        if remaining:
+            logger.error("%d documents in %s still have a string %s", remaining, name, field)
+            ok = False
+    if skipped:
+        # Cannot be converted; they need manual clean-up but do not block switching legacy reads off
+        logger.warning("%d users with ids that are not ObjectIds were skipped: %s", len(skipped), skipped[:20])
+
+    checked = 0
+    cursor = _collection("migration_verification").find({"migration": MIGRATION_ID}).batch_size(batch_size)
+    async for record in cursor:
+        before = record["before"]
+        # Entries written after the fingerprint was taken are not part of the comparison
+        query = {"user_id": record["_id"]}
+        if before["last_id"] is not None:
+            query["_id"] = {"$lte": before["last_id"]}
+        after = await fingerprint(query) if before["last_id"] is not None else {"count": 0}
+        if after["count"] != before["count"] or after.get("digest", before["digest"]) != before["digest"]:
+            logger.error("User %s: before %s, after %s", record["_id"], before, after)
+            ok = False
+        checked += 1
+    logger.info("Verified %d users: %s", checked, "OK" if ok else "MISMATCHES FOUND")
+    return ok
+
+
+async def run(batch_size: int, pause: float, verify_only: bool) -> bool:
+    Database.mongo_url = os.getenv("MONGO_URL", Database.mongo_url)
+    await Database.connect()
+    try:
+        await Database.ensure_indexes()
+        checkpoint = await load_checkpoint()
+        if not verify_only:
+            if checkpoint["phase"] == "users":
+                await migrate_users(checkpoint, batch_size, pause)
+                checkpoint["phase"] = "stragglers"
+                await save_checkpoint(checkpoint)
+            if checkpoint["phase"] == "stragglers":
+                await migrate_stragglers(checkpoint, batch_size, pause)
+                checkpoint["phase"] = "verify"
+                await save_checkpoint(checkpoint)
+        ok = await verify(checkpoint, batch_size)
+        if ok and not verify_only:
+            checkpoint["phase"] = "done"
+            await save_checkpoint(checkpoint)
+        return ok
+    finally:
+        await Database.disconnect()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Convert string user ids to ObjectIds")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--pause", type=float, default=0.2, help="seconds to sleep between batches")
+    parser.add_argument("--verify-only", action="store_true")
+    args = parser.parse_args(argv)
+    configure_logging()
+    return 0 if asyncio.run(run(args.batch_size, args.pause, args.verify_only)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
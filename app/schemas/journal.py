@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, validator, root_validator
+from typing import Optional, List, Dict
 from datetime import datetime
 from app.db import PyObjectId, MongoModel
 
@@ -35,17 +35,81 @@ class JournalEntryResponse(MongoModel):
     class Config:
         allow_population_by_field_name = True
         
+class VoiceRecording(BaseModel):
+    file_id: str  # GridFS id; play back from /voice/recordings/{file_id}
+    filename: Optional[str] = None
+    content_type: str
+    length: int  # Bytes
+
+    @validator("file_id", pre=True)
+    def stringify_file_id(cls, v):
+        return str(v)
+
 class JournalEntryResponse(JournalEntryBase):
     id: Optional[str] = None
     user_id: str  # Ensure user_id is serialized as a string
     created_at: datetime
     updated_at: Optional[datetime] = None
     ai_response: Optional[str] = None
+    voice: Optional[VoiceRecording] = None  # Set on voice journal entries
+
+    @validator("user_id", pre=True)
+    def stringify_user_id(cls, v):
+        return str(v)
 
     class Config:
         orm_mode = True
         json_encoders = {PyObjectId: str}  # Serialize ObjectId as a string
 
+class SimilarEntryResponse(JournalEntryResponse):
+    score: float  # Cosine similarity to the reference entry
+
+class SyncResponse(BaseModel):
+    changes: List[JournalEntryResponse]  # Entries created or updated since the token
+    deleted: List[str]  # IDs of entries deleted since the token
+    next_token: str  # Pass back as `since` on the next sync
+    has_more: bool  # True if another page is waiting
+
+class TextChange(BaseModel):
+    start: int = Field(..., ge=0)  # Replace characters [start, end), counted in Unicode code points,
+    end: int = Field(..., ge=0)    # of the text as the previous change left it
+    text: str = ""
+
+class DraftPublish(BaseModel):
+    version: int = Field(..., ge=1)  # The client's save counter for this draft session; must increase
+    base_version: Optional[int] = None  # Version `changes` were made against (the last acknowledged save)
+    content: Optional[str] = None  # Full text, or
+    changes: Optional[List[TextChange]] = None  # edits to the text at base_version
+    mood: Optional[MoodData] = None
+    tags: Optional[List[str]] = None
+
+    @root_validator
+    def changes_need_base(cls, values):
+        if values.get("content") is not None and values.get("changes") is not None:
+            raise ValueError("Provide content or changes, not both")
+        if values.get("changes") is not None and values.get("base_version") is None:
+            raise ValueError("changes need a base_version")
+        return values
+
+class DraftSave(DraftPublish):
+    @root_validator
+    def content_or_changes(cls, values):
+        if values.get("content") is None and values.get("changes") is None:
+            raise ValueError("Provide content or changes")
+        return values
+
+class DraftSaveResponse(BaseModel):
+    draft_session: str
+    version: int  # Latest version accepted; send changes against this one next
+    length: int  # Characters in the draft at that version
+
+class DraftResponse(BaseModel):
+    draft_session: str
+    version: int
+    content: str
+    mood: Optional[dict] = None
+    tags: List[str] = []
+
 class JournalEntryUpdate(BaseModel):
     content: Optional[str] = None
     mood: Optional[MoodData] = None
@@ -60,4 +124,47 @@ from typing import Optional
 
 class MoodTrackerResponse(BaseModel):
     date: str  # The date in "YYYY-MM-DD" format
-    mood: Optional[dict]  # A dictionary containing mood details (e.g., emoji, label, value)    
\ No newline at end of file
+    mood: Optional[dict]  # A dictionary containing mood details (e.g., emoji, label, value)
+
+class DailyMoodScore(BaseModel):
+    date: str  # "YYYY-MM-DD"
+    score: float  # Average mood valence that day, -2 (angry) to 2 (happy)
+    entries: int
+
+class WeeklyInsightResponse(BaseModel):
+    week_start: datetime  # Monday 00:00 UTC
+    entry_count: int
+    days_journaled: int
+    total_words: int
+    avg_words: float
+    mood_counts: Dict[str, int]
+    dominant_mood: Optional[str]
+    avg_mood_score: Optional[float]
+    daily_mood_scores: List[DailyMoodScore]
+    best_day: Optional[str]
+    hardest_day: Optional[str]
+    top_tags: List[str]
+    summary: Optional[str] = None  # LLM-written reflection, if the job ran with summaries
+    computed_at: datetime
+
+class AnalyzeJournalRequest(BaseModel):
+    content: Optional[str] = None  # Text to analyze, e.g. the entry being written
+    days: Optional[int] = Field(None, ge=1, le=92)  # Or: the user's published entries from the last N days
+
+    @root_validator
+    def content_or_days(cls, values):
+        if not (values.get("content") or "").strip() and values.get("days") is None:
+            raise ValueError("Provide content or days")
+        return values
+
+class JournalAnalysis(BaseModel):
+    sentiment: str  # "positive", "negative", "mixed" or "neutral"
+    sentiment_score: float  # -1 to 1
+    emotions: List[str]  # Strongest first
+    suggestions: List[str]
+
+class JournalAnalysisResponse(BaseModel):
+    analysis: JournalAnalysis
+    chunks: int
+    cached_chunks: int  # Served from the per-chunk cache
+    fallback_chunks: int  # Scored by the lexicon because the model failed    
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""
+Map-reduce analysis of journal text.
+
+Text is split into chunks of at most ``ANALYSIS_CHUNK_TOKENS`` (estimated)
+tokens along paragraph, then sentence, then word boundaries. Each chunk is
+analysed by the LLM on its own, at most ``ANALYSIS_MAX_CONCURRENCY`` at a time,
+and the partial results are reduced without another model call: a
+length-weighted sentiment score, rank-weighted emotions and the suggestions
+most chunks agree on.
+
+Chunk results are cached in ``analysis_cache`` under a hash of the user, the
+model, the prompt version and the chunk text. Chunk boundaries depend only on
+nearby text (a paragraph whose hash matches ``ANCHOR_MODULUS`` starts a new
+chunk once the current one is half full), so editing one paragraph changes
+the chunk that holds it and rarely more; every other chunk is a cache hit.
+Chunks the model cannot answer for fall back to the lexicon sentiment scorer
+and are not cached.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import re
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from pymongo import UpdateOne
+
+from app.core import metrics
+from app.core.config import settings
+from app.db import Database, to_object_id
+from app.services.llm import LLMError, get_llm_provider
+from app.services.sentiment_service import get_sentiment_cascade
+
+logger = logging.getLogger(__name__)
+
+PROMPT_VERSION = 1  # Bump when MAP_PROMPT changes so cached results are not reused
+CHARS_PER_TOKEN = 4  # Rough estimate for English prose
+ANCHOR_MODULUS = 3
+MAX_EMOTIONS = 5
+MAX_SUGGESTIONS = 3
+STRONG_SENTIMENT = 0.35  # A chunk at least this far from 0 counts as clearly positive or negative
+LABEL_THRESHOLD = 0.15
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+MAP_PROMPT = (
+    "You analyse one part of a personal journal for a supportive diary app. "
+    "Reply with a JSON object only, no other text: "
+    '{"sentiment_score": a number from -1 (very negative) to 1 (very positive), '
+    '"emotions": [up to 5 lowercase emotion words, strongest first], '
+    '"suggestions": [up to 3 short, kind and practical suggestions for the writer]}'
+)
+
+
+class AnalysisRejected(ValueError):
+    pass
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _split_oversized(text: str, budget: int) -> List[str]:
+    """Split one paragraph that is over budget into sentences, and sentences into word runs."""
+    pieces = []
+    for sentence in SENTENCE_RE.split(text):
+        if estimate_tokens(sentence) <= budget:
+            pieces.append(sentence)
+            continue
+        words, current = sentence.split(), []
+        for word in words:
+            if current and estimate_tokens(" ".join(current + [word])) > budget:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+    return pieces
+
+
+def _is_anchor(piece: str) -> bool:
+    return zlib.crc32(piece.encode("utf-8")) % ANCHOR_MODULUS == 0
+
+
+def split_into_chunks(text: str, budget: Optional[int] = None) -> List[str]:
+    """Split ``text`` into chunks of at most ``budget`` estimated tokens with edit-stable boundaries."""
+    budget = budget or settings.ANALYSIS_CHUNK_TOKENS
+    pieces: List[str] = []
+    for paragraph in PARAGRAPH_RE.split(text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= budget:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(_split_oversized(paragraph, budget))
+    return pack_chunks(pieces, budget)
+
+
+def pack_chunks(pieces: Sequence[str], budget: Optional[int] = None) -> List[str]:
+    """Join consecutive pieces (each within ``budget``) into chunks, starting new ones at anchors."""
+    budget = budget or settings.ANALYSIS_CHUNK_TOKENS
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        full = size + tokens > budget
+        if current and (full or (size >= budget // 2 and _is_anchor(piece))):
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def chunk_key(user_id, model: str, chunk: str) -> str:
+    digest = hashlib.sha256()
+    for part in (str(PROMPT_VERSION), model, str(user_id), chunk):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def parse_partial(content: str) -> Optional[Dict[str, Any]]:
+    """Validate the model's JSON reply; None if it is unusable."""
+    start, end = content.find("{"), content.rfind("}")
+    if start < 0 or end < start:
+        return None
+    try:
+        data = json.loads(content[start:end + 1])
+        score = max(-1.0, min(1.0, float(data["sentiment_score"])))
+    except (ValueError, TypeError, KeyError):
+        return None
+    emotions = [e.strip().lower() for e in data.get("emotions") or [] if isinstance(e, str) and e.strip()]
+    suggestions = [s.strip() for s in data.get("suggestions") or [] if isinstance(s, str) and s.strip()]
+    return {"score": score, "emotions": emotions[:MAX_EMOTIONS], "suggestions": suggestions[:MAX_SUGGESTIONS]}
+
+
+async def analyze_chunk(chunk: str) -> Optional[Dict[str, Any]]:
+    messages = [{"role": "system", "content": MAP_PROMPT}, {"role": "user", "content": chunk}]
+    try:
+        result = await get_llm_provider().complete(messages, max_tokens=300, temperature=0)
+    except LLMError as e:
+        logger.warning("Chunk analysis failed, using the lexicon: %s", e)
+        return None
+    partial = parse_partial(result.content)
+    if partial is None:
+        logger.warning("Unparseable chunk analysis, using the lexicon")
+    return partial
+
+
+def lexicon_partial(chunk: str) -> Dict[str, Any]:
+    score = get_sentiment_cascade().lexicon.score([chunk])[0].score
+    return {"score": score, "emotions": [], "suggestions": []}
+
+
+def _normalize(suggestion: str) -> str:
+    return re.sub(r"[^a-z0-9 ]", "", suggestion.lower()).strip()
+
+
+def reduce_partials(partials: Sequence[Dict[str, Any]], weights: Sequence[int]) -> Dict[str, Any]:
+    """Combine per-chunk results, weighting each chunk by its length."""
+    total = sum(weights) or 1
+    score = sum(p["score"] * w for p, w in zip(partials, weights)) / total
+    if score >= LABEL_THRESHOLD:
+        label = "positive"
+    elif score <= -LABEL_THRESHOLD:
+        label = "negative"
+    elif any(p["score"] >= STRONG_SENTIMENT for p in partials) and any(p["score"] <= -STRONG_SENTIMENT
+                                                                        for p in partials):
+        label = "mixed"
+    else:
+        label = "neutral"
+
+    emotion_weight: Dict[str, float] = {}
+    for partial, weight in zip(partials, weights):
+        for rank, emotion in enumerate(partial["emotions"]):
+            emotion_weight[emotion] = emotion_weight.get(emotion, 0.0) + weight / (rank + 1)
+    emotions = sorted(emotion_weight, key=lambda e: -emotion_weight[e])[:MAX_EMOTIONS]
+
+    seen: Dict[str, List[Any]] = {}  # normalized -> [chunks suggesting it, first position, text]
+    position = 0
+    for partial in partials:
+        for suggestion in partial["suggestions"]:
+            key = _normalize(suggestion)
+            if key in seen:
+                seen[key][0] += 1
+            else:
+                seen[key] = [1, position, suggestion]
+            position += 1
+    ranked = sorted(seen.values(), key=lambda item: (-item[0], item[1]))
+    return {
+        "sentiment": label,
+        "sentiment_score": round(score, 3),
+        "emotions": emotions,
+        "suggestions": [item[2] for item in ranked[:MAX_SUGGESTIONS]],
+    }
+
+
+async def analyze_texts(user_id, texts: Sequence[str]) -> Dict[str, Any]:
+    """
+    Analyse one or more texts (e.g. a month of entries) as a whole.
+
+    Each text is chunked separately, then short ones are packed together by
+    the same anchor rule, so a day's entry does not cost a chunk of its own
+    and an edit to one entry leaves the other entries' chunks cached. Raises
+    ``AnalysisRejected`` beyond ``ANALYSIS_MAX_CHUNKS`` chunks.
+    """
+    chunks = pack_chunks([chunk for text in texts for chunk in split_into_chunks(text)])
+    if len(chunks) > settings.ANALYSIS_MAX_CHUNKS:
+        raise AnalysisRejected(f"Too much text to analyze at once ({len(chunks)} chunks, "
+                          f"limit {settings.ANALYSIS_MAX_CHUNKS})")
+
+    model = get_llm_provider().model
+    keys = [chunk_key(user_id, model, chunk) for chunk in chunks]
+    cache = Database.get_collection("analysis_cache")
+    cached = {doc["_id"]: doc["result"] async for doc in cache.find({"_id": {"$in": list(set(keys))}})}
+
+    missing = {key: chunk for key, chunk in zip(keys, chunks) if key not in cached}
+    semaphore = asyncio.Semaphore(settings.ANALYSIS_MAX_CONCURRENCY)
+
+    async def analyze(chunk: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            return await analyze_chunk(chunk)
+
+    results = await asyncio.gather(*(analyze(chunk) for chunk in missing.values()))
+    fresh, fallback = {}, {}
+    for (key, chunk), result in zip(missing.items(), results):
+        if result is None:
+            fallback[key] = lexicon_partial(chunk)
+        else:
+            fresh[key] = result
+    if fresh:
+        now = datetime.utcnow()
+        await cache.bulk_write([
+            UpdateOne({"_id": key}, {"$setOnInsert": {"user_id": to_object_id(user_id), "result": result,
+                                                      "created_at": now}}, upsert=True)
+            for key, result in fresh.items()
+        ], ordered=False)
+
+    # Identical chunks share a key; count every occurrence so the sources add up to len(chunks)
+    sources = Counter("cache" if key in cached else "model" if key in fresh else "lexicon" for key in keys)
+    for source in ("cache", "model", "lexicon"):
+        metrics.analysis_chunks.inc(sources[source], source)
+    partials = {**cached, **fresh, **fallback}
+    analysis = reduce_partials([partials[key] for key in keys], [estimate_tokens(chunk) for chunk in chunks])
+    return {
+        "analysis": analysis,
+        "chunks": len(chunks),
+        "cached_chunks": sources["cache"],
+        "fallback_chunks": sources["lexicon"],
+    }
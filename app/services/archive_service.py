@@ -0,0 +1,266 @@
+"""
+Cold storage for old journal entries.
+
+Entries older than ``ARCHIVE_AFTER_DAYS`` are moved by ``app.jobs.archive_entries``
+out of ``journal_entries`` into ``journal_archive`` buckets: one document per
+user, calendar month and batch, holding the BSON-encoded entries compressed with
+zstd (zlib when ``zstandard`` is not installed; the codec is stored per bucket).
+Bucket metadata (date range, sequence range, entry ids, each day's mood) stays
+uncompressed so reads can pick the buckets they need without touching the
+payload.
+
+``users.archived_through`` records the cutoff of the user's latest archive run.
+Every archived entry is older than it, so a page of hot entries that ends after
+it is complete without consulting the archive.
+"""
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import bson
+from bson import Binary, ObjectId
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+
+from app.db import Database, ReadContext, to_object_id
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+INLINE_DECOMPRESS_BYTES = 64 * 1024  # Larger payloads are decompressed off the event loop
+
+DateRange = Tuple[Optional[datetime], Optional[datetime]]
+
+
+def compress_entries(entries: List[Dict[str, Any]]) -> Tuple[str, bytes]:
+    payload = bson.encode({"entries": entries})
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return "zlib", zlib.compress(payload, ZLIB_LEVEL)
+
+
+def decompress_entries(codec: str, data: bytes) -> List[Dict[str, Any]]:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this archive bucket")
+        payload = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        payload = zlib.decompress(data)
+    return bson.decode(payload)["entries"]
+
+
+def _archive(reads: Optional[ReadContext] = None):
+    if reads is not None:
+        return reads.collection("journal_archive")
+    return Database.get_collection("journal_archive")
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def daily_moods(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The mood of each day's first entry, keyed by "YYYY-MM-DD", for the mood tracker."""
+    moods: Dict[str, Any] = {}
+    for entry in sorted(entries, key=lambda entry: entry["created_at"]):
+        moods.setdefault(entry["created_at"].strftime("%Y-%m-%d"), entry.get("mood"))
+    return moods
+
+
+def build_bucket(user_id: ObjectId, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Package one month's worth of a user's entries as an archive document."""
+    entries = sorted(entries, key=lambda entry: entry["created_at"])
+    codec, data = compress_entries(entries)
+    seqs = [entry["seq"] for entry in entries if "seq" in entry]
+    return {
+        # Keyed by the first entry so re-archiving the same batch after a crash is a duplicate key
+        "_id": min(entry["_id"] for entry in entries),
+        "user_id": user_id,
+        "month": month_start(entries[0]["created_at"]),
+        "first_created_at": entries[0]["created_at"],
+        "last_created_at": entries[-1]["created_at"],
+        "min_seq": min(seqs) if seqs else 0,
+        "max_seq": max(seqs) if seqs else 0,
+        "entry_ids": [entry["_id"] for entry in entries],
+        "count": len(entries),
+        "moods": daily_moods(entries),
+        "codec": codec,
+        "data": Binary(data),
+    }
+
+
+async def store_bucket(bucket: Dict[str, Any]) -> None:
+    try:
+        await _archive().insert_one(bucket)
+    except DuplicateKeyError:
+        # Written by an interrupted earlier run; make sure it really holds these entries
+        existing = await _archive().find_one({"_id": bucket["_id"]}, {"entry_ids": 1})
+        if not set(bucket["entry_ids"]) <= set(existing["entry_ids"]):
+            raise
+
+
+async def load_bucket(bucket_id: ObjectId, reads: Optional[ReadContext] = None) -> List[Dict[str, Any]]:
+    """Fetch and decompress one bucket's entries."""
+    session = reads.session if reads is not None else None
+    bucket = await _archive(reads).find_one({"_id": bucket_id}, {"codec": 1, "data": 1}, session=session)
+    if bucket is None:
+        return []
+    if len(bucket["data"]) > INLINE_DECOMPRESS_BYTES:
+        return await run_in_threadpool(decompress_entries, bucket["codec"], bucket["data"])
+    return decompress_entries(bucket["codec"], bucket["data"])
+
+
+def _in_range(entry: Dict[str, Any], created_range: DateRange) -> bool:
+    start, end = created_range
+    return (start is None or entry["created_at"] >= start) and (end is None or entry["created_at"] < end)
+
+
+async def archived_entries(user_id, needed: int, created_range: DateRange = (None, None),
+                           newer_than: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Return up to ``needed`` of the user's newest archived entries, newest first.
+
+    Buckets are visited newest first and decompressed only while they can still
+    contribute: once ``needed`` entries are in hand, a bucket that ends before
+    the oldest of them is skipped along with everything after it. Entries not
+    newer than ``newer_than`` cannot make the caller's page and are ignored.
+    """
+    start, end = created_range
+    if newer_than is not None and (start is None or newer_than > start):
+        start = newer_than
+    query: Dict[str, Any] = {"user_id": to_object_id(user_id)}
+    if start is not None:
+        query["last_created_at"] = {"$gte": start}
+    if end is not None:
+        query["first_created_at"] = {"$lt": end}
+
+    collected: List[Dict[str, Any]] = []
+    buckets = _archive().find(query, {"last_created_at": 1}).sort("last_created_at", -1)
+    async for bucket in buckets:
+        if len(collected) >= needed and bucket["last_created_at"] < collected[needed - 1]["created_at"]:
+            break
+        entries = [entry for entry in await load_bucket(bucket["_id"]) if _in_range(entry, (start, end))]
+        collected = sorted(collected + entries, key=lambda entry: entry["created_at"], reverse=True)
+    return collected[:needed]
+
+
+async def find_journal_entries(current_user: Dict[str, Any], query: Dict[str, Any], skip: int, limit: int,
+                               created_range: DateRange = (None, None)) -> List[Dict[str, Any]]:
+    """
+    Page through a user's entries, newest first, across hot storage and the archive.
+
+    ``query`` is the ``journal_entries`` filter. Pages that lie entirely after
+    the user's ``archived_through`` are served by that one query.
+    """
+    journal_collection = Database.get_collection("journal_entries")
+    archived_through = current_user.get("archived_through")
+    start, end = created_range
+    if archived_through is None or query.get("is_draft") is True or (start is not None and start >= archived_through):
+        return await journal_collection.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+
+    page = await journal_collection.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    if len(page) == limit and page[-1]["created_at"] >= archived_through:
+        return page
+
+    # The page reaches into archived time: merge the newest `skip + limit` from both tiers
+    needed = skip + limit
+    hot = await journal_collection.find(query).sort("created_at", -1).limit(needed).to_list(needed)
+    newer_than = hot[-1]["created_at"] if len(hot) == needed else None
+    cold = await archived_entries(current_user["_id"], needed, created_range, newer_than)
+    merged = {entry["_id"]: entry for entry in cold}
+    merged.update((entry["_id"], entry) for entry in hot)  # A restored entry's hot copy wins
+    return sorted(merged.values(), key=lambda entry: entry["created_at"], reverse=True)[skip:needed]
+
+
+async def iter_archived_entries(user_id, reads: Optional[ReadContext] = None):
+    """Yield every archived entry of a user, oldest bucket first, one bucket in memory at a time."""
+    session = reads.session if reads is not None else None
+    buckets = _archive(reads).find({"user_id": to_object_id(user_id)}, {"_id": 1}, session=session) \
+        .sort("first_created_at", 1)
+    async for bucket in buckets:
+        for entry in await load_bucket(bucket["_id"], reads):
+            yield entry
+
+
+async def archived_daily_moods(user_id, reads: Optional[ReadContext] = None) -> Dict[str, Any]:
+    """The first mood of each archived day, from the bucket summaries."""
+    session = reads.session if reads is not None else None
+    moods: Dict[str, Any] = {}
+    buckets = _archive(reads).find({"user_id": to_object_id(user_id)}, {"moods": 1}, session=session) \
+        .sort("first_created_at", 1)
+    async for bucket in buckets:
+        day_moods = bucket.get("moods")
+        if day_moods is None:  # Archived before buckets had a summary
+            day_moods = daily_moods(await load_bucket(bucket["_id"], reads))
+        for day, mood in day_moods.items():
+            moods.setdefault(day, mood)
+    return moods
+
+
+async def find_archived_entry(entry_id: ObjectId) -> Optional[Dict[str, Any]]:
+    bucket = await _archive().find_one({"entry_ids": entry_id}, {"_id": 1})
+    if bucket is None:
+        return None
+    for entry in await load_bucket(bucket["_id"]):
+        if entry["_id"] == entry_id:
+            return entry
+    return None
+
+
+async def archived_changes_since(user_id, since: int, limit: int) -> List[Dict[str, Any]]:
+    """Archived entries with ``seq > since`` (for a client syncing from far back), lowest first."""
+    collected: List[Dict[str, Any]] = []
+    buckets = _archive().find({"user_id": to_object_id(user_id), "max_seq": {"$gt": since}}, {"min_seq": 1}) \
+        .sort("min_seq", 1)
+    async for bucket in buckets:
+        if len(collected) >= limit and bucket["min_seq"] > collected[limit - 1]["seq"]:
+            break
+        entries = [entry for entry in await load_bucket(bucket["_id"]) if entry.get("seq", 0) > since]
+        collected = sorted(collected + entries, key=lambda entry: entry["seq"])
+    return collected[:limit]
+
+
+async def restore_entry(entry_id: ObjectId) -> Optional[Dict[str, Any]]:
+    """
+    Move an archived entry back into ``journal_entries`` so it can be edited or deleted.
+
+    The hot copy is written first; readers prefer it, so a crash before the
+    bucket is rewritten only leaves a stale archived duplicate.
+    """
+    bucket = await _archive().find_one({"entry_ids": entry_id}, {"_id": 1, "user_id": 1})
+    if bucket is None:
+        return None
+    entries = await load_bucket(bucket["_id"])
+    entry = next((entry for entry in entries if entry["_id"] == entry_id), None)
+    if entry is None:
+        return None
+    try:
+        await Database.get_collection("journal_entries").insert_one(dict(entry))
+    except DuplicateKeyError:
+        pass  # Restored by an interrupted earlier call
+
+    await _rewrite_bucket(bucket, [other for other in entries if other["_id"] != entry_id])
+    return entry
+
+
+async def _rewrite_bucket(bucket: Dict[str, Any], remaining: List[Dict[str, Any]]) -> None:
+    if remaining:
+        rebuilt = build_bucket(bucket["user_id"], remaining)
+        rebuilt["_id"] = bucket["_id"]
+        await _archive().replace_one({"_id": bucket["_id"]}, rebuilt)
+    else:
+        await _archive().delete_one({"_id": bucket["_id"]})
+
+
+async def unarchive_entries(entry_ids: List[ObjectId]) -> None:
+    """Take entries out of their buckets, leaving the copies in ``journal_entries`` (if any) as the only ones."""
+    dropped = set(entry_ids)
+    for entry_id in entry_ids:
+        bucket = await _archive().find_one({"entry_ids": entry_id}, {"_id": 1, "user_id": 1})
+        if bucket is not None:
+            entries = await load_bucket(bucket["_id"])
+            await _rewrite_bucket(bucket, [entry for entry in entries if entry["_id"] not in dropped])
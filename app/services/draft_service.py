@@ -0,0 +1,319 @@
+"""
+Coalesced draft autosave.
+
+An editor autosaves into a *draft session*, an id the client picks (one per
+editor tab, say), sending the text changes made since the version it last
+saved rather than the whole draft. Saves are applied to an in-memory copy and
+written to ``journal_entries`` once the draft has been quiet for
+``DRAFT_AUTOSAVE_DEBOUNCE_SECONDS``, and at least every
+``DRAFT_AUTOSAVE_MAX_DELAY_SECONDS`` while typing goes on, so a typing session
+costs a few writes instead of a full copy of the draft per autosave.
+
+Each session has one draft document, found by ``(user_id, draft_session)``
+under a unique index. Versions are numbered by the client, so when API
+workers hold different copies of a draft the newest save wins: a write only
+replaces an older version, and an insert racing a newer copy (or the published
+entry) fails on the unique index and is dropped. A worker that does not hold
+the version a change was made against answers with a conflict and the client
+resends the full text.
+
+Publishing promotes the draft to a journal entry in one atomic update that
+also applies any unwritten text, so nothing is flushed separately first.
+"""
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core import metrics
+from app.core.config import settings
+from app.db import Database, to_object_id
+from app.services.sync_service import next_change_seq, record_tombstone, sequenced_write
+
+logger = logging.getLogger(__name__)
+
+SESSION_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+DEFAULT_MOOD = {"emoji": "😐", "label": "Neutral", "value": "neutral"}
+
+TextChange = Tuple[int, int, str]  # Replace characters [start, end) with the text
+
+
+class InvalidDraftChange(ValueError):
+    pass
+
+
+class DraftNotFound(LookupError):
+    pass
+
+
+class DraftConflict(Exception):
+    """The draft is not at the version the client's changes were made against."""
+
+    def __init__(self, version: int):
+        super().__init__(f"The draft is at version {version}; send the full content")
+        self.version = version
+
+
+class DraftAlreadyPublished(Exception):
+    pass
+
+
+class _Draft:
+    """A draft as this process last saw it, including saves not yet written."""
+
+    def __init__(self, user_id: ObjectId, session: str, doc: Optional[Dict[str, Any]]):
+        doc = doc or {}
+        self.user_id = user_id
+        self.session = session
+        self.content: str = doc.get("content", "")
+        self.mood: Optional[Dict[str, Any]] = doc.get("mood")
+        self.tags: List[str] = doc.get("tags") or []
+        self.version: int = doc.get("draft_version", 0)
+        self.saved_version = self.version
+        self.flush_at = 0.0  # Event loop time of the next write
+        self.deadline: Optional[float] = None  # Latest flush_at while saves keep coming
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.saved_version
+
+
+_drafts: Dict[Tuple[ObjectId, str], _Draft] = {}
+
+
+def check_session(session: str) -> None:
+    if not SESSION_RE.match(session):
+        raise InvalidDraftChange("Draft session ids are 1-64 letters, digits, '-' or '_'")
+
+
+def apply_changes(content: str, changes: Sequence[TextChange]) -> str:
+    """Apply ``(start, end, text)`` replacements in order; offsets count code points in the text so far."""
+    for start, end, text in changes:
+        if not 0 <= start <= end <= len(content):
+            raise InvalidDraftChange(f"Change {start}-{end} is outside the draft ({len(content)} characters)")
+        content = content[:start] + text + content[end:]
+    return content
+
+
+def _draft_filter(user_id: ObjectId, session: str) -> Dict[str, Any]:
+    return {"user_id": user_id, "draft_session": session}
+
+
+async def _load(user_id: ObjectId, session: str) -> _Draft:
+    draft = _drafts.get((user_id, session))
+    if draft is not None:
+        return draft
+    doc = await Database.get_collection("journal_entries").find_one(_draft_filter(user_id, session))
+    if doc is not None and not doc.get("is_draft"):
+        raise DraftAlreadyPublished(f"Draft {session} has been published")
+    # Another request may have loaded it meanwhile
+    return _drafts.setdefault((user_id, session), _Draft(user_id, session, doc))
+
+
+def _release(draft: _Draft) -> None:
+    """Forget a draft with nothing left to write; the next save reloads it."""
+    if not draft.dirty and _drafts.get((draft.user_id, draft.session)) is draft:
+        del _drafts[(draft.user_id, draft.session)]
+
+
+def _schedule(draft: _Draft) -> None:
+    now = asyncio.get_running_loop().time()
+    if draft.deadline is None:
+        draft.deadline = now + settings.DRAFT_AUTOSAVE_MAX_DELAY_SECONDS
+    draft.flush_at = min(now + settings.DRAFT_AUTOSAVE_DEBOUNCE_SECONDS, draft.deadline)
+    if draft.task is None or draft.task.done():
+        draft.task = asyncio.create_task(_flush_later(draft))
+
+
+async def _flush_later(draft: _Draft) -> None:
+    loop = asyncio.get_running_loop()
+    while draft.dirty:
+        delay = draft.flush_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+            continue
+        draft.deadline = None
+        if not await _write(draft):
+            draft.flush_at = loop.time() + settings.DRAFT_AUTOSAVE_DEBOUNCE_SECONDS
+    _release(draft)
+
+
+async def _write(draft: _Draft) -> bool:
+    """Write the draft's current version; False if it should be retried."""
+    version = draft.version
+    now = datetime.utcnow()
+    fields = {
+        "content": draft.content,
+        "mood": draft.mood or DEFAULT_MOOD,
+        "tags": draft.tags,
+        "updated_at": now,
+        "draft_version": version,
+        "draft_expires_at": now + timedelta(days=settings.DRAFT_TTL_DAYS),
+    }
+    try:
+        async with sequenced_write(draft.user_id) as session:
+            fields["seq"] = await next_change_seq(draft.user_id, session)
+            # Only replaces an older version; otherwise the upsert collides with the unique index
+            await Database.get_collection("journal_entries").update_one(
+                {**_draft_filter(draft.user_id, draft.session), "draft_version": {"$lt": version}},
+                {"$set": fields, "$setOnInsert": {"created_at": now, "is_draft": True, "ai_response": None}},
+                upsert=True,
+                session=session,
+            )
+    except DuplicateKeyError:
+        logger.info("Dropped draft %s version %d: a newer version was saved or published", draft.session, version)
+    except Exception:
+        logger.exception("Failed to save draft %s, retrying", draft.session)
+        return False
+    else:
+        metrics.draft_autosaves.inc(1, "written")
+    draft.saved_version = max(draft.saved_version, version)
+    return True
+
+
+async def save_draft(user_id, session: str, version: int, content: Optional[str] = None,
+                     changes: Optional[Sequence[TextChange]] = None, base_version: Optional[int] = None,
+                     mood: Optional[Dict[str, Any]] = None, tags: Optional[List[str]] = None) -> _Draft:
+    """
+    Buffer an autosave of ``content``, or of ``changes`` made against ``base_version``.
+
+    Saves with a version the draft already has (retries, reordered requests)
+    are ignored. Raises ``DraftConflict`` if the draft is not at
+    ``base_version``, and ``InvalidDraftChange`` for changes outside the text.
+    """
+    check_session(session)
+    draft = await _load(to_object_id(user_id), session)
+    if version <= draft.version:
+        _release(draft)
+        return draft
+    if changes is not None:
+        try:
+            if base_version != draft.version:
+                raise DraftConflict(draft.version)
+            content = apply_changes(draft.content, changes)
+        except (DraftConflict, InvalidDraftChange):
+            _release(draft)
+            raise
+    draft.content, draft.version = content, version
+    if mood is not None:
+        draft.mood = mood
+    if tags is not None:
+        draft.tags = tags
+    _schedule(draft)
+    metrics.draft_autosaves.inc(1, "buffered")
+    return draft
+
+
+async def get_draft(user_id, session: str) -> Optional[Dict[str, Any]]:
+    """The draft's latest text, including saves not yet written."""
+    check_session(session)
+    user_id = to_object_id(user_id)
+    draft = _drafts.get((user_id, session))
+    if draft is None:
+        doc = await Database.get_collection("journal_entries").find_one(
+            {**_draft_filter(user_id, session), "is_draft": True})
+        if doc is None:
+            return None
+        draft = _Draft(user_id, session, doc)
+    return {"draft_session": session, "version": draft.version, "content": draft.content,
+            "mood": draft.mood, "tags": draft.tags}
+
+
+def _forget(user_id: ObjectId, session: str) -> bool:
+    draft = _drafts.pop((user_id, session), None)
+    if draft is None:
+        return False
+    if draft.task is not None:
+        draft.task.cancel()
+    return draft.dirty
+
+
+async def publish_draft(user_id, session: str, version: int, content: Optional[str] = None,
+                        changes: Optional[Sequence[TextChange]] = None, base_version: Optional[int] = None,
+                        mood: Optional[Dict[str, Any]] = None, tags: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Promote a draft, with any final text, to a journal entry and return it.
+
+    ``version`` is the client's latest version of the draft: if this process
+    holds an older one (the newest save went to another worker and is not
+    written yet) and no final text is sent, ``DraftConflict`` asks the client
+    to send the full content.
+    """
+    user_id = to_object_id(user_id)
+    if content is not None or changes is not None:
+        draft = await save_draft(user_id, session, version, content, changes, base_version, mood, tags)
+    else:
+        check_session(session)
+        draft = await _load(user_id, session)
+        if draft.version == 0:
+            _release(draft)
+            raise DraftNotFound(f"Draft {session} not found")
+        if mood is not None:
+            draft.mood = mood
+        if tags is not None:
+            draft.tags = tags
+    if draft.version < version:
+        _release(draft)
+        raise DraftConflict(draft.version)
+    if not draft.content.strip():
+        raise InvalidDraftChange("Cannot publish an empty draft")
+    _forget(user_id, session)
+
+    now = datetime.utcnow()
+    try:
+        async with sequenced_write(user_id) as db_session:
+            seq = await next_change_seq(user_id, db_session)
+            entry = await Database.get_collection("journal_entries").find_one_and_update(
+                {**_draft_filter(user_id, session), "is_draft": True},
+                {
+                    "$set": {"content": draft.content, "mood": draft.mood or DEFAULT_MOOD, "tags": draft.tags,
+                             "is_draft": False, "created_at": now, "updated_at": None, "seq": seq},
+                    "$unset": {"draft_version": "", "draft_expires_at": ""},
+                    "$setOnInsert": {"ai_response": None},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                session=db_session,
+            )
+    except DuplicateKeyError:
+        raise DraftAlreadyPublished(f"Draft {session} has been published")
+    return entry
+
+
+async def discard_draft(user_id, session: str) -> bool:
+    """Delete a draft, including saves not yet written; False if there was none."""
+    check_session(session)
+    user_id = to_object_id(user_id)
+    buffered = _forget(user_id, session)
+    journal_collection = Database.get_collection("journal_entries")
+    async with sequenced_write(user_id) as db_session:
+        draft = await journal_collection.find_one({**_draft_filter(user_id, session), "is_draft": True},
+                                                  {"_id": 1}, session=db_session)
+        if draft is None:
+            return buffered
+        result = await journal_collection.delete_one({"_id": draft["_id"], "is_draft": True}, session=db_session)
+        if result.deleted_count:
+            await record_tombstone(user_id, draft["_id"], db_session)
+    return bool(result.deleted_count)
+
+
+def forget_deleted_entry(entry: Dict[str, Any]) -> None:
+    """Drop unwritten saves of a draft deleted through the journal endpoints."""
+    if entry.get("draft_session"):
+        _forget(to_object_id(entry["user_id"]), entry["draft_session"])
+
+
+async def flush_all() -> None:
+    """Write every buffered draft now (on shutdown)."""
+    drafts = list(_drafts.values())
+    for draft in drafts:
+        if draft.task is not None:
+            draft.task.cancel()
+    await asyncio.gather(*(_write(draft) for draft in drafts if draft.dirty))
+    _drafts.clear()
@@ -0,0 +1,310 @@
+"""
+Journal entry embeddings and per-user similarity search.
+
+Entries are embedded in the background after they are written, stored as
+int8-quantised vectors (one byte per dimension plus a float scale) in the
+``entry_embeddings`` collection, and searched with a vectorised brute-force
+cosine over an in-memory per-user matrix. Brute force is exact and, at the
+size of one person's diary, faster than maintaining an ANN structure.
+
+Two embedders are available (``EMBEDDING_BACKEND``):
+
+- ``hashing``: feature-hashed unigrams and bigrams. No model download, fully
+  deterministic; good enough for tests and small installs.
+- ``sentence-transformers``: a local CPU sentence-embedding model
+  (``EMBEDDING_MODEL``), loaded lazily on first use.
+"""
+import logging
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import Binary, ObjectId
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db import Database, to_object_id, user_id_filter
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+SEARCH_CHUNK_ROWS = 16384  # Rows upcast to float32 at a time during search
+CACHE_TTL_SECONDS = 300.0  # Reload indexes periodically to pick up writes from other workers
+
+
+class HashingEmbedder:
+    """Signed feature hashing of unigrams and bigrams into a fixed-size vector."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        tokens = TOKEN_RE.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(f.encode()) for f in self._features(text)), dtype=np.uint32)
+            if not hashes.size:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            out[row] = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+        return _normalize(out)
+
+
+class SentenceTransformerEmbedder:
+    """Local CPU sentence-embedding model (requires the ``sentence-transformers`` package)."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        vectors = self._model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+        return vectors.astype(np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantise unit vectors to int8 with one float32 scale per row."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+_embedder = None
+
+
+def get_embedder():
+    """Return the configured embedder, loading it on first use."""
+    global _embedder
+    if _embedder is None:
+        if settings.EMBEDDING_BACKEND == "sentence-transformers":
+            _embedder = SentenceTransformerEmbedder(settings.EMBEDDING_MODEL)
+        else:
+            _embedder = HashingEmbedder(settings.EMBEDDING_DIM)
+        logger.info("Using %s embeddings", _embedder.name)
+    return _embedder
+
+
+class EmbeddingIndex:
+    """One user's entry embeddings as a contiguous int8 matrix, grown incrementally."""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.dim = dim
+        self.size = 0
+        self.ids: List[ObjectId] = []
+        self.positions: Dict[ObjectId, int] = {}
+        self.matrix = np.zeros((capacity, dim), dtype=np.int8)
+        self.scales = np.zeros(capacity, dtype=np.float32)
+        self.loaded_at = time.monotonic()
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.matrix)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.int8)
+        matrix[:self.size] = self.matrix[:self.size]
+        scales = np.zeros(capacity, dtype=np.float32)
+        scales[:self.size] = self.scales[:self.size]
+        self.matrix, self.scales = matrix, scales
+
+    def upsert(self, entry_ids: List[ObjectId], quantized: np.ndarray, scales: np.ndarray) -> None:
+        new = sum(1 for entry_id in entry_ids if entry_id not in self.positions)
+        self._grow(self.size + new)
+        rows = np.empty(len(entry_ids), dtype=np.int64)
+        for i, entry_id in enumerate(entry_ids):
+            row = self.positions.get(entry_id)
+            if row is None:
+                row = self.positions[entry_id] = self.size
+                self.ids.append(entry_id)
+                self.size += 1
+            rows[i] = row
+        self.matrix[rows] = quantized
+        self.scales[rows] = scales
+
+    def remove(self, entry_id: ObjectId) -> None:
+        row = self.positions.pop(entry_id, None)
+        if row is None:
+            return
+        # Move the last row into the hole to keep the matrix dense
+        last = self.size - 1
+        if row != last:
+            moved = self.ids[last]
+            self.matrix[row] = self.matrix[last]
+            self.scales[row] = self.scales[last]
+            self.ids[row] = moved
+            self.positions[moved] = row
+        self.ids.pop()
+        self.size -= 1
+
+    def search(self, query: np.ndarray, k: int, exclude: Optional[ObjectId] = None) -> List[Tuple[ObjectId, float]]:
+        """Return the ``k`` most similar entries as ``(entry_id, cosine)`` pairs."""
+        if not self.size:
+            return []
+        query = query.astype(np.float32)
+        scores = np.empty(self.size, dtype=np.float32)
+        for start in range(0, self.size, SEARCH_CHUNK_ROWS):
+            stop = min(start + SEARCH_CHUNK_ROWS, self.size)
+            scores[start:stop] = self.matrix[start:stop].astype(np.float32) @ query
+        scores *= self.scales[:self.size]
+        if exclude is not None and exclude in self.positions:
+            scores[self.positions[exclude]] = -np.inf
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+class _IndexCache:
+    """Small LRU of per-user indexes."""
+
+    def __init__(self, max_users: int = 64):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[ObjectId, EmbeddingIndex]" = OrderedDict()
+
+    def get(self, user_id: ObjectId) -> Optional[EmbeddingIndex]:
+        index = self._indexes.get(user_id)
+        if index is None or time.monotonic() - index.loaded_at > CACHE_TTL_SECONDS:
+            return None
+        self._indexes.move_to_end(user_id)
+        return index
+
+    def put(self, user_id: ObjectId, index: EmbeddingIndex) -> None:
+        self._indexes[user_id] = index
+        self._indexes.move_to_end(user_id)
+        while len(self._indexes) > self.max_users:
+            self._indexes.popitem(last=False)
+
+    def peek(self, user_id: ObjectId) -> Optional[EmbeddingIndex]:
+        return self._indexes.get(user_id)
+
+
+_cache = _IndexCache()
+
+
+async def _store(user_id: ObjectId, entry_ids: List[ObjectId], quantized: np.ndarray, scales: np.ndarray,
+                 model: str) -> None:
+    collection = Database.get_collection("entry_embeddings")
+    for entry_id, vector, scale in zip(entry_ids, quantized, scales):
+        await collection.replace_one(
+            {"_id": entry_id},
+            {"user_id": user_id, "vector": Binary(vector.tobytes()), "scale": float(scale), "model": model},
+            upsert=True,
+        )
+
+
+async def index_entries(user_id, entries: List[Dict[str, Any]]) -> None:
+    """Embed entries (``{"_id", "content"}``), persist them and update the cached index."""
+    if not entries:
+        return
+    user_id = to_object_id(user_id)
+    embedder = get_embedder()
+    vectors = await run_in_threadpool(embedder.embed, [entry["content"] for entry in entries])
+    quantized, scales = quantize(vectors)
+    entry_ids = [entry["_id"] for entry in entries]
+    await _store(user_id, entry_ids, quantized, scales, embedder.name)
+    index = _cache.peek(user_id)
+    if index is not None:
+        index.upsert(entry_ids, quantized, scales)
+
+
+async def index_entry_in_background(user_id, entry_id: ObjectId, content: str) -> None:
+    """BackgroundTasks entry point: never let an embedding failure surface to the request."""
+    try:
+        await index_entries(user_id, [{"_id": entry_id, "content": content}])
+    except Exception:
+        logger.exception("Failed to index journal entry %s", entry_id)
+
+
+async def remove_entry(user_id, entry_id: ObjectId) -> None:
+    await remove_entries(user_id, [entry_id])
+
+
+async def remove_entries(user_id, entry_ids: List[ObjectId]) -> None:
+    """Forget entries that were deleted or moved out of ``journal_entries`` (e.g. archived)."""
+    if not entry_ids:
+        return
+    await Database.get_collection("entry_embeddings").delete_many({"_id": {"$in": list(entry_ids)}})
+    index = _cache.peek(to_object_id(user_id))
+    if index is not None:
+        for entry_id in entry_ids:
+            index.remove(entry_id)
+
+
+async def load_index(user_id) -> EmbeddingIndex:
+    """Return the user's index, loading it from Mongo (and embedding any unindexed entries) if needed."""
+    user_id = to_object_id(user_id)
+    index = _cache.get(user_id)
+    if index is not None:
+        return index
+
+    embedder = get_embedder()
+    docs = await Database.get_collection("entry_embeddings").find(
+        {"user_id": user_id, "model": embedder.name}, {"vector": 1, "scale": 1}
+    ).to_list(None)
+    index = EmbeddingIndex(embedder.dim, capacity=max(64, len(docs)))
+    if docs:
+        quantized = np.frombuffer(b"".join(doc["vector"] for doc in docs), dtype=np.int8).reshape(len(docs), -1)
+        index.upsert([doc["_id"] for doc in docs], quantized, np.array([doc["scale"] for doc in docs], np.float32))
+
+    # Entries written before embeddings existed (or with another model) are indexed now
+    journal_ids = await Database.get_collection("journal_entries").find(
+        user_id_filter(user_id), {"_id": 1}
+    ).to_list(None)
+    missing = [doc["_id"] for doc in journal_ids if doc["_id"] not in index.positions]
+    _cache.put(user_id, index)
+    for start in range(0, len(missing), 256):
+        batch = await Database.get_collection("journal_entries").find(
+            {"_id": {"$in": missing[start:start + 256]}}, {"content": 1}
+        ).to_list(None)
+        await index_entries(user_id, batch)
+    return index
+
+
+async def similar_entries(user_id, text: str, k: int = 5, exclude: Optional[ObjectId] = None) -> List[Tuple[ObjectId, float]]:
+    """Find the user's ``k`` entries most similar to ``text``."""
+    index = await load_index(user_id)
+    query = (await run_in_threadpool(get_embedder().embed, [text]))[0]
+    return index.search(query, k, exclude)
+
+
+async def similar_journal_entries(user_id, text: str, k: int = 5, exclude: Optional[ObjectId] = None,
+                                  projection: Optional[Dict[str, Any]] = None) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    Like ``similar_entries``, but return ``(entry, cosine)`` pairs from ``journal_entries``.
+
+    An index cached by this worker can still hold entries another process has
+    since archived; those are dropped and the search repeated, so up to ``k``
+    entries still come back.
+    """
+    index = await load_index(user_id)
+    query = (await run_in_threadpool(get_embedder().embed, [text]))[0]
+    while True:
+        matches = index.search(query, k, exclude)
+        entries = await Database.get_collection("journal_entries").find(
+            {"_id": {"$in": [entry_id for entry_id, _ in matches]}}, projection
+        ).to_list(len(matches))
+        by_id = {entry["_id"]: entry for entry in entries}
+        gone = [entry_id for entry_id, _ in matches if entry_id not in by_id]
+        if not gone:
+            return [(by_id[entry_id], score) for entry_id, score in matches]
+        await remove_entries(user_id, gone)
+        for entry_id in gone:
+            index.remove(entry_id)  # Also when the cache has let go of this index meanwhile
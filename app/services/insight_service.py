@@ -0,0 +1,97 @@
+"""
+Weekly insight digests: per-user statistics over one ISO week of journal entries.
+
+Digests are computed offline by ``app.jobs.weekly_insights`` and stored in the
+``weekly_insights`` collection, one document per ``(user_id, week_start)``, so
+serving one is a single indexed lookup.
+"""
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db import Database, to_object_id
+
+# Rough valence of the moods the journal UI offers, used for trends and best/hardest days
+MOOD_SCORES = {
+    "happy": 2,
+    "calm": 1,
+    "neutral": 0,
+    "sad": -1,
+    "anxious": -1,
+    "angry": -2,
+}
+SUMMARY_SNIPPET_CHARS = 300  # Per-entry cap on text sent to the LLM for the summary
+SUMMARY_MAX_ENTRIES = 10
+
+
+def week_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Return the UTC ``[start, end)`` of the Monday-based week containing ``day``."""
+    start = datetime.combine(day - timedelta(days=day.weekday()), time.min)
+    return start, start + timedelta(days=7)
+
+
+def last_complete_week(today: Optional[date] = None) -> datetime:
+    """Start of the most recent week that has fully ended."""
+    today = today or datetime.utcnow().date()
+    return week_bounds(today)[0] - timedelta(days=7)
+
+
+def compute_weekly_stats(entries: List[Dict[str, Any]], week_start: datetime) -> Dict[str, Any]:
+    """Summarise one user's entries for the week starting at ``week_start``."""
+    entries = sorted(entries, key=lambda entry: entry["created_at"])
+    mood_counts = Counter()
+    tag_counts = Counter()
+    daily: Dict[str, List[int]] = {}
+    word_counts = []
+    for entry in entries:
+        word_counts.append(len(entry.get("content", "").split()))
+        tag_counts.update(entry.get("tags") or [])
+        mood = (entry.get("mood") or {}).get("value")
+        if not mood:
+            continue
+        mood_counts[mood] += 1
+        if mood in MOOD_SCORES:
+            daily.setdefault(entry["created_at"].strftime("%Y-%m-%d"), []).append(MOOD_SCORES[mood])
+
+    daily_scores = [{"date": day, "score": round(sum(scores) / len(scores), 2), "entries": len(scores)}
+                    for day, scores in sorted(daily.items())]
+    all_scores = [score for scores in daily.values() for score in scores]
+    return {
+        "week_start": week_start,
+        "entry_count": len(entries),
+        "days_journaled": len({entry["created_at"].date() for entry in entries}),
+        "total_words": sum(word_counts),
+        "avg_words": round(sum(word_counts) / len(word_counts), 1) if word_counts else 0.0,
+        "mood_counts": dict(mood_counts),
+        "dominant_mood": mood_counts.most_common(1)[0][0] if mood_counts else None,
+        "avg_mood_score": round(sum(all_scores) / len(all_scores), 2) if all_scores else None,
+        "daily_mood_scores": daily_scores,
+        "best_day": max(daily_scores, key=lambda d: d["score"])["date"] if daily_scores else None,
+        "hardest_day": min(daily_scores, key=lambda d: d["score"])["date"] if daily_scores else None,
+        "top_tags": [tag for tag, _ in tag_counts.most_common(5)],
+    }
+
+
+def summary_messages(stats: Dict[str, Any], entries: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Build the LLM prompt asking for a short, supportive summary of the week."""
+    snippets = "\n".join(
+        f"- {entry['created_at']:%a}: {entry.get('content', '')[:SUMMARY_SNIPPET_CHARS]}"
+        for entry in sorted(entries, key=lambda entry: entry["created_at"])[-SUMMARY_MAX_ENTRIES:]
+    )
+    facts = (
+        f"Entries: {stats['entry_count']} over {stats['days_journaled']} days. "
+        f"Moods: {stats['mood_counts'] or 'none recorded'}. "
+        f"Best day: {stats['best_day'] or 'n/a'}; hardest day: {stats['hardest_day'] or 'n/a'}."
+    )
+    return [
+        {"role": "system", "content": "You are a supportive journaling companion. In 3-4 sentences, "
+                                      "reflect back the themes of the user's week and offer one gentle suggestion."},
+        {"role": "user", "content": f"{facts}\n\nJournal excerpts:\n{snippets}"},
+    ]
+
+
+async def get_weekly_insight(user_id, week_start: datetime) -> Optional[Dict[str, Any]]:
+    """Fetch a precomputed digest (served from the ``(user_id, week_start)`` index)."""
+    return await Database.get_collection("weekly_insights").find_one(
+        {"user_id": to_object_id(user_id), "week_start": week_start}, {"_id": 0}
+    )
@@ -0,0 +1,95 @@
+"""
+Pluggable chat-completion backends.
+
+``get_llm_provider()`` returns the process-wide provider selected by
+``settings.LLM_BACKEND``, already wrapped with deadline, retry, hedging and
+circuit-breaker policies.
+"""
+import os
+from typing import Optional
+
+from app.core.config import settings
+from app.services.llm.base import (
+    LLMError,
+    LLMProvider,
+    LLMResult,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    LLMUpstreamError,
+)
+from app.services.llm.openai_provider import OpenAICompatibleProvider
+from app.services.llm.resilience import CircuitBreaker, ResilientProvider
+
+_provider: Optional[LLMProvider] = None
+_local_server = None
+
+
+def _build_provider() -> LLMProvider:
+    global _local_server
+    backend = settings.LLM_BACKEND.lower()
+    if backend == "local":
+        from app.services.llm.local_server import LocalLLMServer
+        _local_server = LocalLLMServer().start()
+        endpoint, api_key = _local_server.url, None
+    elif backend == "openai":
+        endpoint = settings.LLM_ENDPOINT
+        api_key = settings.LLM_API_KEY or os.getenv("GITHUB_TOKEN")
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND: {settings.LLM_BACKEND}")
+
+    upstream = OpenAICompatibleProvider(
+        endpoint=endpoint,
+        model=settings.LLM_MODEL,
+        api_key=api_key,
+        timeout=settings.LLM_TIMEOUT,
+        connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+    )
+    return ResilientProvider(
+        upstream,
+        deadline=settings.LLM_DEADLINE,
+        max_retries=settings.LLM_MAX_RETRIES,
+        hedge_delay=settings.LLM_HEDGE_DELAY or None,
+        breaker=CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET),
+    )
+
+
+def get_llm_provider() -> LLMProvider:
+    """Return the shared provider, creating it on first use."""
+    global _provider
+    if _provider is None:
+        _provider = _build_provider()
+    return _provider
+
+
+def set_llm_provider(provider: Optional[LLMProvider]) -> None:
+    """Replace the shared provider (tests, benchmarks)."""
+    global _provider
+    _provider = provider
+
+
+async def close_llm_provider() -> None:
+    """Close pooled connections and stop the local stand-in if it was started."""
+    global _provider, _local_server
+    if _provider is not None:
+        await _provider.aclose()
+        _provider = None
+    if _local_server is not None:
+        _local_server.stop()
+        _local_server = None
+
+
+__all__ = [
+    "CircuitBreaker",
+    "LLMError",
+    "LLMProvider",
+    "LLMResult",
+    "LLMTimeoutError",
+    "LLMUnavailableError",
+    "LLMUpstreamError",
+    "OpenAICompatibleProvider",
+    "ResilientProvider",
+    "close_llm_provider",
+    "get_llm_provider",
+    "set_llm_provider",
+]
@@ -0,0 +1,64 @@
+from typing import Dict, List, Optional
+
+
+class LLMError(Exception):
+    """Base class for LLM backend failures."""
+
+
+class LLMUnavailableError(LLMError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when a call exceeds its deadline."""
+
+
+class LLMUpstreamError(LLMError):
+    """Raised for an error response from the upstream model server."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+    @property
+    def backend_failure(self) -> bool:
+        """A 5xx or a connection error; 4xx responses (bad request, rate limit) mean the backend is up."""
+        return self.status_code is None or self.status_code >= 500
+
+
+class LLMResult:
+    """Completed model response plus the timings and usage reported for it."""
+
+    def __init__(self, content: str, usage: Optional[Dict[str, int]] = None,
+                 time_to_first_token: Optional[float] = None, latency: float = 0.0):
+        self.content = content
+        self.usage = usage or {}
+        self.time_to_first_token = time_to_first_token
+        self.latency = latency
+
+
+class LLMProvider:
+    """Interface every chat-completion backend implements."""
+
+    model: str = ""
+
+    async def complete(self, messages: List[Dict[str, str]], stream: bool = False, **options) -> LLMResult:
+        """
+        Generate a completion for an OpenAI-style message list.
+
+        Args:
+            messages: ``[{"role": ..., "content": ...}, ...]``
+            stream: Whether to use a streaming request upstream (lower time to first token)
+            **options: Extra body fields such as ``max_tokens`` or ``temperature``
+
+        Returns:
+            The complete response text with usage information
+        """
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """Release pooled connections."""
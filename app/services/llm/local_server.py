@@ -0,0 +1,172 @@
+"""
+Local OpenAI-compatible stand-in for the chat completion API.
+
+Serves ``POST /chat/completions`` on localhost with a configurable initial
+latency and token rate, in both plain JSON and SSE streaming modes. Used by the
+``local`` LLM backend, the benchmarks and offline development:
+
+    python -m app.services.llm.local_server --port 8001 --latency 0.2
+
+It runs on its own event loop in a background thread so it never competes
+with the app's loop when embedded in-process.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+
+FILLER = (
+    "It sounds like today asked a lot of you. Thank you for putting it into words. "
+    "Take a slow breath and notice one small thing that went okay."
+).split()
+
+
+class LocalLLMServer:
+    """Minimal HTTP/1.1 server with keep-alive, good enough for one client library."""
+
+    def __init__(self, latency: float = 0.2, token_rate: float = 50.0, completion_tokens: int = 40,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.completion_tokens = completion_tokens
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "LocalLLMServer":
+        self._thread = threading.Thread(target=self._run, name="local-llm", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+                self.requests += 1
+                payload = json.loads(body or b"{}")
+                if payload.get("stream"):
+                    await self._stream(writer, payload)
+                else:
+                    await self._complete(writer, payload)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _tokens(self):
+        return [FILLER[i % len(FILLER)] for i in range(self.completion_tokens)]
+
+    def _usage(self, payload):
+        prompt = sum(len(str(m.get("content", "")).split()) for m in payload.get("messages", []))
+        return {"prompt_tokens": prompt, "completion_tokens": self.completion_tokens,
+                "total_tokens": prompt + self.completion_tokens}
+
+    def _envelope(self, payload, **fields):
+        return {"id": f"local-{self.requests}", "object": "chat.completion", "created": int(time.time()),
+                "model": payload.get("model", "local-model"), **fields}
+
+    async def _complete(self, writer, payload) -> None:
+        await asyncio.sleep(self.latency + self.completion_tokens / self.token_rate)
+        body = json.dumps(self._envelope(
+            payload,
+            choices=[{"index": 0, "finish_reason": "stop",
+                      "message": {"role": "assistant", "content": " ".join(self._tokens())}}],
+            usage=self._usage(payload),
+        )).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+        await writer.drain()
+
+    async def _stream(self, writer, payload) -> None:
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        await asyncio.sleep(self.latency)
+        interval = 1.0 / self.token_rate if self.token_rate > 0 else 0.0
+        tokens = self._tokens()
+        for index, token in enumerate(tokens):
+            delta = {"content": (" " if index else "") + token}
+            if index == 0:
+                delta["role"] = "assistant"
+            await self._event(writer, self._envelope(
+                payload, object="chat.completion.chunk",
+                choices=[{"index": 0, "delta": delta, "finish_reason": None}]))
+            if interval:
+                await asyncio.sleep(interval)
+        await self._event(writer, self._envelope(
+            payload, object="chat.completion.chunk",
+            choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        await self._event(writer, self._envelope(
+            payload, object="chat.completion.chunk", choices=[], usage=self._usage(payload)))
+        await self._chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _event(self, writer, data) -> None:
+        await self._chunk(writer, b"data: " + json.dumps(data).encode() + b"\n\n")
+
+    @staticmethod
+    async def _chunk(writer, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible chat completion server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="tokens per second")
+    parser.add_argument("--tokens", type=int, default=40, help="completion length in tokens")
+    args = parser.parse_args(argv)
+    server = LocalLLMServer(args.latency, args.token_rate, args.tokens, args.host, args.port).start()
+    print(f"Serving chat completions on {server.url}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import json
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.core import metrics
+from app.services.llm.base import LLMProvider, LLMResult, LLMTimeoutError, LLMUpstreamError
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Chat completions over any OpenAI-compatible HTTP API (GitHub Models, Azure
+    AI Inference, vLLM, the local stand-in...).
+
+    One ``httpx.AsyncClient`` is shared by every call so TCP/TLS connections are
+    pooled and kept alive between requests instead of being re-established.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        model: str,
+        api_key: Optional[str] = None,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+    ):
+        self.endpoint = endpoint.rstrip("/")
+        self.model = model
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        self._client = httpx.AsyncClient(
+            base_url=self.endpoint,
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    async def complete(self, messages: List[Dict[str, str]], stream: bool = False, **options) -> LLMResult:
+        body = {"model": self.model, "messages": messages, **options}
+        start = time.perf_counter()
+        try:
+            if stream:
+                body["stream"] = True
+                body["stream_options"] = {"include_usage": True}
+                result = await self._stream(body, start)
+            else:
+                result = await self._complete(body, start)
+        except httpx.TimeoutException as e:
+            metrics.llm_request_duration.observe(time.perf_counter() - start, self.model, "timeout")
+            raise LLMTimeoutError(f"LLM request timed out: {e}") from e
+        except httpx.TransportError as e:
+            metrics.llm_request_duration.observe(time.perf_counter() - start, self.model, "error")
+            raise LLMUpstreamError(f"LLM transport error: {e}") from e
+        except LLMUpstreamError:
+            metrics.llm_request_duration.observe(time.perf_counter() - start, self.model, "error")
+            raise
+
+        metrics.llm_request_duration.observe(result.latency, self.model, "ok")
+        if result.time_to_first_token is not None:
+            metrics.llm_time_to_first_token.observe(result.time_to_first_token, self.model)
+        metrics.llm_tokens.inc(result.usage.get("prompt_tokens", 0), self.model, "prompt")
+        metrics.llm_tokens.inc(result.usage.get("completion_tokens", 0), self.model, "completion")
+        return result
+
+    async def _complete(self, body: dict, start: float) -> LLMResult:
+        response = await self._client.post("/chat/completions", json=body)
+        if response.status_code >= 400:
+            raise LLMUpstreamError(f"LLM returned {response.status_code}: {response.text[:200]}",
+                                   response.status_code)
+        data = response.json()
+        latency = time.perf_counter() - start
+        return LLMResult(data["choices"][0]["message"]["content"] or "", data.get("usage"), latency, latency)
+
+    async def _stream(self, body: dict, start: float) -> LLMResult:
+        parts: List[str] = []
+        usage: Dict[str, int] = {}
+        first_token: Optional[float] = None
+        async with self._client.stream("POST", "/chat/completions", json=body) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise LLMUpstreamError(f"LLM returned {response.status_code}: {response.text[:200]}",
+                                       response.status_code)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                for choice in chunk.get("choices") or []:
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        parts.append(content)
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+        return LLMResult("".join(parts), usage, first_token, time.perf_counter() - start)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
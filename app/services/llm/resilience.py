@@ -0,0 +1,171 @@
+"""
+Deadlines, retries, hedging and circuit breaking around an ``LLMProvider``.
+
+Order of operations for one call: the circuit breaker decides whether to call
+upstream at all; the whole call (including retries) is bounded by a deadline;
+each attempt may be hedged with a duplicate request if it is slower than
+``hedge_delay``; failed attempts are retried with full-jitter backoff.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List, Optional
+
+from app.services.llm.base import (
+    LLMError,
+    LLMProvider,
+    LLMResult,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    LLMUpstreamError,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+
+    After ``failure_threshold`` consecutive failures (timeouts, connection
+    errors and 5xx responses) the circuit opens and calls fail immediately for
+    ``reset_timeout`` seconds. The next call is then let
+    through as a trial (half-open); success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def abandon(self) -> None:
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._trial_in_flight = False
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("LLM circuit breaker opened after %d failures", self._failures)
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class ResilientProvider(LLMProvider):
+    """Wraps another provider with deadline, retry, hedging and breaker policies."""
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        deadline: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.25,
+        backoff_cap: float = 4.0,
+        hedge_delay: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.provider = provider
+        self.model = provider.model
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_delay = hedge_delay
+        self.breaker = breaker or CircuitBreaker()
+
+    async def complete(self, messages: List[Dict[str, str]], stream: bool = False, **options) -> LLMResult:
+        if not self.breaker.allow():
+            raise LLMUnavailableError("LLM backend is unavailable (circuit open)")
+        try:
+            result = await asyncio.wait_for(self._with_retries(messages, stream, options), self.deadline)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise LLMTimeoutError(f"LLM call exceeded its {self.deadline}s deadline")
+        except LLMUpstreamError as e:
+            if e.backend_failure:
+                self.breaker.record_failure()
+            else:
+                # The backend answered; this request (e.g. one over the context window) was at fault
+                self.breaker.record_success()
+            raise
+        except LLMError:
+            self.breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            # The caller went away; don't count it, but free a half-open trial slot.
+            self.breaker.abandon()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _with_retries(self, messages, stream, options) -> LLMResult:
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged(messages, stream, options)
+            except (LLMTimeoutError, LLMUpstreamError) as e:
+                retryable = not isinstance(e, LLMUpstreamError) or e.retryable
+                if attempt >= self.max_retries or not retryable:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                logger.info("LLM attempt %d failed (%s); retrying in %.2fs", attempt + 1, e, delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _hedged(self, messages, stream, options) -> LLMResult:
+        if not self.hedge_delay:
+            return await self.provider.complete(messages, stream=stream, **options)
+
+        primary = asyncio.ensure_future(self.provider.complete(messages, stream=stream, **options))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+            if done:
+                return primary.result()
+
+            # The primary is slower than the hedge threshold: race a duplicate request.
+            hedge = asyncio.ensure_future(self.provider.complete(messages, stream=stream, **options))
+            pending = {primary, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def aclose(self) -> None:
+        await self.provider.aclose()
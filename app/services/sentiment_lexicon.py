@@ -0,0 +1,74 @@
+"""
+Word valences and modifier lists for the lexicon tier of the sentiment cascade.
+
+Valences run from -3 (strongly negative) to +3 (strongly positive) and lean
+towards the vocabulary of personal journaling and support chat rather than
+product reviews.
+"""
+
+LEXICON = {
+    # Positive
+    "accomplished": 2.2, "admire": 1.8, "adore": 2.6, "alive": 1.2, "amazing": 2.8, "appreciate": 1.8,
+    "appreciated": 1.9, "awesome": 2.8, "beautiful": 2.4, "best": 2.4, "better": 1.4, "blessed": 2.2,
+    "bliss": 2.8, "brave": 1.8, "brilliant": 2.6, "calm": 1.6, "calmer": 1.5, "celebrate": 2.2,
+    "celebrated": 2.2, "cheerful": 2.2, "comfort": 1.6, "comfortable": 1.4, "confident": 1.9,
+    "content": 1.4, "cozy": 1.6, "delighted": 2.6, "delightful": 2.6, "energized": 1.9, "enjoy": 1.9,
+    "enjoyed": 1.9, "excellent": 2.8, "excited": 2.2, "exciting": 2.1, "fantastic": 2.8, "fine": 0.8,
+    "free": 1.2, "fun": 2.0, "glad": 2.0, "good": 1.9, "gorgeous": 2.4, "grateful": 2.3, "great": 2.4,
+    "happier": 2.2, "happiest": 2.8, "happy": 2.5, "healthy": 1.5, "helpful": 1.6, "hope": 1.6,
+    "hopeful": 1.9, "hug": 1.8, "hugs": 1.8, "improved": 1.6, "improving": 1.5, "inspired": 2.1,
+    "joy": 2.7, "joyful": 2.7, "kind": 1.8, "laugh": 2.0, "laughed": 2.0, "laughing": 2.0,
+    "lighter": 1.3, "love": 2.6, "loved": 2.6, "lovely": 2.4, "loving": 2.3, "lucky": 1.9,
+    "motivated": 1.9, "nice": 1.8, "okay": 0.6, "ok": 0.6, "optimistic": 2.0, "peace": 2.0,
+    "peaceful": 2.2, "perfect": 2.6, "pleased": 2.0, "positive": 1.8, "productive": 1.7, "proud": 2.2,
+    "recovered": 1.6, "refreshed": 1.9, "relaxed": 2.0, "relaxing": 1.9, "relief": 1.9, "relieved": 2.0,
+    "rested": 1.5, "safe": 1.5, "satisfied": 1.9, "smile": 1.9, "smiled": 1.9, "smiling": 1.9,
+    "strong": 1.5, "stronger": 1.6, "success": 2.2, "successful": 2.2, "support": 1.4,
+    "supported": 1.7, "supportive": 1.8, "thank": 1.6, "thankful": 2.2, "thanks": 1.5, "thrilled": 2.7,
+    "valued": 1.8, "warm": 1.4, "welcome": 1.4, "well": 1.0, "win": 2.0, "wonderful": 2.8, "yay": 2.4,
+
+    # Negative
+    "abandoned": -2.5, "afraid": -2.1, "agitated": -1.9, "alone": -1.8, "angry": -2.4, "annoyed": -1.8,
+    "annoying": -1.8, "anxiety": -2.2, "anxious": -2.1, "ashamed": -2.3, "awful": -2.6, "bad": -2.0,
+    "betrayed": -2.6, "bitter": -1.8, "bored": -1.2, "broke": -1.6, "broken": -2.2, "burden": -1.9,
+    "burned": -1.4, "burnout": -2.2, "cried": -2.0, "cry": -1.9, "crying": -2.0, "depressed": -2.7,
+    "depressing": -2.5, "depression": -2.6, "desperate": -2.4, "devastated": -2.9, "disappointed": -2.1,
+    "disappointing": -2.0, "disgusted": -2.3, "drained": -2.0, "dread": -2.3, "dreading": -2.2,
+    "embarrassed": -1.8, "empty": -2.0, "exhausted": -2.0, "fail": -2.1, "failed": -2.2,
+    "failure": -2.4, "fear": -2.1, "fight": -1.6, "fought": -1.6, "frustrated": -2.1,
+    "frustrating": -2.0, "furious": -2.8, "grief": -2.6, "guilt": -2.1, "guilty": -2.1, "hate": -2.7,
+    "hated": -2.6, "heartbroken": -2.9, "helpless": -2.4, "hopeless": -2.8, "horrible": -2.7,
+    "hurt": -2.2, "hurting": -2.2, "ignored": -1.9, "insecure": -1.8, "irritated": -1.8,
+    "isolated": -2.1, "jealous": -1.6, "lonely": -2.3, "lost": -1.6, "mad": -2.0, "miserable": -2.7,
+    "miss": -1.2, "missed": -1.0, "nervous": -1.7, "numb": -1.8, "overwhelmed": -2.2,
+    "overwhelming": -2.1, "pain": -2.2, "painful": -2.2, "panic": -2.5, "pathetic": -2.4,
+    "pointless": -2.2, "rejected": -2.3, "regret": -1.9, "restless": -1.3, "sad": -2.2,
+    "sadness": -2.2, "scared": -2.1, "shame": -2.3, "sick": -1.7, "sleepless": -1.6, "sorry": -1.0,
+    "stress": -1.9, "stressed": -2.0, "stressful": -2.0, "struggle": -1.8, "struggling": -1.9,
+    "stuck": -1.6, "suffer": -2.3, "suffering": -2.4, "terrible": -2.7, "terrified": -2.7,
+    "tense": -1.6, "tired": -1.4, "trapped": -2.2, "ugly": -2.0, "unhappy": -2.3, "upset": -2.0,
+    "useless": -2.3, "weak": -1.6, "worried": -1.9, "worry": -1.8, "worrying": -1.8, "worse": -2.0,
+    "worst": -2.6, "worthless": -2.8, "wrong": -1.6,
+}
+
+# Flip (and damp) the valence of sentiment words within NEGATION_WINDOW tokens after these
+NEGATIONS = {
+    "not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "without", "hardly", "barely",
+    "cannot", "can't", "cant", "don't", "dont", "doesn't", "doesnt", "didn't", "didnt", "isn't", "isnt",
+    "wasn't", "wasnt", "aren't", "arent", "weren't", "werent", "won't", "wont", "wouldn't", "wouldnt",
+    "shouldn't", "shouldnt", "couldn't", "couldnt", "haven't", "havent", "hasn't", "hasnt", "ain't",
+}
+NEGATION_WINDOW = 3
+NEGATION_SCALAR = -0.74
+
+# Scale the sentiment word that directly follows
+INTENSIFIERS = {
+    "very": 1.3, "really": 1.3, "so": 1.25, "extremely": 1.5, "incredibly": 1.5, "totally": 1.3,
+    "completely": 1.35, "absolutely": 1.4, "super": 1.3, "truly": 1.3, "deeply": 1.4, "too": 1.2,
+    "slightly": 0.6, "somewhat": 0.7, "kinda": 0.7, "little": 0.7, "bit": 0.7,
+}
+
+# Contrast words: what follows them carries more weight than what came before
+CONTRASTS = {"but", "however", "though", "yet"}
+BEFORE_CONTRAST_WEIGHT = 0.5
+AFTER_CONTRAST_WEIGHT = 1.5
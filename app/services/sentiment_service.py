@@ -0,0 +1,205 @@
+"""
+Two-tier sentiment classification.
+
+The first tier scores text against a word lexicon with VADER-style rules
+(negation, intensifiers, contrast words, exclamation marks), vectorised with
+numpy across a whole batch: no model, microseconds per message. Only messages
+whose lexicon confidence is below ``SENTIMENT_THRESHOLD`` are escalated to the
+transformer tier (``SENTIMENT_MODEL``, loaded lazily on first escalation).
+When ``transformers`` is not installed, the lexicon result is used for
+everything.
+"""
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.config import settings
+from app.services import sentiment_lexicon as lex
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z']+")
+LABELS = ("negative", "neutral", "positive")
+NEUTRAL_BAND = 0.05  # |compound| below this is neutral
+NORMALIZATION_ALPHA = 15.0
+EXCLAMATION_BOOST = 0.292
+MAX_EXCLAMATIONS = 4
+AMBIGUOUS_CONFIDENCE = 0.2  # Neutral despite sentiment words, i.e. mixed or weak signals
+NO_EVIDENCE_CONFIDENCE = 0.35  # No sentiment words at all: most likely plain factual text
+MODEL_LABELS = {"label_0": "negative", "label_1": "neutral", "label_2": "positive"}
+
+
+class SentimentResult:
+    """Label, polarity score in [-1, 1], confidence in [0, 1] and the tier that decided it."""
+
+    def __init__(self, label: str, score: float, confidence: float, tier: str):
+        self.label = label
+        self.score = score
+        self.confidence = confidence
+        self.tier = tier
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"sentiment": self.label, "score": round(self.score, 4),
+                "confidence": round(self.confidence, 4), "tier": self.tier}
+
+
+class LexiconScorer:
+    """Vectorised lexicon and rule scorer."""
+
+    def __init__(self):
+        vocabulary = set(lex.LEXICON) | lex.NEGATIONS | set(lex.INTENSIFIERS) | lex.CONTRASTS
+        self._ids = {word: i + 1 for i, word in enumerate(sorted(vocabulary))}  # 0 is "unknown word"
+        size = len(self._ids) + 1
+        self._valence = np.zeros(size, dtype=np.float32)
+        self._negation = np.zeros(size, dtype=bool)
+        self._intensity = np.ones(size, dtype=np.float32)
+        self._contrast = np.zeros(size, dtype=bool)
+        for word, i in self._ids.items():
+            self._valence[i] = lex.LEXICON.get(word, 0.0)
+            self._negation[i] = word in lex.NEGATIONS
+            self._intensity[i] = lex.INTENSIFIERS.get(word, 1.0)
+            self._contrast[i] = word in lex.CONTRASTS
+
+    def score(self, texts: Sequence[str]) -> List[SentimentResult]:
+        count = len(texts)
+        if not count:
+            return []
+        token_ids = [[self._ids.get(token, 0) for token in TOKEN_RE.findall(text.lower())] for text in texts]
+        lengths = np.fromiter((len(ids) for ids in token_ids), dtype=np.int64, count=count)
+        ids = np.fromiter((i for row in token_ids for i in row), dtype=np.int64, count=int(lengths.sum()))
+        text_of = np.repeat(np.arange(count), lengths)
+
+        valence = self._valence[ids]
+        # Intensifier directly before a word scales it
+        same_text = text_of[1:] == text_of[:-1]
+        valence[1:] *= np.where(same_text, self._intensity[ids[:-1]], 1.0)
+        # A negation within the window before a word flips and damps it
+        negation = self._negation[ids]
+        negated = np.zeros(len(ids), dtype=bool)
+        for shift in range(1, lex.NEGATION_WINDOW + 1):
+            negated[shift:] |= negation[:-shift] & (text_of[shift:] == text_of[:-shift])
+        valence = np.where(negated, valence * lex.NEGATION_SCALAR, valence)
+        # After the last contrast word counts for more, before it for less
+        contrast = self._contrast[ids].astype(np.int64)
+        text_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        running = np.cumsum(contrast)
+        before_text = np.concatenate(([0], running))[text_starts]
+        contrasts_before = running - contrast - before_text[text_of]
+        contrasts_total = np.bincount(text_of, weights=contrast, minlength=count)[text_of]
+        weight = np.where(contrasts_total == 0, 1.0,
+                          np.where(contrasts_before >= contrasts_total, lex.AFTER_CONTRAST_WEIGHT,
+                                   lex.BEFORE_CONTRAST_WEIGHT))
+        valence = valence * weight
+
+        total = np.bincount(text_of, weights=valence, minlength=count)
+        positive = np.bincount(text_of, weights=np.clip(valence, 0, None), minlength=count)
+        negative = np.bincount(text_of, weights=np.clip(-valence, 0, None), minlength=count)
+        hits = np.bincount(text_of, weights=valence != 0, minlength=count)
+        exclamations = np.fromiter((min(text.count("!"), MAX_EXCLAMATIONS) for text in texts), np.float64, count)
+        total += np.sign(total) * exclamations * EXCLAMATION_BOOST
+
+        compound = total / np.sqrt(total * total + NORMALIZATION_ALPHA)
+        mass = positive + negative
+        agreement = np.divide(np.abs(positive - negative), mass, out=np.zeros(count), where=mass > 0)
+        label_index = np.where(compound >= NEUTRAL_BAND, 2, np.where(compound <= -NEUTRAL_BAND, 0, 1))
+        confidence = np.where(hits == 0, NO_EVIDENCE_CONFIDENCE,
+                              np.where(label_index == 1, AMBIGUOUS_CONFIDENCE, np.abs(compound) * agreement))
+        return [SentimentResult(LABELS[label_index[i]], float(compound[i]), float(confidence[i]), "lexicon")
+                for i in range(count)]
+
+
+class TransformerSentimentModel:
+    """Sentence-level sentiment model run on CPU (requires the ``transformers`` package)."""
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        from transformers import pipeline
+        self._pipeline = pipeline("sentiment-analysis", model=model_name, device=-1)
+        self.batch_size = batch_size
+        self.name = model_name
+
+    def predict(self, texts: Sequence[str]) -> List[SentimentResult]:
+        outputs = self._pipeline(list(texts), batch_size=self.batch_size, truncation=True)
+        results = []
+        for output in outputs:
+            label = output["label"].lower()
+            label = MODEL_LABELS.get(label, label)
+            polarity = {"positive": 1.0, "negative": -1.0}.get(label, 0.0)
+            results.append(SentimentResult(label, polarity * output["score"], output["score"], "model"))
+        return results
+
+
+class SentimentCascade:
+    """Lexicon first; escalate results below ``threshold`` confidence to the model."""
+
+    def __init__(self, threshold: float, model_name: Optional[str] = None, escalate: bool = True):
+        self.threshold = threshold
+        self.model_name = model_name
+        self.escalate = escalate
+        self.lexicon = LexiconScorer()
+        self._model = None
+        self._model_failed = False
+        self._model_lock = threading.Lock()
+
+    def _get_model(self) -> Optional[TransformerSentimentModel]:
+        if self._model is None and not self._model_failed:
+            with self._model_lock:
+                if self._model is None and not self._model_failed:
+                    try:
+                        self._model = TransformerSentimentModel(self.model_name)
+                        logger.info("Loaded sentiment model %s", self.model_name)
+                    except Exception as e:  # ImportError, download or load failure
+                        self._model_failed = True
+                        logger.warning("Sentiment model unavailable, using the lexicon only: %s", e)
+        return self._model
+
+    def _escalate(self, texts: Sequence[str]) -> Optional[List[SentimentResult]]:
+        model = self._get_model()
+        return model.predict(texts) if model is not None else None
+
+    def needs_model(self, result: SentimentResult) -> bool:
+        return self.escalate and not self._model_failed and result.confidence < self.threshold
+
+    def classify(self, texts: Sequence[str]) -> List[SentimentResult]:
+        """Classify a batch synchronously (for scripts and worker threads)."""
+        results = self.lexicon.score(texts)
+        uncertain = [i for i, result in enumerate(results) if self.needs_model(result)]
+        if uncertain:
+            escalated = self._escalate([texts[i] for i in uncertain])
+            if escalated is not None:
+                for i, result in zip(uncertain, escalated):
+                    results[i] = result
+        return results
+
+    async def aclassify(self, texts: Sequence[str]) -> List[SentimentResult]:
+        """Classify a batch, running only the escalated subset off the event loop."""
+        results = self.lexicon.score(texts)
+        uncertain = [i for i, result in enumerate(results) if self.needs_model(result)]
+        if uncertain:
+            escalated = await run_in_threadpool(self._escalate, [texts[i] for i in uncertain])
+            if escalated is not None:
+                for i, result in zip(uncertain, escalated):
+                    results[i] = result
+        for result in results:
+            metrics.sentiment_classifications.inc(1, result.tier)
+        return results
+
+
+_cascade: Optional[SentimentCascade] = None
+
+
+def get_sentiment_cascade() -> SentimentCascade:
+    """Return the configured cascade, creating it on first use."""
+    global _cascade
+    if _cascade is None:
+        _cascade = SentimentCascade(settings.SENTIMENT_THRESHOLD, settings.SENTIMENT_MODEL,
+                                    settings.SENTIMENT_ESCALATION)
+    return _cascade
+
+
+async def analyze_sentiments(texts: Sequence[str]) -> List[SentimentResult]:
+    return await get_sentiment_cascade().aclassify(list(texts))
@@ -0,0 +1,183 @@
+"""
+Per-user change sequence for journal entries, used by the delta sync endpoint.
+
+Every journal write takes the next number from ``users.change_seq`` and stores
+it on the entry (``seq``); deletes store it on a tombstone in
+``journal_tombstones``. A client's sync token is the highest sequence number it
+has seen, so "what changed since X" is an indexed range scan on
+``(user_id, seq)``, and an up-to-date client is answered from the user document
+that authentication already loaded.
+
+A number is reserved before the write that stores it, and writes are not
+transactions, so a higher number can be written while a lower one is still in
+flight. Each reservation is therefore listed in ``users.sync_pending`` (by the
+same pipeline update that takes it, so its floor is exact) until its write has
+finished, and sync only returns
+changes below the lowest pending number. Writes that take numbers run inside
+``sequenced_write``, which clears their reservations when they end.
+"""
+import contextvars
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from app.core.config import settings
+from app.db import Database, to_object_id, user_id_filter
+from app.services.archive_service import archived_changes_since
+
+BACKFILL_BATCH_SIZE = 500
+
+_reservations: contextvars.ContextVar[Optional[List[ObjectId]]] = contextvars.ContextVar(
+    "change_seq_reservations", default=None)
+
+
+@asynccontextmanager
+async def sequenced_write(user_id):
+    """
+    ``Database.write_session`` for writes that take change sequence numbers.
+
+    Numbers reserved inside stay pending for sync until the block exits,
+    whether or not the write succeeded.
+    """
+    tokens: List[ObjectId] = []
+    reset = _reservations.set(tokens)
+    try:
+        async with Database.write_session(user_id) as session:
+            yield session
+    finally:
+        _reservations.reset(reset)
+        if tokens:
+            await Database.get_collection("users").update_one(
+                user_id_filter(user_id, "_id"), {"$pull": {"sync_pending": {"token": {"$in": tokens}}}}
+            )
+
+
+async def next_change_seq(user_id, session=None) -> int:
+    """Reserve the next change sequence number for a user."""
+    return await reserve_change_seqs(user_id, 1, session)
+
+
+async def reserve_change_seqs(user_id, count: int, session=None) -> int:
+    """Reserve ``count`` consecutive sequence numbers and return the highest (inside ``sequenced_write``)."""
+    tokens = _reservations.get()
+    if tokens is None:
+        raise RuntimeError("Change sequence numbers must be reserved inside sequenced_write()")
+    token = ObjectId()
+    current = {"$ifNull": ["$change_seq", 0]}
+    # A pipeline update reads change_seq once, so the listed floor is exactly our first number
+    user = await Database.get_collection("users").find_one_and_update(
+        user_id_filter(user_id, "_id"),
+        [{"$set": {
+            "change_seq": {"$add": [current, count]},
+            "sync_pending": {"$concatArrays": [
+                {"$ifNull": ["$sync_pending", []]},
+                [{"token": token, "floor": {"$add": [current, 1]}, "at": datetime.utcnow()}],
+            ]},
+        }}],
+        projection={"change_seq": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    tokens.append(token)
+    return user["change_seq"]
+
+
+async def settled_change_seq(user: Dict[str, Any]) -> int:
+    """
+    The highest sequence number below every reservation still in flight.
+
+    ``user`` must be one read of the user document: it then lists every
+    reservation up to its ``change_seq`` that had not finished. Reservations
+    older than ``SYNC_PENDING_TIMEOUT_SECONDS`` belong to writes that died
+    and are dropped.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.SYNC_PENDING_TIMEOUT_SECONDS)
+    pending = user.get("sync_pending") or []
+    live = [reservation["floor"] for reservation in pending if reservation["at"] >= cutoff]
+    if len(live) < len(pending):
+        await Database.get_collection("users").update_one(
+            user_id_filter(user["_id"], "_id"), {"$pull": {"sync_pending": {"at": {"$lt": cutoff}}}}
+        )
+    return min([user.get("change_seq", 0)] + [floor - 1 for floor in live])
+
+
+async def record_tombstone(user_id, entry_id: ObjectId, session=None) -> int:
+    """Remember that an entry was deleted so syncing clients can drop it (inside ``sequenced_write``)."""
+    seq = await next_change_seq(user_id, session)
+    await Database.get_collection("journal_tombstones").insert_one(
+        {"user_id": to_object_id(user_id), "entry_id": entry_id, "seq": seq}, session=session
+    )
+    return seq
+
+
+async def backfill_change_seqs(user: Dict[str, Any]) -> int:
+    """
+    Give entries written before sync existed a sequence number.
+
+    Runs once per user (guarded by ``users.sync_backfilled``), one bulk write
+    per batch, and returns the user's ``change_seq`` and ``sync_pending``
+    afterwards.
+    """
+    journal_collection = Database.get_collection("journal_entries")
+    query = {**user_id_filter(user["_id"]), "seq": {"$exists": False}}
+    while True:
+        batch = await journal_collection.find(query, {"_id": 1}).sort("created_at", 1) \
+            .limit(BACKFILL_BATCH_SIZE).to_list(BACKFILL_BATCH_SIZE)
+        if not batch:
+            break
+        async with sequenced_write(user["_id"]) as session:
+            highest = await reserve_change_seqs(user["_id"], len(batch), session)
+            first = highest - len(batch) + 1
+            # Guard on seq so an entry sequenced concurrently by a write keeps its newer number
+            await journal_collection.bulk_write([
+                UpdateOne({"_id": entry["_id"], "seq": {"$exists": False}}, {"$set": {"seq": first + offset}})
+                for offset, entry in enumerate(batch)
+            ], ordered=False, session=session)
+    return await Database.get_collection("users").find_one_and_update(
+        user_id_filter(user["_id"], "_id"),
+        {"$set": {"sync_backfilled": True}},
+        projection={"change_seq": 1, "sync_pending": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def changes_since(user: Dict[str, Any], since: int, limit: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int, bool]:
+    """
+    Return ``(entries, tombstones, next_since, has_more)`` for changes after ``since``.
+
+    At most ``limit`` changes are returned, in sequence order, and only below
+    any write still in flight. ``next_since`` is the token to resume from: the
+    highest number returned, so a change still being written is picked up by
+    a later sync.
+    """
+    if not user.get("sync_backfilled"):
+        user = {**user, **await backfill_change_seqs(user)}
+    settled = await settled_change_seq(user)
+    if since >= settled:
+        return [], [], since, False
+
+    query = {**user_id_filter(user["_id"]), "seq": {"$gt": since, "$lte": settled}}
+    entries = await Database.get_collection("journal_entries").find(query) \
+        .sort("seq", 1).limit(limit).to_list(limit)
+    tombstones = await Database.get_collection("journal_tombstones").find(query) \
+        .sort("seq", 1).limit(limit).to_list(limit)
+    if user.get("archived_through"):
+        # Old entries a far-behind client has not seen may have moved to the archive
+        entries += [entry for entry in await archived_changes_since(user["_id"], since, limit)
+                    if entry["seq"] <= settled]
+
+    # Merge both streams and keep the first `limit` changes overall
+    changes = sorted([(e["seq"], "entry", e) for e in entries] + [(t["seq"], "tombstone", t) for t in tombstones],
+                     key=lambda change: change[0])
+    merged = changes[:limit]
+    if not merged:
+        return [], [], since, False
+    return (
+        [doc for _, kind, doc in merged if kind == "entry"],
+        [doc for _, kind, doc in merged if kind == "tombstone"],
+        merged[-1][0],
+        len(merged) == limit,  # A full page: there may be more
+    )
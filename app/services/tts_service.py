@@ -1,19 +1,28 @@
-from TTS.api import TTS
 import io
+import os
+import tempfile
+import time
+from app.core import metrics
 
 class TTSService:
     def __init__(self):
+        from TTS.api import TTS  # Heavy optional dependency, imported only when speech is requested
         # Load the TTS model (e.g., Coqui TTS pre-trained model)
-        self.tts = TTS(model_name="tts_models/en/ljspeech/vits", progress_bar=False, gpu=False)
+        self.model_name = "tts_models/en/ljspeech/vits"
+        self.tts = TTS(model_name=self.model_name, progress_bar=False, gpu=False)
 
     def generate_audio_response(self, text: str) -> io.BytesIO:
-        # Generate audio from text
-        audio_path = "response.wav"
-        self.tts.tts_to_file(text=text, file_path=audio_path)
-        
-        # Load the audio into a BytesIO object for streaming
-        audio_buffer = io.BytesIO()
-        with open(audio_path, "rb") as f:
-            audio_buffer.write(f.read())
-        audio_buffer.seek(0)
-        return audio_buffer
\ No newline at end of file
+        # Synthesize into a private temporary file: concurrent requests and workers must not share one path
+        fd, audio_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            start = time.perf_counter()
+            self.tts.tts_to_file(text=text, file_path=audio_path)
+            metrics.tts_synthesis_duration.observe(time.perf_counter() - start, self.model_name)
+
+            # Load the audio into a BytesIO object for streaming
+            with open(audio_path, "rb") as f:
+                audio_buffer = io.BytesIO(f.read())
+        finally:
+            os.remove(audio_path)
+        return audio_buffer
@@ -0,0 +1,215 @@
+"""
+Voice journal recordings stored in GridFS.
+
+Uploads are parsed straight off the request stream: multipart data is fed to
+``python-multipart``'s push parser as it arrives and the audio part is written
+to a GridFS upload stream, so at most one GridFS chunk (plus one network read)
+is held in memory regardless of the recording's length. Playback reads the
+requested byte range chunk by chunk, which lets players seek in long
+recordings without downloading everything before the seek point.
+"""
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from gridfs.errors import NoFile
+
+from app.core.config import settings
+from app.db import Database, to_object_id
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # Older releases ship the module as `multipart`
+    from multipart.multipart import MultipartParser, parse_options_header
+
+VOICE_BUCKET = "voice_recordings"
+CHUNK_SIZE = 255 * 1024  # GridFS default; playback reads one chunk per iteration
+MAX_FIELD_BYTES = 64 * 1024  # Non-file form fields (content, mood, tags)
+
+
+class UploadRejected(Exception):
+    """The upload cannot be stored; ``status_code`` and ``detail`` are meant for the HTTP response."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def _bucket():
+    return Database.get_gridfs_bucket(VOICE_BUCKET)
+
+
+class _PartEvents:
+    """Collects python-multipart callbacks (which are synchronous) for async processing."""
+
+    def __init__(self):
+        self.events: List[Tuple[str, Any]] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": lambda data, start, end: self._append("_header_field", data[start:end]),
+            "on_header_value": lambda data, start, end: self._append("_header_value", data[start:end]),
+            "on_header_end": self._header_end,
+            "on_headers_finished": lambda: self.events.append(("headers", self._headers)),
+            "on_part_data": lambda data, start, end: self.events.append(("data", bytes(data[start:end]))),
+            "on_part_end": lambda: self.events.append(("end", None)),
+        }
+
+    def _append(self, name: str, data: bytes) -> None:
+        setattr(self, name, getattr(self, name) + data)
+
+    def _part_begin(self) -> None:
+        self._headers = {}
+
+    def _header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def drain(self) -> List[Tuple[str, Any]]:
+        events, self.events = self.events, []
+        return events
+
+
+def _part_info(headers: Dict[bytes, bytes]) -> Tuple[str, Optional[str], str]:
+    _, options = parse_options_header(headers.get(b"content-disposition", b""))
+    name = options.get(b"name", b"").decode("utf-8", "replace")
+    filename = options.get(b"filename")
+    content_type = headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+    return name, filename.decode("utf-8", "replace") if filename is not None else None, content_type
+
+
+async def store_upload(request, user_id) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Stream a ``multipart/form-data`` request into GridFS.
+
+    The recording is read from the ``audio`` file part; ``content``, ``mood``
+    (JSON) and ``tags`` (repeatable) are returned as form fields. Returns
+    ``(fields, recording)`` where ``recording`` describes the stored file. An
+    invalid or oversized upload is removed from GridFS before
+    ``UploadRejected`` is raised.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadRejected(415, "Expected a multipart/form-data body")
+
+    events = _PartEvents()
+    parser = MultipartParser(options[b"boundary"], events.callbacks())
+    fields: Dict[str, Any] = {"tags": []}
+    grid_in = None
+    recording: Optional[Dict[str, Any]] = None
+    part: Optional[Tuple[str, Optional[str], str]] = None
+    field_value = b""
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, value in events.drain():
+                if kind == "headers":
+                    part, field_value = _part_info(value), b""
+                    name, filename, part_type = part
+                    if name == "audio" and filename is not None:
+                        if grid_in is not None:
+                            raise UploadRejected(400, "Only one audio file per entry")
+                        if not part_type.startswith("audio/"):
+                            raise UploadRejected(415, "The audio part must have an audio/* content type")
+                        grid_in = _bucket().open_upload_stream(
+                            filename, chunk_size_bytes=CHUNK_SIZE,
+                            metadata={"user_id": to_object_id(user_id), "content_type": part_type},
+                        )
+                        recording = {"file_id": grid_in._id, "filename": filename,
+                                     "content_type": part_type, "length": 0}
+                elif kind == "data":
+                    if part is not None and part[0] == "audio" and grid_in is not None:
+                        recording["length"] += len(value)
+                        if recording["length"] > settings.VOICE_MAX_UPLOAD_BYTES:
+                            raise UploadRejected(413, "Recording is too large")
+                        await grid_in.write(value)
+                    else:
+                        field_value += value
+                        if len(field_value) > MAX_FIELD_BYTES:
+                            raise UploadRejected(413, "Form field is too large")
+                elif kind == "end" and part is not None:
+                    name = part[0]
+                    if name == "tags":
+                        fields["tags"].append(field_value.decode("utf-8"))
+                    elif name == "mood":
+                        try:
+                            fields["mood"] = json.loads(field_value)
+                        except ValueError:
+                            raise UploadRejected(422, "mood must be a JSON object")
+                    elif name != "audio":
+                        fields[name] = field_value.decode("utf-8")
+                    part = None
+        parser.finalize()
+        if grid_in is None:
+            raise UploadRejected(400, "Missing audio file part")
+        if recording["length"] == 0:
+            raise UploadRejected(400, "Empty recording")
+        await grid_in.close()
+    except BaseException:
+        if grid_in is not None and not grid_in.closed:
+            await grid_in.abort()
+        raise
+    return fields, recording
+
+
+async def open_recording(file_id):
+    """Return the GridFS file for ``file_id``, or None if it does not exist."""
+    try:
+        return await _bucket().open_download_stream(to_object_id(file_id))
+    except (NoFile, ValueError):
+        return None
+
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a ``Range`` header into an inclusive ``(start, end)`` byte range.
+
+    Returns None when the whole file should be sent (no header, or a header
+    this parser ignores). Only the first range of a multi-range request is
+    honoured. Raises ``RangeNotSatisfiable`` for ranges past the end.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    first = header[len("bytes="):].split(",")[0].strip()
+    start_text, _, end_text = first.partition("-")
+    try:
+        if not start_text:
+            suffix = int(end_text)
+            if suffix == 0:
+                raise RangeNotSatisfiable(first)
+            return max(length - suffix, 0), length - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else length - 1
+    except ValueError:
+        return None
+    if start >= length or end < start:
+        raise RangeNotSatisfiable(first)
+    return start, min(end, length - 1)
+
+
+async def iter_range(grid_out, start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield bytes ``start`` to ``end`` (inclusive), reading at most one chunk at a time."""
+    grid_out.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        data = await grid_out.read(min(CHUNK_SIZE, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+async def delete_recording(file_id) -> None:
+    try:
+        await _bucket().delete(to_object_id(file_id))
+    except NoFile:
+        pass  # Already gone
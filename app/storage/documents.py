@@ -0,0 +1,334 @@
+"""
+MongoDB document semantics shared by the storage engines that are not MongoDB.
+
+Filters, update operators, sorting, projection and the aggregation stages the
+app uses, evaluated in Python on plain ``dict`` documents. Only what the
+endpoints, services and jobs actually call is implemented: equality, range,
+``$in``/``$nin``/``$exists``/``$type`` filters with ``$or``/``$and``,
+``$set``/``$inc``/``$max``/``$unset``/``$push``/``$pull``/``$setOnInsert``
+updates or update pipelines of ``$set`` stages, and the ``$match``/``$group``/``$sort``/``$project``/``$skip``/``$limit``
+stages. Anything else raises ``NotImplementedError`` rather than silently
+returning the wrong documents.
+
+Used by the embedded SQLite engine (``app.storage.sqlite_engine``) and by the
+in-memory stand-in in ``benchmarks.memory_mongo``.
+"""
+import copy
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+
+def get_path(doc: Dict[str, Any], path: str):
+    """Return ``(value, present)`` for a dotted ``path``."""
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None, False
+        value = value[part]
+    return value, True
+
+
+def set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: Dict[str, Any], path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _type_matches(value: Any, type_name: str) -> bool:
+    return {
+        "string": isinstance(value, str),
+        "objectId": isinstance(value, ObjectId),
+        "date": isinstance(value, datetime),
+        "bool": isinstance(value, bool),
+    }.get(type_name, False)
+
+
+def _compare(value: Any, op: str, operand: Any, present: bool) -> bool:
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op == "$exists":
+        return present == bool(operand)
+    if op == "$type":
+        return present and _type_matches(value, operand)
+    if value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"Unsupported query operator: {op}")
+
+
+def is_operator_condition(condition: Any) -> bool:
+    """True for ``{"$gte": ..., "$lt": ...}``-style conditions, False for literal values."""
+    return isinstance(condition, dict) and bool(condition) and all(k.startswith("$") for k in condition)
+
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """Return True if ``doc`` satisfies a (simple) MongoDB filter."""
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        value, present = get_path(doc, key)
+        if is_operator_condition(condition):
+            if not all(_compare(value, op, operand, present) for op, operand in condition.items()):
+                return False
+        elif isinstance(value, list) and not isinstance(condition, list):
+            if condition not in value:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _pulls(item: Any, condition: Any) -> bool:
+    """Whether ``$pull`` removes ``item``: a filter for document items, a condition or a value otherwise."""
+    if isinstance(item, dict) and isinstance(condition, dict) and not is_operator_condition(condition):
+        return matches(item, condition)
+    if is_operator_condition(condition):
+        return matches({"item": item}, {"item": condition})
+    return item == condition
+
+
+def apply_update(doc: Dict[str, Any], update, inserting: bool = False) -> None:
+    """Apply update operators, or an update pipeline of ``$set`` stages, to ``doc`` in place."""
+    if isinstance(update, list):
+        for stage in update:
+            for op, fields in stage.items():
+                if op != "$set":
+                    raise NotImplementedError(f"Unsupported update pipeline stage: {op}")
+                # Every expression in a stage sees the document as it was before the stage
+                values = {path: evaluate(expression, doc) for path, expression in fields.items()}
+                for path, value in values.items():
+                    set_path(doc, path, copy.deepcopy(value))
+        return
+    for op, fields in update.items():
+        if op == "$set":
+            for path, value in fields.items():
+                set_path(doc, path, copy.deepcopy(value))
+        elif op == "$setOnInsert":
+            if inserting:
+                for path, value in fields.items():
+                    set_path(doc, path, copy.deepcopy(value))
+        elif op == "$inc":
+            for path, amount in fields.items():
+                current, _ = get_path(doc, path)
+                set_path(doc, path, (current or 0) + amount)
+        elif op == "$max":
+            for path, value in fields.items():
+                current, present = get_path(doc, path)
+                if not present or current is None or value > current:
+                    set_path(doc, path, value)
+        elif op == "$unset":
+            for path in fields:
+                _unset_path(doc, path)
+        elif op == "$push":
+            for path, value in fields.items():
+                current, present = get_path(doc, path)
+                items = list(current) if present else []
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(value["$each"])
+                else:
+                    items.append(value)
+                set_path(doc, path, items)
+        elif op == "$pull":
+            for path, condition in fields.items():
+                current, present = get_path(doc, path)
+                if present and isinstance(current, list):
+                    set_path(doc, path, [item for item in current if not _pulls(item, condition)])
+        else:
+            raise NotImplementedError(f"Unsupported update operator: {op}")
+
+
+def upsert_document(query: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """The document an upsert inserts: the filter's equality fields plus the update."""
+    doc: Dict[str, Any] = {}
+    for key, value in query.items():
+        if not key.startswith("$") and not is_operator_condition(value):
+            set_path(doc, key, copy.deepcopy(value))
+    doc.setdefault("_id", ObjectId())
+    apply_update(doc, update, inserting=True)
+    return doc
+
+
+def _sort_key(spec):
+    def key(doc):
+        values = []
+        for field, _direction in spec:
+            value, present = get_path(doc, field)
+            # Missing/None sort first, like MongoDB
+            values.append((present and value is not None, value if value is not None else 0))
+        return values
+    return key
+
+
+def sort_documents(docs: List[Dict[str, Any]], spec) -> List[Dict[str, Any]]:
+    """Sort by a list of ``(field, direction)`` pairs."""
+    # Apply keys right-to-left so a stable sort honours per-field direction
+    for field, direction in reversed(spec):
+        docs = sorted(docs, key=_sort_key([(field, direction)]), reverse=direction < 0)
+    return docs
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Apply a top-level inclusion or exclusion projection (``doc`` is not copied)."""
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v}
+    exclude = {k for k, v in projection.items() if not v}
+    if include:
+        keep = include | ({"_id"} if "_id" not in exclude else set())
+        return {k: v for k, v in doc.items() if k in keep}
+    return {k: v for k, v in doc.items() if k not in exclude}
+
+
+def evaluate(expression, doc):
+    """
+    Evaluate an aggregation expression (field paths, ``$dateToString``,
+    ``$add``, ``$ifNull``, ``$concatArrays`` and literals).
+    """
+    if isinstance(expression, str) and expression.startswith("$"):
+        return get_path(doc, expression[1:])[0]
+    if isinstance(expression, list):
+        return [evaluate(value, doc) for value in expression]
+    if isinstance(expression, dict):
+        if "$dateToString" in expression:
+            spec = expression["$dateToString"]
+            value = evaluate(spec["date"], doc)
+            return value.strftime(spec["format"]) if value else None
+        if "$add" in expression:
+            return sum(evaluate(value, doc) for value in expression["$add"])
+        if "$ifNull" in expression:
+            value, default = expression["$ifNull"]
+            value = evaluate(value, doc)
+            return evaluate(default, doc) if value is None else value
+        if "$concatArrays" in expression:
+            return [item for value in expression["$concatArrays"] for item in evaluate(value, doc)]
+        return {key: evaluate(value, doc) for key, value in expression.items()}
+    return expression
+
+
+def run_pipeline(docs, pipeline):
+    """Run aggregation ``pipeline`` over ``docs``, which are left unmodified."""
+    docs = [copy.deepcopy(doc) for doc in docs]
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == "$sort":
+            docs = sort_documents(docs, list(spec.items()))
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$group":
+            groups: Dict[Any, Dict[str, Any]] = {}
+            for doc in docs:
+                key = evaluate(spec["_id"], doc)
+                hashable = repr(key)
+                group = groups.get(hashable)
+                if group is None:
+                    group = groups[hashable] = {"_id": key}
+                    first = True
+                else:
+                    first = False
+                for field, accumulator in spec.items():
+                    if field == "_id":
+                        continue
+                    (op, expr), = accumulator.items()
+                    value = evaluate(expr, doc)
+                    if op == "$first":
+                        if first:
+                            group[field] = value
+                    elif op == "$last":
+                        group[field] = value
+                    elif op == "$sum":
+                        group[field] = group.get(field, 0) + (value or 0)
+                    elif op == "$push":
+                        group.setdefault(field, []).append(value)
+                    elif op == "$max":
+                        group[field] = value if field not in group else max(group[field], value)
+                    elif op == "$min":
+                        group[field] = value if field not in group else min(group[field], value)
+                    else:
+                        raise NotImplementedError(f"Unsupported accumulator: {op}")
+            docs = list(groups.values())
+        elif name == "$project":
+            projected = []
+            for doc in docs:
+                out = {}
+                if spec.get("_id", 1):
+                    out["_id"] = doc.get("_id")
+                for field, value in spec.items():
+                    if field == "_id":
+                        continue
+                    if value in (1, True):
+                        if field in doc:
+                            out[field] = doc[field]
+                    elif value not in (0, False):
+                        out[field] = evaluate(value, doc)
+                projected.append(out)
+            docs = projected
+        else:
+            raise NotImplementedError(f"Unsupported pipeline stage: {name}")
+    return docs
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class BulkWriteResult:
+    def __init__(self, matched_count, modified_count, upserted_count):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_count = upserted_count
@@ -0,0 +1,845 @@
+"""
+Embedded SQLite storage engine for single-node installs.
+
+``SQLiteClient`` stands in for ``AsyncIOMotorClient`` as far as ``Database``
+is concerned: ``client[db][collection]`` returns a collection with the part
+of Motor's API the app uses, and query, update and aggregation semantics come
+from ``app.storage.documents``. Select it with ``STORAGE_ENGINE=sqlite``.
+
+Each collection is a table of BSON documents keyed by ``_id``. Every field
+named in a ``create_index`` call gets its own column, kept in sync on each
+write, and a SQLite index. Filters are compiled into a SQL pre-filter on those
+columns that may return extra rows but never misses one (arrays and other
+values a column cannot hold are stored as a marker every pre-filter lets
+through); every row is then checked against the full filter, so queries on
+unindexed fields are still correct, only slower. Sorts on indexed fields
+become ``ORDER BY``, and the mood tracker's ``$group`` on ``$dateToString``
+of an indexed date becomes a ``GROUP BY strftime(...)`` so only one document
+per day is decoded.
+
+The database runs in WAL mode. Writes go through a single writer thread (SQLite
+allows one writer at a time anyway), each operation in its own transaction;
+reads run concurrently on a small pool of reader threads. Every thread has its
+own connection and prepared-statement cache, and statement text depends only
+on the shape of a query, never on its values.
+"""
+import asyncio
+import copy
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from gridfs.errors import NoFile
+from pymongo.errors import DuplicateKeyError
+
+from app.storage.documents import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+    apply_update,
+    get_path,
+    is_operator_condition,
+    matches,
+    project,
+    run_pipeline,
+    sort_documents,
+    upsert_document,
+)
+
+logger = logging.getLogger(__name__)
+
+READER_THREADS = 4
+STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+TTL_INTERVAL = 60.0  # Seconds between expired-document sweeps, like MongoDB's TTL monitor
+RANGE_OPERATORS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+# $dateToString specifiers that SQLite's strftime formats the same way
+STRFTIME_SPECIFIERS = set("YmdHMSj%")
+
+OPAQUE = b"\x00"  # Column value for arrays, subdocuments and binary data
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _key(value: Any) -> str:
+    """Primary key text for an ``_id``; tagged by type so ``ObjectId(x)`` and ``str(x)`` stay distinct."""
+    if isinstance(value, ObjectId):
+        return "o:" + str(value)
+    if isinstance(value, str):
+        return "s:" + value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return "b:" + bson.encode({"v": value}).hex()
+    return "n:" + repr(value)
+
+
+def _column_value(value: Any):
+    """
+    Column form of a field value: ObjectIds as hex, datetimes as sortable ISO
+    text at BSON's millisecond precision, scalars as themselves and anything
+    else as ``OPAQUE``.
+    """
+    if value is None or isinstance(value, (str, int, float)):
+        return int(value) if isinstance(value, bool) else value
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.strftime("%Y-%m-%dT%H:%M:%S.") + "%03d" % (value.microsecond // 1000)
+    return OPAQUE
+
+
+def _index_spec(keys, direction=None) -> List[Tuple[str, int]]:
+    if isinstance(keys, str):
+        return [(keys, direction if direction is not None else 1)]
+    return list(keys)
+
+
+class _Connections:
+    """One connection per executor thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; a crash loses at most the last commits
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        self._local.conn = conn
+        with self._lock:
+            self._all.append(conn)
+
+    @property
+    def current(self) -> sqlite3.Connection:
+        return self._local.conn
+
+    def close_all(self) -> None:
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection, begin: str = "BEGIN IMMEDIATE") -> Iterator[sqlite3.Connection]:
+    conn.execute(begin)
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class _Catalog:
+    """A collection's indexed fields as of the current transaction."""
+
+    def __init__(self, rows):
+        self.columns: Dict[str, str] = {}
+        self.opaque = set()  # Fields with at least one OPAQUE value
+        for field, column, opaque in rows:
+            self.columns[field] = column
+            if opaque:
+                self.opaque.add(field)
+
+    def column(self, field: str) -> Optional[str]:
+        if field == "_id":
+            return "id"
+        column = self.columns.get(field)
+        return _quote(column) if column is not None else None
+
+
+class SQLiteCursor:
+    """Lazy cursor supporting sort/skip/limit chaining, ``to_list`` and ``async for``."""
+
+    def __init__(self, collection: "SQLiteCollection", query, projection=None):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._iter: Optional[Iterator[Dict[str, Any]]] = None
+
+    def sort(self, key, direction=None):
+        self._sort.extend(_index_spec(key, direction))
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, count: int):
+        return self  # Results are fetched in one call to the reader thread
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        limit = self._limit
+        if length is not None:
+            limit = min(limit, length) if limit else length
+        return await self._collection._read(self._collection._find, self._query, self._projection, self._sort,
+                                            self._skip, limit)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iter is None:
+            self._iter = iter(await self.to_list())
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class SQLiteAggregateCursor:
+    def __init__(self, collection: "SQLiteCollection", pipeline):
+        self._collection = collection
+        self._pipeline = pipeline
+        self._iter: Optional[Iterator[Dict[str, Any]]] = None
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = await self._collection._read(self._collection._aggregate, self._pipeline)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iter is None:
+            self._iter = iter(await self.to_list())
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class SQLiteCollection:
+    """
+    A collection stored in one table: ``id`` (type-tagged ``_id``), ``doc``
+    (the BSON document) and one column per indexed field.
+
+    Which fields are indexed is read from the catalog inside each operation's
+    transaction, so several processes (the API and the batch jobs) can share
+    the database file.
+    """
+
+    def __init__(self, client: "SQLiteClient", database: str, name: str):
+        self.name = name
+        self._client = client
+        self._table = f"{database}.{name}"
+        self._sql_table = _quote(self._table)
+        self._ready = False
+        self._next_sweep = 0.0
+
+    def with_options(self, **kwargs) -> "SQLiteCollection":
+        return self  # A single node: read preferences and write concerns do not apply
+
+    # -- threads and transactions ------------------------------------------
+
+    async def _prepare(self) -> None:
+        if not self._ready:
+            await self._client._run(self._client._writer, self._create_table)
+            self._ready = True
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + TTL_INTERVAL
+            await self._client._run(self._client._writer, self._sweep_expired)
+
+    async def _read(self, fn, *args):
+        await self._prepare()
+        return await self._client._run(self._client._readers, fn, *args)
+
+    async def _write(self, fn, *args):
+        await self._prepare()
+        return await self._client._run(self._client._writer, fn, *args)
+
+    def _create_table(self) -> None:
+        self._client._connections.current.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._sql_table} (id TEXT PRIMARY KEY, doc BLOB NOT NULL)")
+
+    def _catalog(self, conn: sqlite3.Connection) -> _Catalog:
+        return _Catalog(conn.execute("SELECT field, col, opaque FROM _storage_columns WHERE tbl = ?", (self._table,)))
+
+    @contextmanager
+    def _snapshot(self) -> Iterator[Tuple[sqlite3.Connection, _Catalog]]:
+        """A read transaction on the calling reader thread's connection."""
+        with _transaction(self._client._connections.current, "BEGIN") as conn:
+            yield conn, self._catalog(conn)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Tuple[sqlite3.Connection, _Catalog]]:
+        """A write transaction on the writer thread's connection."""
+        with _transaction(self._client._connections.current) as conn:
+            yield conn, self._catalog(conn)
+
+    # -- query compilation -------------------------------------------------
+
+    @staticmethod
+    def _encode(field: str, value: Any):
+        return _key(value) if field == "_id" else _column_value(value)
+
+    def _condition(self, catalog: _Catalog, field: str, condition: Any, clauses: List[str],
+                   params: List[Any]) -> None:
+        """Append SQL for one field's condition, if it can be expressed on an indexed column."""
+        column = catalog.column(field)
+        if column is None:
+            return
+        # Rows holding an array (or another OPAQUE value) might match; let them through to the document check
+        opaque = f" OR {column} = x'00'" if field in catalog.opaque else ""
+        operators = condition if is_operator_condition(condition) else {"$eq": condition}
+        for op, operand in operators.items():
+            if op == "$eq":
+                value = None if operand is None else self._encode(field, operand)
+                if value is None:
+                    clauses.append(f"({column} IS NULL{opaque})")
+                elif value is not OPAQUE:
+                    clauses.append(f"({column} = ?{opaque})")
+                    params.append(value)
+            elif op == "$in" and isinstance(operand, (list, tuple)):
+                values = [self._encode(field, item) for item in operand if item is not None]
+                if OPAQUE in values:
+                    continue
+                # One JSON parameter keeps the statement text (and so the prepared statement) the same for any length
+                null = f" OR {column} IS NULL" if len(values) < len(operand) else ""
+                clauses.append(f"({column} IN (SELECT value FROM json_each(?)){null}{opaque})")
+                params.append(json.dumps(values))
+            elif op in RANGE_OPERATORS and operand is not None and field != "_id":
+                value = _column_value(operand)
+                if value is not OPAQUE:
+                    clauses.append(f"({column} {RANGE_OPERATORS[op]} ?{opaque})")
+                    params.append(value)
+            # $ne, $nin, $exists and $type are left to the document check
+
+    def _clauses(self, catalog: _Catalog, query: Dict[str, Any], clauses: List[str], params: List[Any]) -> None:
+        for key, condition in query.items():
+            if key == "$and":
+                for sub in condition:
+                    self._clauses(catalog, sub, clauses, params)
+            elif key == "$or":
+                branches, branch_params = [], []
+                for sub in condition:
+                    sub_clauses: List[str] = []
+                    self._clauses(catalog, sub, sub_clauses, branch_params)
+                    if not sub_clauses:
+                        break  # This branch can match anything, so the $or cannot narrow
+                    branches.append("(" + " AND ".join(sub_clauses) + ")")
+                else:
+                    if branches:
+                        clauses.append("(" + " OR ".join(branches) + ")")
+                        params.extend(branch_params)
+            elif not key.startswith("$"):
+                self._condition(catalog, key, condition, clauses, params)
+
+    def _where(self, catalog: _Catalog, query: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        self._clauses(catalog, query or {}, clauses, params)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    @staticmethod
+    def _order_by(catalog: _Catalog, sort: List[Tuple[str, int]]) -> Optional[str]:
+        """ORDER BY for ``sort``, or None when a field is not indexed and Python has to sort."""
+        terms = []
+        for field, direction in sort:
+            column = catalog.column(field)
+            if column is None:
+                return None
+            terms.append(f"{column} {'DESC' if direction < 0 else 'ASC'}")
+        return " ORDER BY " + ", ".join(terms)
+
+    # -- reads (inside a snapshot or a write transaction) --------------------
+
+    def _matching(self, conn: sqlite3.Connection, catalog: _Catalog, query, sort=None,
+                  natural: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Documents matching ``query``, in ``sort`` order or (``natural``)
+        insertion order; decoded lazily unless Python has to sort them.
+        """
+        query = query or {}
+        where, params = self._where(catalog, query)
+        order = self._order_by(catalog, sort) if sort else (" ORDER BY rowid" if natural else "")
+        rows = conn.execute(f"SELECT doc FROM {self._sql_table}{where}{order or ''}", params)
+        docs = (doc for doc in (bson.decode(row[0]) for row in rows) if matches(doc, query))
+        if order is None:
+            return iter(sort_documents(list(docs), sort))
+        return docs
+
+    def _first(self, conn: sqlite3.Connection, catalog: _Catalog, query, sort=None) -> Optional[Dict[str, Any]]:
+        return next(self._matching(conn, catalog, query, sort), None)
+
+    def _find(self, query, projection, sort, skip: int, limit: int) -> List[Dict[str, Any]]:
+        results = []
+        with self._snapshot() as (conn, catalog):
+            for index, doc in enumerate(self._matching(conn, catalog, query, sort)):
+                if index < skip:
+                    continue
+                results.append(project(doc, projection))
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+    def _count(self, query) -> int:
+        with self._snapshot() as (conn, catalog):
+            return sum(1 for _ in self._matching(conn, catalog, query))
+
+    def _date_groups(self, conn: sqlite3.Connection, catalog: _Catalog, match,
+                     group) -> Optional[List[Dict[str, Any]]]:
+        """
+        The first (or last) document of each ``$dateToString`` bucket, chosen
+        in SQL, or None if the stage needs the general path.
+        """
+        key = group.get("_id")
+        if not isinstance(key, dict) or list(key) != ["$dateToString"]:
+            return None
+        spec = key["$dateToString"]
+        date, fmt = spec.get("date"), spec.get("format")
+        if set(spec) - {"date", "format"} or not isinstance(date, str) or not date.startswith("$") \
+                or not isinstance(fmt, str):
+            return None
+        field = date[1:]
+        column = catalog.column(field)
+        specifiers = fmt.split("%")[1:]
+        if column is None or field == "_id" or field in catalog.opaque \
+                or any(not s or s[0] not in STRFTIME_SPECIFIERS for s in specifiers):
+            return None
+        accumulators = {next(iter(acc)) for name, acc in group.items() if name != "_id"}
+        if accumulators - {"$first", "$last"} or len(accumulators) > 1:
+            return None
+        pick = "MAX" if accumulators == {"$last"} else "MIN"
+
+        where, params = self._where(catalog, match)
+        rows = conn.execute(
+            f"SELECT doc FROM {self._sql_table} WHERE rowid IN (SELECT {pick}(rowid) FROM {self._sql_table}{where} "
+            f"GROUP BY strftime(?, {column})) ORDER BY rowid", [*params, fmt])
+        docs = [bson.decode(row[0]) for row in rows]
+        if not all(matches(doc, match) for doc in docs):
+            return None  # The pre-filter let in a row the filter rejects; it may have displaced a bucket's pick
+        return docs
+
+    def _aggregate(self, pipeline) -> List[Dict[str, Any]]:
+        match: Dict[str, Any] = {}
+        stages = list(pipeline)
+        if stages and "$match" in stages[0]:
+            match = stages.pop(0)["$match"]
+        with self._snapshot() as (conn, catalog):
+            if stages and "$group" in stages[0]:
+                picked = self._date_groups(conn, catalog, match, stages[0]["$group"])
+                if picked is not None:
+                    # Each bucket is represented by its chosen document, so grouping them again in Python is exact
+                    return run_pipeline(picked, stages)
+            docs = list(self._matching(conn, catalog, match, natural=True))
+        return run_pipeline(docs, stages)
+
+    # -- writes (inside a write transaction on the writer thread) ------------
+
+    def _row(self, conn: sqlite3.Connection, catalog: _Catalog, doc: Dict[str, Any]) -> Tuple[str, bytes, List[Any]]:
+        values = []
+        for field in catalog.columns:
+            value = _column_value(get_path(doc, field)[0])
+            if value is OPAQUE and field not in catalog.opaque:
+                # Committed with this row, so no reader can see the row without also seeing the flag
+                conn.execute("UPDATE _storage_columns SET opaque = 1 WHERE tbl = ? AND field = ?", (self._table, field))
+                catalog.opaque.add(field)
+            values.append(value)
+        return _key(doc["_id"]), bson.encode(doc), values
+
+    def _insert(self, conn: sqlite3.Connection, catalog: _Catalog, doc: Dict[str, Any]) -> None:
+        key, blob, values = self._row(conn, catalog, doc)
+        columns = "".join(", " + _quote(column) for column in catalog.columns.values())
+        try:
+            conn.execute(f"INSERT INTO {self._sql_table} (id, doc{columns}) VALUES (?, ?{', ?' * len(values)})",
+                         [key, blob, *values])
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self._table} ({e})", 11000)
+
+    def _store(self, conn: sqlite3.Connection, catalog: _Catalog, doc: Dict[str, Any]) -> None:
+        key, blob, values = self._row(conn, catalog, doc)
+        assignments = "".join(f", {_quote(column)} = ?" for column in catalog.columns.values())
+        try:
+            conn.execute(f"UPDATE {self._sql_table} SET doc = ?{assignments} WHERE id = ?", [blob, *values, key])
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self._table} ({e})", 11000)
+
+    def _delete(self, conn: sqlite3.Connection, doc: Dict[str, Any]) -> None:
+        conn.execute(f"DELETE FROM {self._sql_table} WHERE id = ?", (_key(doc["_id"]),))
+
+    def _insert_docs(self, documents) -> List[Any]:
+        with self._transaction() as (conn, catalog):
+            for document in documents:
+                self._insert(conn, catalog, document)
+        return [document["_id"] for document in documents]
+
+    def _update(self, conn: sqlite3.Connection, catalog: _Catalog, query, update, upsert: bool, many: bool = False,
+                sort=None):
+        """Returns ``(matched, before, after, upserted_id)``; ``before``/``after`` for the first document only."""
+        if many:
+            docs = list(self._matching(conn, catalog, query))
+        else:
+            first = self._first(conn, catalog, query, sort)
+            docs = [first] if first is not None else []
+        if not docs:
+            if not upsert:
+                return 0, None, None, None
+            doc = upsert_document(query, update)
+            self._insert(conn, catalog, doc)
+            return 0, None, doc, doc["_id"]
+        before = copy.deepcopy(docs[0]) if not many else None
+        for doc in docs:
+            apply_update(doc, update)
+            self._store(conn, catalog, doc)
+        return len(docs), before, docs[0], None
+
+    def _update_in_transaction(self, query, update, upsert: bool, many: bool = False, sort=None):
+        with self._transaction() as (conn, catalog):
+            return self._update(conn, catalog, query, update, upsert, many, sort)
+
+    def _replace(self, query, replacement, upsert: bool) -> UpdateResult:
+        with self._transaction() as (conn, catalog):
+            doc = self._first(conn, catalog, query)
+            replacement = dict(replacement)
+            if doc is None:
+                if not upsert:
+                    return UpdateResult(0, 0)
+                replacement.setdefault("_id", query.get("_id", ObjectId()))
+                self._insert(conn, catalog, replacement)
+                return UpdateResult(0, 0, replacement["_id"])
+            replacement["_id"] = doc["_id"]
+            self._store(conn, catalog, replacement)
+            return UpdateResult(1, 1)
+
+    def _remove(self, query, many: bool) -> int:
+        with self._transaction() as (conn, catalog):
+            if many:
+                docs = list(self._matching(conn, catalog, query))
+            else:
+                docs = [doc for doc in [self._first(conn, catalog, query)] if doc is not None]
+            for doc in docs:
+                self._delete(conn, doc)
+        return len(docs)
+
+    def _bulk_update(self, requests) -> BulkWriteResult:
+        matched = upserted = 0
+        with self._transaction() as (conn, catalog):
+            for request in requests:
+                count, _, _, upserted_id = self._update(conn, catalog, request._filter, request._doc, request._upsert)
+                matched += count
+                upserted += upserted_id is not None
+        return BulkWriteResult(matched, matched, upserted)
+
+    def _add_column(self, conn: sqlite3.Connection, catalog: _Catalog, field: str) -> None:
+        column = "f_" + field
+        conn.execute(f"ALTER TABLE {self._sql_table} ADD COLUMN {_quote(column)}")
+        opaque = False
+        for key, blob in conn.execute(f"SELECT id, doc FROM {self._sql_table}").fetchall():
+            value = _column_value(get_path(bson.decode(blob), field)[0])
+            opaque = opaque or value is OPAQUE
+            conn.execute(f"UPDATE {self._sql_table} SET {_quote(column)} = ? WHERE id = ?", (value, key))
+        conn.execute("INSERT INTO _storage_columns (tbl, field, col, opaque) VALUES (?, ?, ?, ?)",
+                     (self._table, field, column, int(opaque)))
+        catalog.columns[field] = column
+        if opaque:
+            catalog.opaque.add(field)
+
+    def _create_index(self, spec, unique: bool, ttl: Optional[float], partial) -> str:
+        name = "_".join(f"{field}_{direction}" for field, direction in spec)
+        with self._transaction() as (conn, catalog):
+            for field, _ in spec:
+                if catalog.column(field) is None:
+                    self._add_column(conn, catalog, field)
+            terms = ", ".join(catalog.column(field) + (" DESC" if direction == -1 else "") for field, direction in spec)
+            try:
+                conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS "
+                             f"{_quote(self._table + '.' + name)} ON {self._sql_table} ({terms})")
+            except sqlite3.IntegrityError as e:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self._table} ({e})", 11000)
+            if ttl is not None:
+                conn.execute("INSERT OR REPLACE INTO _storage_ttl (tbl, field, seconds, partial) VALUES (?, ?, ?, ?)",
+                             (self._table, spec[0][0], ttl, bson.encode(partial) if partial else None))
+        return name
+
+    def _sweep_expired(self) -> int:
+        """Delete documents whose TTL-indexed date has expired (and that match the index's partial filter)."""
+        removed = 0
+        with self._transaction() as (conn, catalog):
+            ttl = conn.execute("SELECT field, seconds, partial FROM _storage_ttl WHERE tbl = ?", (self._table,))
+            for field, seconds, partial in ttl.fetchall():
+                partial = bson.decode(partial) if partial else None
+                cutoff = datetime.utcnow() - timedelta(seconds=seconds)
+                for (blob,) in conn.execute(f"SELECT doc FROM {self._sql_table} WHERE {catalog.column(field)} < ?",
+                                            (_column_value(cutoff),)).fetchall():
+                    doc = bson.decode(blob)
+                    value = get_path(doc, field)[0]
+                    if isinstance(value, datetime) and value < cutoff and matches(doc, partial):
+                        self._delete(conn, doc)
+                        removed += 1
+        if removed:
+            logger.info("Removed %d expired documents from %s", removed, self._table)
+        return removed
+
+    # -- Motor API -----------------------------------------------------------
+
+    async def create_index(self, keys, unique: bool = False, expireAfterSeconds: Optional[float] = None,
+                           partialFilterExpression: Optional[Dict[str, Any]] = None, **kwargs) -> str:
+        name = await self._write(self._create_index, _index_spec(keys), unique, expireAfterSeconds,
+                                 partialFilterExpression)
+        if expireAfterSeconds is not None:
+            self._next_sweep = 0.0
+        return name
+
+    async def find_one(self, query=None, projection=None, sort=None, **kwargs):
+        docs = await self._read(self._find, query, projection, _index_spec(sort) if sort else [], 0, 1)
+        return docs[0] if docs else None
+
+    def find(self, query=None, projection=None, **kwargs) -> SQLiteCursor:
+        return SQLiteCursor(self, query, projection)
+
+    async def count_documents(self, query, **kwargs) -> int:
+        return await self._read(self._count, query)
+
+    async def insert_one(self, document, **kwargs) -> InsertOneResult:
+        document.setdefault("_id", ObjectId())
+        await self._write(self._insert_docs, [document])
+        return InsertOneResult(document["_id"])
+
+    async def insert_many(self, documents, **kwargs) -> InsertManyResult:
+        documents = list(documents)
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        return InsertManyResult(await self._write(self._insert_docs, documents))
+
+    async def update_one(self, query, update, upsert=False, **kwargs) -> UpdateResult:
+        matched, _, _, upserted_id = await self._write(self._update_in_transaction, query, update, upsert)
+        return UpdateResult(matched, matched, upserted_id)
+
+    async def update_many(self, query, update, upsert=False, **kwargs) -> UpdateResult:
+        matched, _, _, upserted_id = await self._write(self._update_in_transaction, query, update, upsert, True)
+        return UpdateResult(matched, matched, upserted_id)
+
+    async def replace_one(self, query, replacement, upsert=False, **kwargs) -> UpdateResult:
+        return await self._write(self._replace, query, replacement, upsert)
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=False, projection=None,
+                                  sort=None, **kwargs):
+        _, before, after, _ = await self._write(
+            self._update_in_transaction, query, update, upsert, False, _index_spec(sort) if sort else None)
+        doc = after if return_document else before
+        return project(doc, projection) if doc is not None else None
+
+    async def delete_one(self, query, **kwargs) -> DeleteResult:
+        return DeleteResult(await self._write(self._remove, query, False))
+
+    async def delete_many(self, query, **kwargs) -> DeleteResult:
+        return DeleteResult(await self._write(self._remove, query, True))
+
+    async def bulk_write(self, requests, ordered=True, **kwargs) -> BulkWriteResult:
+        """Apply pymongo ``UpdateOne`` requests in one transaction."""
+        return await self._write(self._bulk_update, list(requests))
+
+    def aggregate(self, pipeline, **kwargs) -> SQLiteAggregateCursor:
+        return SQLiteAggregateCursor(self, pipeline)
+
+
+class SQLiteGridIn:
+    """Buffers one chunk at a time like GridFS; each chunk is a document in ``<bucket>.chunks``."""
+
+    def __init__(self, bucket: "SQLiteGridFSBucket", filename: str, chunk_size: int, metadata):
+        self._id = ObjectId()
+        self._bucket = bucket
+        self._file = {"_id": self._id, "filename": filename, "chunkSize": chunk_size, "metadata": metadata}
+        self._buffer = bytearray()
+        self._chunks = 0
+        self.length = 0
+        self.closed = False
+
+    async def _flush(self, data: bytes) -> None:
+        await self._bucket._ensure_index()
+        await self._bucket.chunks.insert_one({"files_id": self._id, "n": self._chunks, "data": bytes(data)})
+        self._chunks += 1
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        self.length += len(data)
+        chunk_size = self._file["chunkSize"]
+        offset = 0
+        while len(self._buffer) - offset >= chunk_size:
+            await self._flush(self._buffer[offset:offset + chunk_size])
+            offset += chunk_size
+        if offset:
+            self._buffer = self._buffer[offset:]
+
+    async def close(self) -> None:
+        if self._buffer:
+            await self._flush(self._buffer)
+            self._buffer = bytearray()
+        await self._bucket.files.insert_one({**self._file, "length": self.length, "uploadDate": datetime.utcnow()})
+        self.closed = True
+
+    async def abort(self) -> None:
+        await self._bucket.chunks.delete_many({"files_id": self._id})
+        self.closed = True
+
+
+class SQLiteGridOut:
+    def __init__(self, bucket: "SQLiteGridFSBucket", file: Dict[str, Any]):
+        self._bucket = bucket
+        self._id = file["_id"]
+        self.length = file["length"]
+        self.chunk_size = file["chunkSize"]
+        self.metadata = file.get("metadata")
+        self._position = 0
+
+    def seek(self, position: int) -> None:
+        self._position = position
+
+    async def read(self, size: int = -1) -> bytes:
+        end = self.length if size < 0 else min(self.length, self._position + size)
+        pieces = []
+        while self._position < end:
+            n, offset = divmod(self._position, self.chunk_size)
+            chunk = await self._bucket.chunks.find_one({"files_id": self._id, "n": n})
+            if chunk is None:
+                raise NoFile(f"missing chunk {n} of file {self._id!r}")
+            piece = chunk["data"][offset:offset + end - self._position]
+            pieces.append(piece)
+            self._position += len(piece)
+        return b"".join(pieces)
+
+
+class SQLiteGridFSBucket:
+    """The part of ``AsyncIOMotorGridFSBucket`` used for voice recordings."""
+
+    def __init__(self, database: "SQLiteDatabase", name: str):
+        self.files = database[f"{name}.files"]
+        self.chunks = database[f"{name}.chunks"]
+        self._indexed = False
+
+    async def _ensure_index(self) -> None:
+        if not self._indexed:
+            await self.chunks.create_index([("files_id", 1), ("n", 1)], unique=True)
+            self._indexed = True
+
+    def open_upload_stream(self, filename: str, chunk_size_bytes: int = 255 * 1024, metadata=None) -> SQLiteGridIn:
+        return SQLiteGridIn(self, filename, chunk_size_bytes, metadata)
+
+    async def open_download_stream(self, file_id) -> SQLiteGridOut:
+        await self._ensure_index()
+        file = await self.files.find_one({"_id": file_id})
+        if file is None:
+            raise NoFile(f"no file in gridfs with _id {file_id!r}")
+        return SQLiteGridOut(self, file)
+
+    async def delete(self, file_id) -> None:
+        await self._ensure_index()
+        await self.chunks.delete_many({"files_id": file_id})
+        result = await self.files.delete_one({"_id": file_id})
+        if not result.deleted_count:
+            raise NoFile(f"no file in gridfs with _id {file_id!r}")
+
+
+class SQLiteSession:
+    """
+    Client sessions are a no-op: every write is committed before it returns
+    and reads see the latest commit, so reads are always causally consistent.
+    """
+
+    cluster_time = None
+    operation_time = None
+
+    def advance_cluster_time(self, cluster_time) -> None:
+        pass
+
+    def advance_operation_time(self, operation_time) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class SQLiteDatabase:
+    def __init__(self, client: "SQLiteClient", name: str):
+        self.name = name
+        self._client = client
+        self._collections: Dict[str, SQLiteCollection] = {}
+
+    def __getitem__(self, name: str) -> SQLiteCollection:
+        if name not in self._collections:
+            self._collections[name] = SQLiteCollection(self._client, self.name, name)
+        return self._collections[name]
+
+    def gridfs_bucket(self, name: str) -> SQLiteGridFSBucket:
+        return SQLiteGridFSBucket(self, name)
+
+
+class SQLiteClient:
+    """Drop-in for ``AsyncIOMotorClient`` as far as ``Database`` is concerned, backed by one SQLite file."""
+
+    def __init__(self, path: str, readers: int = READER_THREADS):
+        self.path = path
+        self._connections = _Connections(path)
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="sqlite-writer", initializer=self._connections.open)
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix="sqlite-reader",
+                                           initializer=self._connections.open)
+        self._writer.submit(self._create_catalog).result()
+        self._databases: Dict[str, SQLiteDatabase] = {}
+
+    def _create_catalog(self) -> None:
+        conn = self._connections.current
+        conn.execute("CREATE TABLE IF NOT EXISTS _storage_columns "
+                     "(tbl TEXT, field TEXT, col TEXT, opaque INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (tbl, field))")
+        conn.execute("CREATE TABLE IF NOT EXISTS _storage_ttl "
+                     "(tbl TEXT, field TEXT, seconds REAL, partial BLOB, PRIMARY KEY (tbl, field))")
+
+    async def _run(self, executor: ThreadPoolExecutor, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    def __getitem__(self, name: str) -> SQLiteDatabase:
+        if name not in self._databases:
+            self._databases[name] = SQLiteDatabase(self, name)
+        return self._databases[name]
+
+    async def start_session(self, **kwargs) -> SQLiteSession:
+        return SQLiteSession()
+
+    def _drop_database(self, name: str) -> None:
+        conn = self._connections.current
+        prefix = name + "."
+        with _transaction(conn):
+            tables = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND substr(name, 1, ?) = ?",
+                (len(prefix), prefix))]
+            for table in tables:
+                conn.execute(f"DROP TABLE {_quote(table)}")
+                conn.execute("DELETE FROM _storage_columns WHERE tbl = ?", (table,))
+                conn.execute("DELETE FROM _storage_ttl WHERE tbl = ?", (table,))
+
+    async def drop_database(self, name: str) -> None:
+        await self._run(self._writer, self._drop_database, name)
+        self._databases.pop(name, None)
+
+    def close(self) -> None:
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self._connections.close_all()
@@ -3,8 +3,8 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Security
-from fastapi.security import OAuth2PasswordBearer, HTTPBearer
-from app.db import Database
+from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
+from app.db import Database, to_object_id, user_id_filter
 import os
 import logging
 
@@ -14,15 +14,14 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 scheme for token extraction
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # JWT settings
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-for-development-only")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Configure logger
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
@@ -56,17 +55,33 @@ async def get_current_user(token: str = Security(security)):
         payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
-            logger.error("Token is missing 'sub' field.")
+            logger.warning("Token is missing 'sub' field.")
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
         
+        try:
+            user_object_id = to_object_id(user_id)
+        except ValueError:
+            logger.warning("Token has an invalid 'sub': %s", user_id)
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
         # Fetch user from the database
-        user = await Database.get_collection("users").find_one({"_id": user_id})
+        user = await Database.get_collection("users").find_one(user_id_filter(user_object_id, "_id"))
         if user is None:
-            logger.error(f"User not found for ID: {user_id}")
+            logger.warning("User not found for ID: %s", user_id)
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        user["_id"] = user_object_id  # Always hand the canonical ObjectId to the data-access code
         
-        logger.info(f"Authenticated user ID: {user_id}")
+        logger.debug("Authenticated user ID: %s", user_id)
         return user
     except JWTError as e:
-        logger.error(f"JWT error: {e}")
+        logger.warning("JWT error: %s", e)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+async def get_optional_current_user(token: Optional[HTTPAuthorizationCredentials] = Security(optional_security)):
+    """Get the current user if a valid bearer token was sent, None otherwise (anonymous requests)."""
+    if token is None:
+        return None
+    try:
+        return await get_current_user(token)
+    except HTTPException:
+        return None  # An expired or invalid token still gets the anonymous behaviour
@@ -0,0 +1,42 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response, status
+
+
+def user_etag(current_user: Dict[str, Any], request: Request) -> str:
+    """
+    Build a weak ETag for a per-user read.
+
+    The user's ``change_seq`` is bumped by every journal write, so together with
+    the path and query string it identifies the response without touching the
+    journal collection.
+    """
+    seq = current_user.get("change_seq", 0)
+    resource = f"{current_user['_id']}|{request.url.path}|{request.url.query}"
+    return f'W/"{seq}-{hashlib.blake2b(resource.encode(), digest_size=8).hexdigest()}"'
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified_response(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response if the request's If-None-Match matches ``etag``, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = {_strip_weak(tag) for tag in header.split(",")}
+    if "*" in candidates or _strip_weak(etag) in candidates:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+        )
+    return None
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Attach the validator so clients can revalidate with If-None-Match."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
@@ -37,8 +37,9 @@ export default function VoicePage() {
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ message: input }),
     });
-    const data = await response.json();
-    const audio = new Audio(data.audio_file);
+    const blob = await response.blob();
+    const audio = new Audio(URL.createObjectURL(blob));
+    audio.onended = () => URL.revokeObjectURL(audio.src);
     audio.play();
   };
 
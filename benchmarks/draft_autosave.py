@@ -0,0 +1,187 @@
+"""
+Compare database writes for draft autosave: full-copy saves versus coalesced deltas.
+
+Simulated writers type entries at ``--wpm``, pausing after some sentences
+and occasionally rewriting the last word, and autosave every
+``--autosave-interval`` seconds of typing (and before each pause). The
+"full" client posts the whole draft to ``POST /api/journal/`` on every
+autosave and once more to publish, which is what the journal page does
+today; the "delta" client sends only the changed span to
+``PATCH /api/journal/drafts/{session}`` and publishes with
+``POST .../publish``. Writes are counted on the in-memory stand-in
+(inserts, updates and find-and-modify on entries and users), so no MongoDB
+is needed. ``--speedup`` compresses all waits, including the server's
+debounce. Prints JSON.
+
+Usage:
+    python -m benchmarks.draft_autosave --sessions 10 --words 300 --wpm 40 --speedup 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.harness import ASGIClient, BENCH_PASSWORD, WORDS, seed
+
+WRITE_OPS = ("insert", "update", "find_and_modify", "delete")
+
+
+def typing_script(rng: random.Random, words: int, wpm: float, pause_probability: float,
+                  pause: float) -> List[Tuple[float, bool, str]]:
+    """Return ``(seconds to wait, whether the writer paused, text after the wait)`` steps, one per word."""
+    seconds_per_char = 60.0 / (wpm * 5)
+    steps, text, sentence = [], "", 0
+    for _ in range(words):
+        if text and rng.random() < 0.05:  # Rewrite the last word
+            text = text[:text.rstrip().rfind(" ") + 1]
+        word = rng.choice(WORDS)
+        sentence += 1
+        text += (word.capitalize() if sentence == 1 else word) + " "
+        wait, paused = (len(word) + 1) * seconds_per_char, False
+        if sentence >= rng.randint(8, 16):
+            text = text.rstrip() + ". "
+            sentence = 0
+            if rng.random() < pause_probability:
+                wait, paused = wait + pause, True
+        steps.append((wait, paused, text))
+    return steps
+
+
+def text_change(old: str, new: str) -> Dict:
+    """The single ``{start, end, text}`` replacement that turns ``old`` into ``new``."""
+    prefix = 0
+    while prefix < min(len(old), len(new)) and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(len(old), len(new)) - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return {"start": prefix, "end": len(old) - suffix, "text": new[prefix:len(new) - suffix]}
+
+
+class Writer:
+    def __init__(self, client: ASGIClient, headers: Dict[str, str], session: str, mode: str):
+        self.client, self.headers, self.session, self.mode = client, headers, session, mode
+        self.saved, self.version = "", 0
+        self.requests = self.request_bytes = 0
+
+    async def _send(self, method: str, path: str, body: Dict):
+        self.requests += 1
+        self.request_bytes += len(json.dumps(body))
+        response = await self.client.request(method, path, json_body=body, headers=self.headers)
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path} failed: {response.status} {response.body[:200]!r}")
+        return response
+
+    async def autosave(self, text: str) -> None:
+        if text == self.saved:
+            return
+        self.version += 1
+        if self.mode == "full":
+            await self._send("POST", "/api/journal/", {"content": text, "is_draft": True})
+        else:
+            await self._send("PATCH", f"/api/journal/drafts/{self.session}", {
+                "version": self.version, "base_version": self.version - 1, "changes": [text_change(self.saved, text)]})
+        self.saved = text
+
+    async def publish(self, text: str) -> None:
+        if self.mode == "full":
+            await self._send("POST", "/api/journal/", {"content": text, "is_draft": False})
+        else:
+            body = {"version": self.version}
+            if text != self.saved:  # Final edits travel with the publish
+                self.version += 1
+                body = {"version": self.version, "base_version": self.version - 1,
+                        "changes": [text_change(self.saved, text)]}
+            await self._send("POST", f"/api/journal/drafts/{self.session}/publish", body)
+
+
+async def type_entry(writer: Writer, script: List[Tuple[float, bool, str]], interval: float,
+                     speedup: float) -> None:
+    since_save = 0.0
+    text = ""
+    for wait, paused, text in script:
+        if paused:  # Editors also save when typing stops
+            await writer.autosave(text)
+            since_save = 0.0
+        await asyncio.sleep(wait / speedup)
+        since_save += wait
+        if since_save >= interval:
+            await writer.autosave(text)
+            since_save = 0.0
+    await writer.publish(text)
+
+
+async def run_mode(mode: str, args) -> Dict:
+    from app.main import app
+    from app.db import Database
+    from app.services import draft_service
+    from app.utils.auth import create_access_token, get_password_hash
+    from benchmarks.memory_mongo import MemoryClient
+
+    Database.client = MemoryClient()
+    users = await seed(Database.get_collection("users"), Database.get_collection("journal_entries"),
+                       get_password_hash(BENCH_PASSWORD), args.sessions, 0, 1, random.Random(args.seed))
+    client = ASGIClient(app)
+    writers, scripts = [], []
+    for index, user in enumerate(users):
+        token = create_access_token({"sub": str(user["_id"]), "email": user["email"]})
+        writers.append(Writer(client, {"Authorization": f"Bearer {token}"}, f"bench-{index}", mode))
+        scripts.append(typing_script(random.Random(args.seed + index), args.words, args.wpm, args.pause_probability,
+                                     args.pause))
+    collections = [Database.get_collection("journal_entries"), Database.get_collection("users")]
+    before = sum(collection.ops[op] for collection in collections for op in WRITE_OPS)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(type_entry(writer, script, args.autosave_interval, args.speedup)
+                           for writer, script in zip(writers, scripts)))
+    await draft_service.flush_all()
+    seconds = time.perf_counter() - started
+
+    writes = sum(collection.ops[op] for collection in collections for op in WRITE_OPS) - before
+    return {
+        "requests": sum(writer.requests for writer in writers),
+        "request_kb": round(sum(writer.request_bytes for writer in writers) / 1024, 1),
+        "db_writes": writes,
+        "writes_per_session": round(writes / args.sessions, 1),
+        "journal_documents": await Database.get_collection("journal_entries").count_documents({}),
+        "seconds": round(seconds, 2),
+    }
+
+
+async def run(args) -> Dict:
+    from app.core.config import settings
+
+    settings.DRAFT_AUTOSAVE_DEBOUNCE_SECONDS /= args.speedup
+    settings.DRAFT_AUTOSAVE_MAX_DELAY_SECONDS /= args.speedup
+    report = {"sessions": args.sessions, "words": args.words, "wpm": args.wpm,
+              "autosave_interval": args.autosave_interval}
+    for mode in ("full", "delta"):
+        report[mode] = await run_mode(mode, args)
+    report["write_reduction"] = round(report["full"]["db_writes"] / max(report["delta"]["db_writes"], 1), 1)
+    report["request_bytes_reduction"] = round(report["full"]["request_kb"] / max(report["delta"]["request_kb"], 0.1), 1)
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=10, help="writers typing at the same time")
+    parser.add_argument("--words", type=int, default=300, help="words per entry")
+    parser.add_argument("--wpm", type=float, default=40.0)
+    parser.add_argument("--autosave-interval", type=float, default=2.0, help="client autosave period (s)")
+    parser.add_argument("--pause-probability", type=float, default=0.2, help="chance of a pause after a sentence")
+    parser.add_argument("--pause", type=float, default=8.0, help="pause length (s)")
+    parser.add_argument("--speedup", type=float, default=20.0, help="divide every wait by this")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Measure similar-entry search latency on a large per-user embedding index.
+
+Builds one user's int8 index from random unit vectors (the search cost does
+not depend on where the vectors came from), then times top-k queries and
+reports latency percentiles, index memory and hashing-embedder throughput as
+JSON.
+
+Usage:
+    python -m benchmarks.embedding_search --entries 100000 --dim 256 --queries 200 --k 5
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+from bson import ObjectId
+
+from benchmarks.harness import percentile, random_text
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embed-texts", type=int, default=2000, help="texts for the embedder throughput test")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    from app.services.embedding_service import EmbeddingIndex, HashingEmbedder, quantize
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.entries, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    quantized, scales = quantize(vectors)
+    index = EmbeddingIndex(args.dim, capacity=args.entries)
+    started = time.perf_counter()
+    index.upsert([ObjectId() for _ in range(args.entries)], quantized, scales)
+    build_seconds = time.perf_counter() - started
+
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    latencies = []
+    recall_hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        results = index.search(query, args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        # Compare against exact float32 search to show what quantisation costs
+        exact = set(np.argpartition(-(vectors @ query), args.k - 1)[:args.k].tolist())
+        recall_hits += len(exact & {index.positions[entry_id] for entry_id, _ in results})
+
+    latencies.sort()
+    texts_rng = random.Random(args.seed)
+    texts = [random_text(texts_rng, 120) for _ in range(args.embed_texts)]
+    embedder = HashingEmbedder(args.dim)
+    started = time.perf_counter()
+    embedder.embed(texts)
+    embed_seconds = time.perf_counter() - started
+
+    report = {
+        "config": vars(args),
+        "index_mb": round((index.matrix.nbytes + index.scales.nbytes) / 1e6, 2),
+        "float32_mb": round(vectors.nbytes / 1e6, 2),
+        "build_ms": round(build_seconds * 1000, 1),
+        "search_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+        },
+        "recall_at_k": round(recall_hits / (args.queries * args.k), 3),
+        "hashing_embed_per_s": round(args.embed_texts / embed_seconds),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
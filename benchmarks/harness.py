@@ -0,0 +1,224 @@
+"""
+Building blocks for driving the API in-process.
+
+``ASGIClient`` calls the FastAPI app directly (no sockets), ``seed`` fills a
+database with synthetic users and journal histories, and ``LatencyRecorder``
+turns raw timings into the per-route JSON report.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from bson import ObjectId
+
+MOODS = [
+    {"emoji": "😊", "label": "Happy", "value": "happy"},
+    {"emoji": "😐", "label": "Neutral", "value": "neutral"},
+    {"emoji": "😢", "label": "Sad", "value": "sad"},
+    {"emoji": "😠", "label": "Angry", "value": "angry"},
+    {"emoji": "😰", "label": "Anxious", "value": "anxious"},
+]
+
+WORDS = (
+    "today work family friend tired calm walk rain coffee deadline grateful worried sleep "
+    "evening meeting call proud lonely hopeful dinner music breathe overwhelmed quiet"
+).split()
+
+BENCH_PASSWORD = "benchmark-password"
+
+
+class ASGIResponse:
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status = status
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in headers}
+        self.body = body
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class ASGIClient:
+    """Tiny in-process HTTP client for an ASGI application."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, json_body: Any = None, params: Optional[Dict[str, Any]] = None,
+                      headers: Optional[Dict[str, str]] = None,
+                      body_chunks: Optional[Iterable[bytes]] = None) -> ASGIResponse:
+        """Send one request; ``body_chunks`` streams a raw body as separate ASGI messages."""
+        body = b""
+        raw_headers = [(b"host", b"bench")]
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            raw_headers.append((b"content-type", b"application/json"))
+        if body_chunks is None:
+            raw_headers.append((b"content-length", str(len(body)).encode()))
+        pending = iter(body_chunks if body_chunks is not None else [body])
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+        query = urlencode(params or {}, doseq=True).encode()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query,
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+        status = 500
+        response_headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+        current = next(pending, b"")
+        finished = False
+        complete = asyncio.Event()
+
+        async def receive():
+            nonlocal current, finished
+            if finished:
+                # Like a real client, stay connected until the response is done; streaming
+                # responses listen for a disconnect and would otherwise stop early
+                await complete.wait()
+                return {"type": "http.disconnect"}
+            chunk, current = current, next(pending, None)
+            finished = current is None
+            return {"type": "http.request", "body": chunk, "more_body": not finished}
+
+        async def send(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    complete.set()
+
+        await self.app(scope, receive, send)
+        return ASGIResponse(status, response_headers, b"".join(chunks))
+
+
+def random_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+async def seed(users_collection, journal_collection, password_hash: str, users: int, entries_per_user: int,
+               history_days: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """Insert synthetic users and journal histories; return the seeded user documents."""
+    now = datetime.utcnow()
+    seeded = []
+    for index in range(users):
+        user = {
+            "_id": ObjectId(),
+            "email": f"bench{index}@example.com",
+            "username": f"bench{index}",
+            "hashed_password": password_hash,
+            "created_at": now - timedelta(days=history_days),
+        }
+        await users_collection.insert_one(dict(user))
+        entries = []
+        for _ in range(entries_per_user):
+            created_at = now - timedelta(seconds=rng.randint(0, history_days * 86400))
+            entries.append({
+                "user_id": user["_id"],
+                "content": random_text(rng, rng.randint(20, 200)),
+                "mood": rng.choice(MOODS),
+                "tags": [],
+                "created_at": created_at,
+                "updated_at": None,
+                "is_draft": rng.random() < 0.05,
+                "ai_response": None,
+            })
+        if entries:
+            await journal_collection.insert_many(entries)
+        seeded.append(user)
+    return seeded
+
+
+def use_bench_database() -> str:
+    """
+    Point the app at a new ``bench_<id>`` database and return its name.
+
+    ``MONGO_DB_NAME`` is overwritten rather than defaulted, so a run never
+    seeds into (or drops) a database that already existed.
+    """
+    name = f"bench_{ObjectId()}"
+    os.environ["MONGO_DB_NAME"] = name
+    return name
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyRecorder:
+    """Collects per-route timings and status codes."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, route: str, seconds: float, ok: bool) -> None:
+        self.samples[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        routes = {}
+        everything: List[float] = []
+        for route, values in sorted(self.samples.items()):
+            everything.extend(values)
+            routes[route] = self._summarize(sorted(values), self.errors[route], elapsed)
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "routes": routes,
+            "total": self._summarize(sorted(everything), sum(self.errors.values()), elapsed),
+        }
+
+    @staticmethod
+    def _summarize(values: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+        return {
+            "count": len(values),
+            "errors": errors,
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(1000 * sum(values) / len(values), 3) if values else 0.0,
+            "p50_ms": round(1000 * percentile(values, 50), 3),
+            "p95_ms": round(1000 * percentile(values, 95), 3),
+            "p99_ms": round(1000 * percentile(values, 99), 3),
+        }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Return a description of every route whose p95 regressed by more than ``max_regression``."""
+    failures = []
+    for route, stats in current["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous or not previous.get("p95_ms"):
+            continue
+        ratio = stats["p95_ms"] / previous["p95_ms"] - 1.0
+        if ratio > max_regression:
+            failures.append(f"{route}: p95 {previous['p95_ms']}ms -> {stats['p95_ms']}ms (+{ratio:.0%})")
+    return failures
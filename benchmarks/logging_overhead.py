@@ -0,0 +1,174 @@
+"""
+Measure the per-request cost of logging on the API's hot journal routes.
+
+Each iteration creates an entry, lists entries, fetches the new entry and
+deletes it, on the in-memory stand-in. Modes run in turn for ``--rounds``
+rounds and each is reported by its median round, so drift over the run does
+not favour one mode. Modes:
+
+- ``off``: INFO and below disabled, the baseline
+- ``sync``: a ``StreamHandler`` on the root logger writing every record on
+  the event loop (what ``logging.basicConfig`` set up before)
+- ``queued``: ``app.core.log`` with sampling disabled
+- ``sampled``: ``app.core.log`` with ``--sample-rate``
+
+Records go to ``--log-file`` (default ``/dev/null``) through a sink that
+sleeps ``--sink-delay-ms`` per write, to stand in for a slow log pipe or
+disk. The report gives mean and p95 latency per mode and the mean overhead
+per request over ``off``. Prints JSON.
+
+Usage:
+    python -m benchmarks.logging_overhead --iterations 300 --rounds 5 --sink-delay-ms 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.harness import ASGIClient, BENCH_PASSWORD, percentile, random_text, seed
+
+MODES = ("off", "sync", "queued", "sampled")
+
+
+class SlowSink:
+    """A file that takes ``delay`` seconds per write."""
+
+    def __init__(self, path: str, delay: float):
+        self._file = open(path, "a")
+        self._delay = delay
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        if self._delay:
+            time.sleep(self._delay)
+        return self._file.write(text)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+
+def use_mode(mode: str, sink: SlowSink, sample_rate: float) -> None:
+    from app.core import log
+    from app.core.config import settings
+
+    log.stop_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    logging.disable(logging.INFO if mode == "off" else logging.NOTSET)
+    if mode in ("off", "sync"):
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        return
+    settings.LOG_INFO_SAMPLE_RATE = 1.0 if mode == "queued" else sample_rate
+    stderr, sys.stderr = sys.stderr, sink
+    try:
+        log.configure_logging("INFO")
+    finally:
+        sys.stderr = stderr
+
+
+async def cycle(client: ASGIClient, headers: Dict[str, str], rng: random.Random, latencies: List[float]) -> None:
+    async def timed(method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, path, headers=headers, **kwargs)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path} failed: {response.status} {response.body[:200]!r}")
+        return response
+
+    created = await timed("POST", "/api/journal/", json_body={"content": random_text(rng, 120), "is_draft": False})
+    entry_id = created.json()["id"]
+    await timed("GET", "/api/journal/journal/", params={"limit": 10})
+    await timed("GET", f"/api/journal/{entry_id}")
+    await timed("DELETE", f"/api/journal/{entry_id}")
+
+
+async def run_mode(mode: str, client: ASGIClient, headers: Dict[str, str], args) -> Dict:
+    from app.core import log
+
+    sink = SlowSink(args.log_file, args.sink_delay_ms / 1000)
+    use_mode(mode, sink, args.sample_rate)
+    rng = random.Random(args.seed)
+    latencies: List[float] = []
+
+    async def worker(iterations: int) -> None:
+        for _ in range(iterations):
+            await cycle(client, headers, rng, latencies)
+
+    await worker(args.warmup)
+    latencies.clear()
+    per_worker = max(1, args.iterations // args.concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(per_worker) for _ in range(args.concurrency)))
+    seconds = time.perf_counter() - started
+    log.stop_logging()  # Drain the queue so the written record count is complete
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_s": round(len(latencies) / seconds, 1),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "records_written": sink.writes,
+    }
+
+
+async def run(args) -> Dict:
+    from app.main import app
+    from app.db import Database
+    from app.utils.auth import create_access_token, get_password_hash
+    from benchmarks.memory_mongo import MemoryClient
+
+    Database.client = MemoryClient()
+    user, = await seed(Database.get_collection("users"), Database.get_collection("journal_entries"),
+                       get_password_hash(BENCH_PASSWORD), 1, args.entries, 90, random.Random(args.seed))
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user['_id']), 'email': user['email']})}"}
+    client = ASGIClient(app)
+
+    report = {"iterations": args.iterations, "rounds": args.rounds, "concurrency": args.concurrency,
+              "sink_delay_ms": args.sink_delay_ms, "sample_rate": args.sample_rate, "modes": {}}
+    modes = args.modes.split(",")
+    rounds: Dict[str, List[Dict]] = {mode: [] for mode in modes}
+    for _ in range(args.rounds):
+        for mode in modes:
+            rounds[mode].append(await run_mode(mode, client, headers, args))
+    for mode, results in rounds.items():
+        typical = sorted(results, key=lambda result: result["mean_ms"])[len(results) // 2]
+        report["modes"][mode] = {**typical, "round_means_ms": [result["mean_ms"] for result in results]}
+    baseline = report["modes"].get("off")
+    if baseline:
+        for result in report["modes"].values():
+            result["overhead_us_per_request"] = round((result["mean_ms"] - baseline["mean_ms"]) * 1000, 1)
+    logging.disable(logging.NOTSET)
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma-separated, from {', '.join(MODES)}")
+    parser.add_argument("--iterations", type=int, default=300, help="create/list/get/delete cycles per mode and round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--entries", type=int, default=20, help="journal entries seeded for the user")
+    parser.add_argument("--log-file", default=os.devnull)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.0, help="simulated cost of each log write")
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""
+In-memory stand-in for the subset of Motor used by the API.
+
+Query, update and aggregation semantics come from ``app.storage.documents``
+(shared with the SQLite engine); this module adds dictionary-backed
+collections, sorted and paginated cursors and a GridFS bucket for voice
+recordings. Every collection counts
+the operations it serves so benchmarks can report database work alongside
+latency.
+"""
+import copy
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+from app.storage.documents import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+    apply_update,
+    matches,
+    project,
+    run_pipeline,
+    sort_documents,
+    upsert_document,
+)
+
+
+class MemoryCursor:
+    """Lazy cursor supporting sort/skip/limit chaining and ``to_list``."""
+
+    def __init__(self, collection: "MemoryCollection", query, projection=None):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        if isinstance(key, list):
+            self._sort.extend(key)
+        else:
+            self._sort.append((key, direction if direction is not None else 1))
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, count: int):
+        return self
+
+    def _results(self) -> List[Dict[str, Any]]:
+        docs = [doc for doc in self._collection._docs.values() if matches(doc, self._query)]
+        if self._sort:
+            docs = sort_documents(docs, self._sort)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [self._collection._project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        self._collection.ops["find"] += 1
+        docs = self._results()
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        self._collection.ops["find"] += 1
+        self._iter = iter(self._results())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryCollection:
+    """Dictionary-backed collection keyed by ``_id``."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self.ops: Counter = Counter()
+
+    @staticmethod
+    def _project(doc, projection):
+        return project(copy.deepcopy(doc), projection)
+
+    def _first(self, query, sort=None):
+        docs = [doc for doc in self._docs.values() if matches(doc, query)]
+        if sort:
+            docs = sort_documents(docs, sort)
+        return docs[0] if docs else None
+
+    def with_options(self, **kwargs) -> "MemoryCollection":
+        return self  # A single in-memory node: read preferences do not apply
+
+    async def create_index(self, *args, **kwargs):
+        return "memory_index"
+
+    async def find_one(self, query=None, projection=None, sort=None, **kwargs):
+        self.ops["find_one"] += 1
+        doc = self._first(query or {}, sort)
+        return self._project(doc, projection) if doc is not None else None
+
+    def find(self, query=None, projection=None, **kwargs):
+        return MemoryCursor(self, query, projection)
+
+    async def count_documents(self, query, **kwargs) -> int:
+        self.ops["count"] += 1
+        return sum(1 for doc in self._docs.values() if matches(doc, query))
+
+    async def insert_one(self, document, **kwargs):
+        self.ops["insert"] += 1
+        document.setdefault("_id", ObjectId())
+        if document["_id"] in self._docs:
+            raise ValueError(f"Duplicate key: {document['_id']}")
+        self._docs[document["_id"]] = copy.deepcopy(document)
+        return InsertOneResult(document["_id"])
+
+    async def insert_many(self, documents, **kwargs):
+        self.ops["insert"] += 1
+        ids = []
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+            self._docs[document["_id"]] = copy.deepcopy(document)
+            ids.append(document["_id"])
+        return InsertManyResult(ids)
+
+    def _upsert_doc(self, query, update):
+        doc = upsert_document(query, update)
+        self._docs[doc["_id"]] = doc
+        return doc
+
+    async def update_one(self, query, update, upsert=False, **kwargs):
+        self.ops["update"] += 1
+        doc = self._first(query)
+        if doc is None:
+            if upsert:
+                created = self._upsert_doc(query, update)
+                return UpdateResult(0, 0, created["_id"])
+            return UpdateResult(0, 0)
+        apply_update(doc, update)
+        return UpdateResult(1, 1)
+
+    async def update_many(self, query, update, upsert=False, **kwargs):
+        self.ops["update"] += 1
+        docs = [doc for doc in self._docs.values() if matches(doc, query)]
+        for doc in docs:
+            apply_update(doc, update)
+        return UpdateResult(len(docs), len(docs))
+
+    async def replace_one(self, query, replacement, upsert=False, **kwargs):
+        self.ops["update"] += 1
+        doc = self._first(query)
+        if doc is None:
+            if not upsert:
+                return UpdateResult(0, 0)
+            replacement = copy.deepcopy(replacement)
+            replacement.setdefault("_id", query.get("_id", ObjectId()))
+            self._docs[replacement["_id"]] = replacement
+            return UpdateResult(0, 0, replacement["_id"])
+        replacement = copy.deepcopy(replacement)
+        replacement["_id"] = doc["_id"]
+        self._docs[doc["_id"]] = replacement
+        return UpdateResult(1, 1)
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=False, projection=None,
+                                  sort=None, **kwargs):
+        self.ops["find_and_modify"] += 1
+        doc = self._first(query, sort)
+        if doc is None:
+            if not upsert:
+                return None
+            doc = self._upsert_doc(query, update)
+            return self._project(doc, projection) if return_document else None
+        before = copy.deepcopy(doc)
+        apply_update(doc, update)
+        return self._project(doc if return_document else before, projection)
+
+    async def delete_one(self, query, **kwargs):
+        self.ops["delete"] += 1
+        doc = self._first(query)
+        if doc is None:
+            return DeleteResult(0)
+        del self._docs[doc["_id"]]
+        return DeleteResult(1)
+
+    async def delete_many(self, query, **kwargs):
+        self.ops["delete"] += 1
+        ids = [doc["_id"] for doc in self._docs.values() if matches(doc, query)]
+        for _id in ids:
+            del self._docs[_id]
+        return DeleteResult(len(ids))
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        """Apply pymongo ``UpdateOne`` requests as one operation."""
+        self.ops["bulk_write"] += 1
+        matched = upserted = 0
+        for request in requests:
+            doc = self._first(request._filter)
+            if doc is None:
+                if request._upsert:
+                    self._upsert_doc(request._filter, request._doc)
+                    upserted += 1
+                continue
+            apply_update(doc, request._doc)
+            matched += 1
+        return BulkWriteResult(matched, matched, upserted)
+
+    def aggregate(self, pipeline, **kwargs):
+        self.ops["aggregate"] += 1
+        return _AggregateCursor(run_pipeline(list(self._docs.values()), pipeline))
+
+
+class _AggregateCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length: Optional[int] = None):
+        return self._docs if length is None else self._docs[:length]
+
+    def __aiter__(self):
+        self._iter = iter(self._docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryGridIn:
+    """Buffers one chunk at a time like GridFS; chunks become documents in ``<bucket>.chunks``."""
+
+    def __init__(self, bucket: "MemoryGridFSBucket", filename: str, chunk_size: int, metadata):
+        self._id = ObjectId()
+        self._bucket = bucket
+        self._file = {"_id": self._id, "filename": filename, "chunkSize": chunk_size, "metadata": metadata}
+        self._buffer = bytearray()
+        self._chunks = 0
+        self.length = 0
+        self.closed = False
+
+    async def _flush(self, data: bytes) -> None:
+        await self._bucket.chunks.insert_one({"_id": (self._id, self._chunks), "files_id": self._id,
+                                              "n": self._chunks, "data": bytes(data)})
+        self._chunks += 1
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        self.length += len(data)
+        chunk_size = self._file["chunkSize"]
+        offset = 0
+        while len(self._buffer) - offset >= chunk_size:
+            await self._flush(self._buffer[offset:offset + chunk_size])
+            offset += chunk_size
+        if offset:
+            self._buffer = self._buffer[offset:]
+
+    async def close(self) -> None:
+        if self._buffer:
+            await self._flush(self._buffer)
+            self._buffer = bytearray()
+        await self._bucket.files.insert_one({**self._file, "length": self.length, "uploadDate": datetime.utcnow()})
+        self.closed = True
+
+    async def abort(self) -> None:
+        await self._bucket.chunks.delete_many({"files_id": self._id})
+        self.closed = True
+
+
+class MemoryGridOut:
+    def __init__(self, bucket: "MemoryGridFSBucket", file: Dict[str, Any]):
+        self._bucket = bucket
+        self._id = file["_id"]
+        self.length = file["length"]
+        self.chunk_size = file["chunkSize"]
+        self.metadata = file.get("metadata")
+        self._position = 0
+
+    def seek(self, position: int) -> None:
+        self._position = position
+
+    async def read(self, size: int = -1) -> bytes:
+        end = self.length if size < 0 else min(self.length, self._position + size)
+        pieces = []
+        while self._position < end:
+            n, offset = divmod(self._position, self.chunk_size)
+            data = self._bucket.chunks._docs[(self._id, n)]["data"]
+            piece = data[offset:offset + end - self._position]
+            pieces.append(piece)
+            self._position += len(piece)
+        self._bucket.chunks.ops["find"] += 1
+        return b"".join(pieces)
+
+
+class MemoryGridFSBucket:
+    """The part of ``AsyncIOMotorGridFSBucket`` used for voice recordings."""
+
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.files = database[f"{name}.files"]
+        self.chunks = database[f"{name}.chunks"]
+
+    def open_upload_stream(self, filename: str, chunk_size_bytes: int = 255 * 1024, metadata=None) -> MemoryGridIn:
+        return MemoryGridIn(self, filename, chunk_size_bytes, metadata)
+
+    async def open_download_stream(self, file_id) -> MemoryGridOut:
+        file = await self.files.find_one({"_id": file_id})
+        if file is None:
+            raise NoFile(f"no file in gridfs with _id {file_id!r}")
+        return MemoryGridOut(self, file)
+
+    async def delete(self, file_id) -> None:
+        await self.chunks.delete_many({"files_id": file_id})
+        result = await self.files.delete_one({"_id": file_id})
+        if not result.deleted_count:
+            raise NoFile(f"no file in gridfs with _id {file_id!r}")
+
+
+class MemorySession:
+    """Stand-in for a causally consistent client session; tracks the advanced times only."""
+
+    def __init__(self):
+        self.cluster_time = None
+        self.operation_time = None
+
+    def advance_cluster_time(self, cluster_time) -> None:
+        self.cluster_time = cluster_time
+
+    def advance_operation_time(self, operation_time) -> None:
+        self.operation_time = operation_time
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
+    def gridfs_bucket(self, name: str) -> MemoryGridFSBucket:
+        return MemoryGridFSBucket(self, name)
+
+    def collections(self) -> Dict[str, MemoryCollection]:
+        return self._collections
+
+
+class MemoryClient:
+    """Drop-in for ``AsyncIOMotorClient`` as far as ``Database`` is concerned."""
+
+    def __init__(self):
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name)
+        return self._databases[name]
+
+    async def start_session(self, **kwargs) -> MemorySession:
+        return MemorySession()
+
+    def op_counts(self) -> Dict[str, int]:
+        """Total operations served per collection, across databases."""
+        totals: Counter = Counter()
+        for database in self._databases.values():
+            for name, collection in database.collections().items():
+                totals[name] += sum(collection.ops.values())
+        return dict(totals)
+
+    def reset_op_counts(self) -> None:
+        for database in self._databases.values():
+            for collection in database.collections().values():
+                collection.ops.clear()
+
+    def close(self) -> None:
+        pass
+
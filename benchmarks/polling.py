@@ -0,0 +1,105 @@
+"""
+Measure what conditional GETs and compression save for polling clients.
+
+Each simulated client polls the journal list and mood tracker, occasionally
+writing a new entry, first as a naive client (no validators, no
+Accept-Encoding) and then as one that revalidates with If-None-Match and
+accepts compressed bodies. Reports database operations and bytes on the wire
+for both runs as JSON.
+
+Usage:
+    python -m benchmarks.polling --users 10 --entries 200 --polls 50 --write-ratio 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+from benchmarks.harness import ASGIClient, MOODS, random_text, seed
+
+POLLED_ROUTES = [
+    ("/journal/", {"limit": 50}),
+    ("/api/journal/", {}),
+    ("/api/journal/mood-tracker/", {}),
+]
+
+
+def wire_size(response) -> int:
+    head = sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+    return head + len(response.body)
+
+
+async def simulate(client, memory_client, users, polls: int, write_ratio: float, conditional: bool, seed_value: int):
+    rng = random.Random(seed_value)
+    memory_client.reset_op_counts()
+    totals = {"requests": 0, "not_modified": 0, "bytes": 0}
+    etags = {}
+    for _ in range(polls):
+        for user in users:
+            if rng.random() < write_ratio:
+                await client.request("POST", "/api/journal/", headers=user["auth"], json_body={
+                    "content": random_text(rng, 40), "mood": rng.choice(MOODS), "is_draft": False})
+            for path, params in POLLED_ROUTES:
+                headers = dict(user["auth"])
+                if conditional:
+                    headers["Accept-Encoding"] = "br, gzip"
+                    etag = etags.get((user["email"], path))
+                    if etag:
+                        headers["If-None-Match"] = etag
+                response = await client.request("GET", path, headers=headers, params=params)
+                totals["requests"] += 1
+                totals["bytes"] += wire_size(response)
+                if response.status == 304:
+                    totals["not_modified"] += 1
+                if "etag" in response.headers:
+                    etags[(user["email"], path)] = response.headers["etag"]
+    ops = memory_client.op_counts()
+    totals["db_ops"] = sum(ops.values())
+    totals["journal_db_ops"] = ops.get("journal_entries", 0)
+    return totals
+
+
+async def run(args):
+    from app.main import app
+    from app.db import Database
+    from app.utils.auth import create_access_token
+    from benchmarks.memory_mongo import MemoryClient
+
+    memory_client = Database.client = MemoryClient()
+    users = await seed(Database.get_collection("users"), Database.get_collection("journal_entries"),
+                       "unused", args.users, args.entries, 90, random.Random(args.seed))
+    for user in users:
+        user["auth"] = {"Authorization": "Bearer " + create_access_token({"sub": str(user["_id"])})}
+
+    client = ASGIClient(app)
+    naive = await simulate(client, memory_client, users, args.polls, args.write_ratio, False, args.seed)
+    conditional = await simulate(client, memory_client, users, args.polls, args.write_ratio, True, args.seed)
+    return {
+        "config": vars(args),
+        "naive": naive,
+        "conditional": conditional,
+        "saved": {
+            "db_ops_pct": round(100 * (1 - conditional["db_ops"] / naive["db_ops"]), 1),
+            "journal_db_ops_pct": round(100 * (1 - conditional["journal_db_ops"] / max(naive["journal_db_ops"], 1)), 1),
+            "bytes_pct": round(100 * (1 - conditional["bytes"] / naive["bytes"]), 1),
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--entries", type=int, default=200)
+    parser.add_argument("--polls", type=int, default=50, help="poll rounds per user")
+    parser.add_argument("--write-ratio", type=float, default=0.05, help="chance a user writes before polling")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
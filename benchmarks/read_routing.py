@@ -0,0 +1,161 @@
+"""
+Check read routing against a local replica set and report what it buys.
+
+Runs the same workload twice, with ``ANALYTICS_READ_PREFERENCE=primary``
+(routing off) and with the configured preference: analytics workers loop over
+the mood tracker and the NDJSON export while writer workers create entries and
+immediately export, checking that the new entry is there (read-your-writes).
+Reports, per run, which server served each read command, write latency
+percentiles and the number of read-your-writes violations, as JSON.
+
+Needs a replica set, e.g. three local members of ``rs0`` on ports
+27017-27019 (see the README).
+
+Usage:
+    python -m benchmarks.read_routing --mongo-url "mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0"
+        [--users 10] [--entries 200] [--duration 10] [--readers 8] [--writers 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from app.core.config import settings
+from benchmarks.harness import ASGIClient, BENCH_PASSWORD, MOODS, percentile, random_text, seed, use_bench_database
+
+READ_COMMANDS = {"find", "aggregate", "getMore", "count", "distinct"}
+
+
+class ReadCounter(monitoring.CommandListener):
+    """Counts read commands per server address."""
+
+    def __init__(self):
+        self.by_server: Counter = Counter()
+
+    def started(self, event):
+        if event.command_name in READ_COMMANDS:
+            self.by_server["%s:%d" % event.connection_id] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def run_phase(app, users, preference: str, args, counter: ReadCounter) -> Dict:
+    settings.ANALYTICS_READ_PREFERENCE = preference
+    counter.by_server.clear()
+    client = ASGIClient(app)
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.duration
+    write_latencies = []
+    stats = Counter()
+
+    async def reader(worker_rng: random.Random):
+        while time.perf_counter() < deadline:
+            user = worker_rng.choice(users)
+            path = worker_rng.choice(["/api/journal/mood-tracker/", "/api/journal/export/"])
+            response = await client.request("GET", path, headers=user["auth"])
+            stats["reads"] += 1
+            stats["read_errors"] += response.status >= 400
+
+    async def writer(worker_rng: random.Random):
+        while time.perf_counter() < deadline:
+            user = worker_rng.choice(users)
+            started = time.perf_counter()
+            response = await client.request("POST", "/api/journal/", headers=user["auth"], json_body={
+                "content": random_text(worker_rng, 40), "mood": worker_rng.choice(MOODS), "is_draft": False})
+            write_latencies.append(time.perf_counter() - started)
+            if response.status >= 400:
+                stats["write_errors"] += 1
+                continue
+            entry_id = response.json()["id"]
+            export = await client.request("GET", "/api/journal/export/", headers=user["auth"])
+            stats["ryw_checks"] += 1
+            if entry_id.encode() not in export.body:
+                stats["ryw_violations"] += 1
+
+    await asyncio.gather(*[reader(random.Random(rng.random())) for _ in range(args.readers)],
+                         *[writer(random.Random(rng.random())) for _ in range(args.writers)])
+    write_latencies.sort()
+    return {
+        "analytics_read_preference": preference,
+        "reads_by_server": dict(counter.by_server),
+        "writes": len(write_latencies),
+        "write_p50_ms": round(1000 * percentile(write_latencies, 50), 3),
+        "write_p95_ms": round(1000 * percentile(write_latencies, 95), 3),
+        "write_p99_ms": round(1000 * percentile(write_latencies, 99), 3),
+        **stats,
+    }
+
+
+async def run(args) -> Dict:
+    from app.main import app
+    from app.core.metrics import MongoCommandListener
+    from app.db import Database
+    from app.utils.auth import create_access_token, get_password_hash
+
+    counter = ReadCounter()
+    Database.client = AsyncIOMotorClient(args.mongo_url, event_listeners=[MongoCommandListener(), counter])
+    hello = await Database.client.admin.command("hello")
+    if "setName" not in hello:
+        raise SystemExit("--mongo-url must point at a replica set")
+
+    users = await seed(
+        Database.get_collection("users"),
+        Database.get_collection("journal_entries"),
+        get_password_hash(BENCH_PASSWORD),
+        args.users,
+        args.entries,
+        365,
+        random.Random(args.seed),
+    )
+    for user in users:
+        token = create_access_token({"sub": str(user["_id"]), "email": user["email"]})
+        user["auth"] = {"Authorization": f"Bearer {token}"}
+
+    configured = settings.ANALYTICS_READ_PREFERENCE
+    try:
+        report = {
+            "replica_set": hello["setName"],
+            "primary": hello["primary"],
+            "max_staleness_s": settings.ANALYTICS_MAX_STALENESS_SECONDS,
+            "routing_off": await run_phase(app, users, "primary", args, counter),
+            "routing_on": await run_phase(app, users, configured if configured != "primary" else "secondaryPreferred",
+                                          args, counter),
+        }
+    finally:
+        settings.ANALYTICS_READ_PREFERENCE = configured
+        await Database.client.drop_database(args.database)
+        Database.client.close()
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mongo-url", required=True, help="replica set connection string")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--entries", type=int, default=200, help="journal entries per user")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--readers", type=int, default=8, help="concurrent analytics workers")
+    parser.add_argument("--writers", type=int, default=4, help="concurrent write-then-read workers")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+    args.database = use_bench_database()  # Created and dropped by this run
+    print(json.dumps(asyncio.run(run(args)), indent=2, sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Load-test the API in-process and report per-route latency as JSON.
+
+Runs entirely offline: the FastAPI app is called directly over ASGI, the
+database is a local ``mongod``, the embedded SQLite engine or the in-memory
+stand-in, and the LLM is a fake OpenAI-compatible server on localhost.
+Reports also include the process's peak RSS and, for MongoDB, the server's
+resident memory.
+
+Usage:
+    python -m benchmarks.run --users 20 --entries 200 --duration 10 --concurrency 16
+    python -m benchmarks.run --mongo-url mongodb://localhost:27017 --output run.json
+    python -m benchmarks.run --baseline previous.json --max-regression 0.2
+
+Comparing storage engines (the second run fails if any route's p95 is more
+than 20% slower than MongoDB's):
+    python -m benchmarks.run --mongo-url mongodb://localhost:27017 --output mongo.json
+    python -m benchmarks.run --sqlite /tmp/bench.sqlite3 --baseline mongo.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from typing import Dict
+
+from app.core.config import settings
+from app.services.llm.local_server import LocalLLMServer
+from benchmarks.harness import (
+    ASGIClient,
+    BENCH_PASSWORD,
+    LatencyRecorder,
+    MOODS,
+    compare,
+    random_text,
+    seed,
+    use_bench_database,
+)
+
+DEFAULT_MIX = "login=1,create=2,list=4,list_all=2,mood=2,chat=1"
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+async def op_login(client, user, rng):
+    return "POST /auth/login/email", await client.request(
+        "POST", "/auth/login/email", json_body={"email": user["email"], "password": BENCH_PASSWORD})
+
+
+async def op_create(client, user, rng):
+    return "POST /api/journal/", await client.request(
+        "POST", "/api/journal/", headers=user["auth"],
+        json_body={"content": random_text(rng, rng.randint(20, 200)), "mood": rng.choice(MOODS), "is_draft": False})
+
+
+async def op_list(client, user, rng):
+    return "GET /journal/", await client.request(
+        "GET", "/journal/", headers=user["auth"], params={"limit": 10})
+
+
+async def op_list_all(client, user, rng):
+    return "GET /api/journal/", await client.request("GET", "/api/journal/", headers=user["auth"])
+
+
+async def op_mood(client, user, rng):
+    return "GET /api/journal/mood-tracker/", await client.request(
+        "GET", "/api/journal/mood-tracker/", headers=user["auth"])
+
+
+async def op_chat(client, user, rng):
+    from app.api.endpoints import chat
+    # The chat router keeps one process-wide history; reset it so every request
+    # looks like the start of a conversation instead of an ever-growing prompt.
+    chat.conversation_history.clear()
+    return "POST /chat", await client.request(
+        "POST", "/chat", json_body={"message": random_text(rng, rng.randint(5, 30))})
+
+
+OPERATIONS = {
+    "login": op_login,
+    "create": op_create,
+    "list": op_list,
+    "list_all": op_list_all,
+    "mood": op_mood,
+    "chat": op_chat,
+}
+
+
+async def run(args) -> Dict:
+    from app.main import app
+    from app.db import Database
+    from app.utils.auth import create_access_token, get_password_hash
+
+    memory_client = None
+    if args.mongo_url or args.sqlite:
+        if args.sqlite:
+            settings.STORAGE_ENGINE = "sqlite"
+            settings.SQLITE_PATH = args.sqlite
+        Database.mongo_url = args.mongo_url
+        await Database.connect()
+        await Database.ensure_indexes()
+    else:
+        from benchmarks.memory_mongo import MemoryClient
+        memory_client = Database.client = MemoryClient()
+
+    rng = random.Random(args.seed)
+    users = await seed(
+        Database.get_collection("users"),
+        Database.get_collection("journal_entries"),
+        get_password_hash(BENCH_PASSWORD),
+        args.users,
+        args.entries,
+        args.history_days,
+        rng,
+    )
+    for user in users:
+        token = create_access_token({"sub": str(user["_id"]), "email": user["email"]})
+        user["auth"] = {"Authorization": f"Bearer {token}"}
+
+    client = ASGIClient(app)
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+
+    async def worker(worker_rng: random.Random, recorder: LatencyRecorder, deadline: float, budget: list):
+        while time.perf_counter() < deadline and budget[0] > 0:
+            budget[0] -= 1
+            operation = OPERATIONS[worker_rng.choices(names, weights)[0]]
+            user = worker_rng.choice(users)
+            start = time.perf_counter()
+            route, response = await operation(client, user, worker_rng)
+            recorder.record(route, time.perf_counter() - start, response.status < 400)
+
+    async def phase(duration: float, requests: int) -> LatencyRecorder:
+        recorder = LatencyRecorder()
+        deadline = time.perf_counter() + duration
+        budget = [requests if requests else float("inf")]
+        await asyncio.gather(*(
+            worker(random.Random(rng.random()), recorder, deadline, budget) for _ in range(args.concurrency)))
+        recorder.stop()
+        return recorder
+
+    if args.warmup:
+        await phase(args.warmup, 0)
+    if memory_client is not None:
+        memory_client.reset_op_counts()
+    recorder = await phase(args.duration, args.requests)
+
+    report = recorder.report()
+    report["config"] = {
+        "users": args.users,
+        "entries_per_user": args.entries,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": args.mix,
+        "backend": settings.STORAGE_ENGINE if args.mongo_url or args.sqlite else "memory",
+        "llm_latency_s": args.llm_latency,
+        "llm_token_rate": args.llm_token_rate,
+        "seed": args.seed,
+    }
+    from app.services.llm import close_llm_provider
+    await close_llm_provider()
+    report["memory"] = {"process_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    if memory_client is not None:
+        report["db_ops"] = memory_client.op_counts()
+    else:
+        if args.mongo_url:
+            status = await Database.client.admin.command("serverStatus")
+            report["memory"]["server_resident_mb"] = status["mem"]["resident"]
+        else:
+            report["memory"]["db_file_mb"] = round(sum(
+                os.path.getsize(path) for path in (args.sqlite, args.sqlite + "-wal") if os.path.exists(path)
+            ) / 2 ** 20, 1)
+        await Database.client.drop_database(args.database)
+        await Database.disconnect()
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--entries", type=int, default=200, help="journal entries per user")
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of measured load")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = no cap)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds of unmeasured load first")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--mongo-url", help="use a real mongod instead of the in-memory stand-in")
+    parser.add_argument("--sqlite", metavar="PATH", help="use the embedded SQLite engine with this database file")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake LLM time to first token (s)")
+    parser.add_argument("--llm-token-rate", type=float, default=50.0, help="fake LLM tokens per second")
+    parser.add_argument("--llm-tokens", type=int, default=40, help="fake LLM completion length")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    llm = LocalLLMServer(args.llm_latency, args.llm_token_rate, args.llm_tokens).start()
+    os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+    settings.LLM_BACKEND = "openai"
+    settings.LLM_ENDPOINT = llm.url
+    args.database = use_bench_database()  # Created and dropped by this run
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        llm.stop()
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            failures = compare(report, json.load(handle), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
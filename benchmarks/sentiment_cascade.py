@@ -0,0 +1,101 @@
+"""
+Report accuracy and throughput of the sentiment cascade on a labelled sample.
+
+For each confidence threshold, shows how many messages the lexicon tier keeps
+(and how accurate it is on those) versus how many it would escalate to the
+model. If the model can be loaded, the full cascade and model-only runs are
+measured too. Throughput is measured on the sample repeated ``--repeat`` times.
+Prints JSON.
+
+Usage:
+    python -m benchmarks.sentiment_cascade [--sample benchmarks/data/sentiment_sample.tsv]
+        [--thresholds 0.3,0.4,0.5,0.6] [--repeat 200] [--with-model]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+DEFAULT_SAMPLE = os.path.join(os.path.dirname(__file__), "data", "sentiment_sample.tsv")
+
+
+def load_sample(path: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f, delimiter="\t"))
+    return [row["text"] for row in rows], [row["label"] for row in rows]
+
+
+def accuracy(predicted, expected) -> float:
+    return round(sum(p == e for p, e in zip(predicted, expected)) / max(len(expected), 1), 3)
+
+
+def throughput(classify, texts, repeat: int) -> float:
+    batch = texts * repeat
+    started = time.perf_counter()
+    classify(batch)
+    return round(len(batch) / (time.perf_counter() - started))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sample", default=DEFAULT_SAMPLE)
+    parser.add_argument("--thresholds", default="0.2,0.3,0.4,0.5,0.6")
+    parser.add_argument("--repeat", type=int, default=200, help="sample copies for the throughput run")
+    parser.add_argument("--with-model", action="store_true", help="load the transformer tier and measure it")
+    args = parser.parse_args(argv)
+
+    from app.core.config import settings
+    from app.services.sentiment_service import LexiconScorer, SentimentCascade
+
+    texts, labels = load_sample(args.sample)
+    lexicon = LexiconScorer()
+    lexicon_results = lexicon.score(texts)
+    lexicon_labels = [result.label for result in lexicon_results]
+    report = {
+        "sample": {"path": args.sample, "size": len(texts)},
+        "lexicon": {
+            "accuracy": accuracy(lexicon_labels, labels),
+            "messages_per_s": throughput(lexicon.score, texts, args.repeat),
+        },
+        "thresholds": [],
+    }
+
+    model_labels = None
+    if args.with_model:
+        cascade = SentimentCascade(0.0, settings.SENTIMENT_MODEL)
+        model = cascade._get_model()
+        if model is None:
+            report["model"] = {"available": False}
+        else:
+            model_labels = [result.label for result in model.predict(texts)]
+            report["model"] = {
+                "available": True,
+                "name": settings.SENTIMENT_MODEL,
+                "accuracy": accuracy(model_labels, labels),
+                "messages_per_s": throughput(model.predict, texts, max(1, args.repeat // 20)),
+            }
+
+    for threshold in (float(value) for value in args.thresholds.split(",")):
+        kept = [i for i, result in enumerate(lexicon_results) if result.confidence >= threshold]
+        row = {
+            "threshold": threshold,
+            "escalated_pct": round(100 * (1 - len(kept) / len(texts)), 1),
+            "lexicon_accuracy_on_kept": accuracy([lexicon_labels[i] for i in kept], [labels[i] for i in kept]),
+        }
+        if model_labels is not None:
+            kept_set = set(kept)
+            combined = [lexicon_labels[i] if i in kept_set else model_labels[i] for i in range(len(texts))]
+            row["cascade_accuracy"] = accuracy(combined, labels)
+            cascade = SentimentCascade(threshold, settings.SENTIMENT_MODEL)
+            cascade._model = model
+            row["cascade_messages_per_s"] = throughput(cascade.classify, texts, max(1, args.repeat // 20))
+        report["thresholds"].append(row)
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Measure voice recording upload throughput and memory, and ranged playback latency.
+
+Each recording is sent as a streamed multipart body (64 KiB ASGI messages) to
+``POST /voice/entries/``. For comparison the same body is sent to a
+"buffered" endpoint that parses it with ``request.form()`` and reads the whole
+``UploadFile`` before storing it, which is what a plain ``UploadFile``
+handler does. Throughput comes from an untraced run; peak memory from a
+second run under ``tracemalloc`` and is reported above what is still
+allocated afterwards, so the in-memory stand-in's copy of the stored file is
+not counted. Ranged reads fetch ``--range-kb`` at random offsets.
+Prints JSON.
+
+Usage:
+    python -m benchmarks.voice_upload --sizes-mb 10,100,500 [--mongo-url mongodb://localhost:27017]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict, Iterator
+
+from benchmarks.harness import ASGIClient, BENCH_PASSWORD, percentile, seed, use_bench_database
+
+BOUNDARY = "benchmarkboundary7MA4YWxkTrZu0gW"
+MESSAGE_BYTES = 64 * 1024
+
+
+def multipart_body(size: int, block: bytes) -> Iterator[bytes]:
+    """Yield a multipart/form-data body with a ``size``-byte audio part, one ASGI message at a time."""
+    yield (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"content\"\r\n\r\n"
+           f"Benchmark recording\r\n--{BOUNDARY}\r\n"
+           f"Content-Disposition: form-data; name=\"audio\"; filename=\"bench.webm\"\r\n"
+           f"Content-Type: audio/webm\r\n\r\n").encode()
+    remaining = size
+    while remaining > 0:
+        piece = block[:min(remaining, len(block))]
+        remaining -= len(piece)
+        yield piece
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def buffered_app():
+    """Baseline: let Starlette spool the upload, read it back whole, then store it."""
+    from fastapi import FastAPI, Request
+    from app.services.voice_service import CHUNK_SIZE, VOICE_BUCKET
+    from app.db import Database
+
+    app = FastAPI()
+
+    @app.post("/voice/entries/")
+    async def upload(request: Request):
+        form = await request.form()
+        grid_in = Database.get_gridfs_bucket(VOICE_BUCKET).open_upload_stream(
+            "bench.webm", chunk_size_bytes=CHUNK_SIZE, metadata={"content_type": "audio/webm"})
+        await grid_in.write(await form["audio"].read())
+        await grid_in.close()
+        return {"voice": {"file_id": str(grid_in._id)}}
+
+    return app
+
+
+async def upload(client: ASGIClient, headers: Dict[str, str], size: int, block: bytes) -> str:
+    response = await client.request("POST", "/voice/entries/", headers=headers,
+                                    body_chunks=multipart_body(size, block))
+    if response.status >= 400:
+        raise RuntimeError(f"upload failed: {response.status} {response.body[:200]!r}")
+    return response.json()["voice"]["file_id"]
+
+
+async def measure(client: ASGIClient, headers: Dict[str, str], size: int, block: bytes) -> Dict:
+    from app.services.voice_service import delete_recording
+
+    started = time.perf_counter()
+    file_id = await upload(client, headers, size, block)
+    seconds = time.perf_counter() - started
+    await delete_recording(file_id)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    file_id = await upload(client, headers, size, block)
+    peak = tracemalloc.get_traced_memory()[1]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {
+        "file_id": file_id,
+        "seconds": round(seconds, 3),
+        "mb_per_s": round(size / 2 ** 20 / seconds, 1),
+        "peak_overhead_mb": round(max(peak - after, 0) / 2 ** 20, 2),
+        "retained_mb": round((after - before) / 2 ** 20, 2),
+    }
+
+
+async def range_reads(client: ASGIClient, headers: Dict[str, str], file_id: str, size: int, range_bytes: int,
+                      reads: int, rng: random.Random) -> Dict:
+    latencies = []
+    for _ in range(reads):
+        start = rng.randrange(0, max(size - range_bytes, 1))
+        started = time.perf_counter()
+        response = await client.request("GET", f"/voice/recordings/{file_id}", headers={
+            **headers, "Range": f"bytes={start}-{start + range_bytes - 1}"})
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status == 206 and len(response.body) == min(range_bytes, size - start), response.status
+    latencies.sort()
+    return {"reads": reads, "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3)}
+
+
+async def run(args) -> Dict:
+    from app.core.config import settings
+    from app.main import app
+    from app.db import Database
+    from app.services.voice_service import delete_recording
+    from app.utils.auth import create_access_token, get_password_hash
+
+    if args.mongo_url:
+        Database.mongo_url = args.mongo_url
+        await Database.connect()
+    else:
+        from benchmarks.memory_mongo import MemoryClient
+        Database.client = MemoryClient()
+
+    user, = await seed(Database.get_collection("users"), Database.get_collection("journal_entries"),
+                       get_password_hash(BENCH_PASSWORD), 1, 0, 1, random.Random(args.seed))
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user['_id']), 'email': user['email']})}",
+               "Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    block = random.Random(args.seed).randbytes(MESSAGE_BYTES)  # Audio codecs leave little to compress
+    rng = random.Random(args.seed)
+    streamed, buffered = ASGIClient(app), ASGIClient(buffered_app())
+
+    sizes_mb = [float(value) for value in args.sizes_mb.split(",")]
+    settings.VOICE_MAX_UPLOAD_BYTES = max(settings.VOICE_MAX_UPLOAD_BYTES, int(max(sizes_mb) * 2 ** 20))
+    report = {"backend": "mongo" if args.mongo_url else "memory", "sizes": []}
+    try:
+        for client in (streamed, buffered):  # Warm up imports and first-request setup
+            await delete_recording(await upload(client, headers, MESSAGE_BYTES, block))
+        for size_mb in sizes_mb:
+            size = int(size_mb * 2 ** 20)
+            row = {"size_mb": size_mb, "streamed": await measure(streamed, headers, size, block)}
+            file_id = row["streamed"].pop("file_id")
+            row["range_reads"] = await range_reads(streamed, headers, file_id, size, args.range_kb * 1024,
+                                                   args.range_reads, rng)
+            await delete_recording(file_id)
+            if not args.skip_buffered:
+                row["buffered"] = await measure(buffered, headers, size, block)
+                await delete_recording(row["buffered"].pop("file_id"))
+            report["sizes"].append(row)
+    finally:
+        if args.mongo_url:
+            await Database.client.drop_database(args.database)
+            await Database.disconnect()
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes-mb", default="10,100")
+    parser.add_argument("--mongo-url", help="use a real mongod instead of the in-memory stand-in")
+    parser.add_argument("--range-kb", type=int, default=256, help="bytes per ranged read, in KiB")
+    parser.add_argument("--range-reads", type=int, default=50)
+    parser.add_argument("--skip-buffered", action="store_true", help="only measure the streaming endpoint")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+    args.database = use_bench_database()  # Created and dropped by this run
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())